@@ -0,0 +1,102 @@
+"""
+Benchmark the per-document cost of turning stored characters into models.
+
+Uses the fully populated character in docs/fizwick.json and compares:
+
+  kwargs     copying fields into a new dict and calling Character(**fields)
+  construct  model_construct applied recursively to the nested models (no validation)
+  validate   handing the stored document to the compiled validator (what reads use)
+  strict     the same in strict mode (STRICT_DB_READS=1)
+
+and then times a whole list_characters call. Run from the repository root:
+
+    PYTHONPATH=src python -m benchmarks.model_decoding --count 10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Union, get_args, get_origin
+
+from bson.objectid import ObjectId
+from pydantic import BaseModel
+from database import decoding
+from database.db_operations import Database, init_db, clear_database, close
+from database.character_operations import list_characters
+from models.character import Character
+
+SAMPLE_CHARACTER = Path(__file__).resolve().parents[2] / "docs" / "fizwick.json"
+
+def character_documents(count: int):
+    sample = json.loads(SAMPLE_CHARACTER.read_text())["character"]
+    now = datetime.now(timezone.utc).isoformat()
+    documents = []
+    for number in range(count):
+        oid = ObjectId()
+        documents.append({
+            **sample, "_id": oid, "id": str(oid), "name": f"{sample['name']} {number}",
+            "campaign_id": "benchmark", "created_at": now, "updated_at": now,
+        })
+    return documents
+
+def kwargs_construct(document):
+    fields = {key: value for key, value in document.items() if key != "_id"}
+    fields["character_class"] = fields.pop("class", None)
+    return Character(**fields)
+
+def nested_construct(model, data):
+    values = {}
+    for name, field in model.model_fields.items():
+        key = field.alias if field.alias in data else name
+        if key not in data:
+            continue
+        value = data[key]
+        annotation = field.annotation
+        if get_origin(annotation) is Union:
+            annotation = next((arg for arg in get_args(annotation) if arg is not type(None)), annotation)
+        if isinstance(value, dict) and isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            value = nested_construct(annotation, value)
+        values[name] = value
+    return model.model_construct(**values)
+
+def microseconds_per_document(function, documents) -> float:
+    start = time.perf_counter()
+    for document in documents:
+        function(document)
+    return (time.perf_counter() - start) / len(documents) * 1_000_000
+
+def run(count: int, backend: str) -> None:
+    documents = character_documents(count)
+    strategies = {
+        "kwargs": kwargs_construct,
+        "construct": lambda document: nested_construct(Character, document),
+        "validate": lambda document: Character.model_validate(document),
+        "strict": lambda document: Character.model_validate(document, strict=True),
+    }
+    for name, function in strategies.items():
+        print(f"{name:>10}  {microseconds_per_document(function, documents):8.1f} µs/doc")
+
+    db = Database()
+    init_db(db, db_name="dm_benchmark", backend=backend)
+    clear_database(db)
+    for document in documents:
+        db.characters_collection.insert_one(dict(document))
+    for strict in (False, True):
+        decoding.set_strict_reads(strict)
+        start = time.perf_counter()
+        list_characters(db)
+        elapsed = (time.perf_counter() - start) / count * 1_000_000
+        print(f"list_characters ({'strict' if strict else 'default'}): {elapsed:.1f} µs/doc over {count} characters")
+    close(db)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark ways of building character models from stored documents")
+    parser.add_argument("--count", type=int, default=10000, help="Number of characters to decode")
+    parser.add_argument("--backend", default="memory",
+                        help="Storage backend to read from: memory, sqlite::memory:, sqlite:<path> or a MongoDB URI")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.count, args.backend)
@@ -0,0 +1,81 @@
+"""
+Benchmark the trigram name index against the regex-scanning search_characters.
+
+Loads a synthetic world of N characters into a fresh database, then times
+substring lookups of name fragments both ways. Run from the repository root:
+
+    PYTHONPATH=src python -m benchmarks.name_lookup --sizes 10000,100000,1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from statistics import median
+from typing import Callable, Dict, List
+
+from bson.objectid import ObjectId
+from database.db_operations import Database, init_db, clear_database, close
+from database.name_index import rebuild_name_index
+from database.character_operations import search_characters, lookup_characters_by_name
+
+SYLLABLES = ["fiz", "wick", "bru", "enor", "driz", "zt", "tha", "lia", "mor", "gan",
+             "el", "dra", "kor", "vin", "sha", "rel", "ost", "ara", "gorn", "eth"]
+
+def character_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+def load_characters(db: Database, count: int, seed: int) -> List[str]:
+    """Insert count characters straight into the collection and index their names once."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    names = []
+    for number in range(count):
+        oid = ObjectId()
+        name = f"{character_name(rng)} {number}"
+        names.append(name)
+        db.characters_collection.insert_one({
+            "_id": oid, "id": str(oid), "name": name, "campaign_id": "benchmark",
+            "race": "Human", "class": "Fighter", "level": 1, "created_at": now, "updated_at": now,
+        })
+    rebuild_name_index(db)
+    return names
+
+def time_calls(function: Callable, fragments: List[str]) -> Dict[str, float]:
+    durations = []
+    for fragment in fragments:
+        start = time.perf_counter()
+        function(fragment)
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": median(durations), "max_ms": max(durations)}
+
+def run(sizes: List[int], backend: str, queries: int, seed: int) -> None:
+    print(f"{'characters':>10}  {'lookup (trigram)':>18}  {'search (regex)':>16}  {'speedup':>8}")
+    for size in sizes:
+        db = Database()
+        init_db(db, db_name="dm_benchmark", backend=backend)
+        clear_database(db)
+        names = load_characters(db, size, seed)
+        rng = random.Random(seed)
+        fragments = []
+        for name in rng.sample(names, queries):
+            start = rng.randrange(0, max(1, len(name) - 5))
+            fragments.append(name[start:start + 5])
+        lookup = time_calls(lambda fragment: lookup_characters_by_name(db, fragment), fragments)
+        search = time_calls(lambda fragment: search_characters(db, fragment), fragments)
+        speedup = search["median_ms"] / lookup["median_ms"] if lookup["median_ms"] else float("inf")
+        print(f"{size:>10}  {lookup['median_ms']:>15.2f} ms  {search['median_ms']:>13.2f} ms  {speedup:>7.1f}x")
+        close(db)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark trigram name lookups against regex search")
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="Comma-separated character counts to benchmark")
+    parser.add_argument("--backend", default="memory",
+                        help="Storage backend to benchmark: memory, sqlite::memory:, sqlite:<path> or a MongoDB URI")
+    parser.add_argument("--queries", type=int, default=20, help="Number of name fragments to look up per size")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic character names")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.backend, args.queries, args.seed)
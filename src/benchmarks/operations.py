@@ -0,0 +1,248 @@
+"""
+Time every public function in campaign_operations, character_operations and
+setting_operations against a seeded synthetic world (see benchmarks.world).
+
+For each size a fresh database is loaded, then every operation is called with
+arguments drawn from the world. Argument preparation (including creating the
+entity a delete removes) is not timed, and the entity cache is cleared before
+each call so reads measure the database path. Operations that scan a
+whole collection are called fewer times, and the delete_all_* operations run
+once, last. Results are written as JSON so runs from two commits can be
+compared. Run from the repository root:
+
+    PYTHONPATH=src python -m benchmarks.operations --sizes 1000,10000 --output before.json
+    PYTHONPATH=src python -m benchmarks.operations --sizes 1000,10000 --compare before.json
+
+Use --backend mongodb://localhost:27017/ to measure a local mongod.
+"""
+import argparse
+import inspect
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from statistics import mean, median
+from typing import Callable, Dict, List, Optional
+
+from database import campaign_operations, character_operations, setting_operations
+from database.db_operations import Database, init_db, clear_database, close
+from models.character import Character
+from models.patch import PatchOperation
+from .world import SYLLABLES, WORDS, World, character_document, load_world, setting_document
+
+BENCHMARKED_MODULES = (campaign_operations, character_operations, setting_operations)
+SCAN_CALLS = 3
+
+@dataclass
+class Case:
+    """How to call one operation: arguments(db, world, rng) returns (args, kwargs) and is not timed."""
+    arguments: Callable
+    scan: bool = False
+    destructive: bool = False
+
+def _fragment(rng: random.Random) -> str:
+    return rng.choice(SYLLABLES) + rng.choice(SYLLABLES)
+
+_serial = itertools.count()
+
+def _new_character(world: World, rng: random.Random) -> Character:
+    document = character_document(rng, world.size + next(_serial), rng.choice(world.campaign_ids))
+    return Character.model_validate(document)
+
+def _new_setting(world: World, rng: random.Random) -> Dict:
+    document = setting_document(rng, world.size + next(_serial), 2, rng.choice(world.parent_ids))
+    return {key: value for key, value in document.items()
+            if key not in ("_id", "id", "created_at", "updated_at", "path")}
+
+def _scratch_campaign(db: Database, world: World, rng: random.Random) -> str:
+    return campaign_operations.create_campaign(db, f"Scratch campaign {next(_serial)}", "To be deleted").id
+
+def _scratch_character(db: Database, world: World, rng: random.Random) -> str:
+    return character_operations.create_character(db, _new_character(world, rng)).id
+
+def _scratch_setting(db: Database, world: World, rng: random.Random) -> str:
+    return setting_operations.create_setting(db, **_new_setting(world, rng)).id
+
+CASES: Dict[str, Case] = {
+    "campaign_operations.create_campaign": Case(
+        lambda db, world, rng: ((f"Benchmark campaign {next(_serial)}", " ".join(rng.sample(WORDS, 8))), {})),
+    "campaign_operations.update_campaign": Case(
+        lambda db, world, rng: ((rng.choice(world.campaign_ids), f"Renamed campaign {next(_serial)}",
+                                 " ".join(rng.sample(WORDS, 8))), {})),
+    "campaign_operations.delete_campaign": Case(lambda db, world, rng: ((_scratch_campaign(db, world, rng),), {})),
+    "campaign_operations.search_campaigns": Case(lambda db, world, rng: ((_fragment(rng),), {}), scan=True),
+    "campaign_operations.text_search_campaigns": Case(lambda db, world, rng: ((rng.choice(WORDS),), {})),
+    "campaign_operations.lookup_campaigns_by_name": Case(lambda db, world, rng: ((_fragment(rng),), {})),
+    "campaign_operations.get_campaign": Case(lambda db, world, rng: ((rng.choice(world.campaign_ids),), {})),
+    "campaign_operations.get_campaign_stats": Case(lambda db, world, rng: ((rng.choice(world.campaign_ids),), {})),
+    "campaign_operations.get_campaign_by_name": Case(
+        lambda db, world, rng: ((rng.choice(world.campaign_names),), {})),
+    "campaign_operations.list_campaigns": Case(lambda db, world, rng: ((), {}), scan=True),
+    "campaign_operations.list_campaigns_page": Case(lambda db, world, rng: ((), {})),
+    "campaign_operations.delete_all_campaigns": Case(lambda db, world, rng: ((), {}), destructive=True),
+
+    "character_operations.create_character": Case(lambda db, world, rng: ((_new_character(world, rng),), {})),
+    "character_operations.update_character": Case(
+        lambda db, world, rng: ((rng.choice(world.character_ids),),
+                                {"level": rng.randint(1, 20), "equipment": rng.sample(WORDS, 4)})),
+    "character_operations.patch_character": Case(
+        lambda db, world, rng: ((rng.choice(world.character_ids),
+                                 [PatchOperation(op="inc", path="data.hp", value=-rng.randint(1, 10))]), {})),
+    "character_operations.delete_character": Case(lambda db, world, rng: ((_scratch_character(db, world, rng),), {})),
+    "character_operations.get_character": Case(lambda db, world, rng: ((rng.choice(world.character_ids),), {})),
+    "character_operations.get_character_by_name": Case(
+        lambda db, world, rng: ((rng.choice(world.character_names),), {})),
+    "character_operations.list_characters": Case(lambda db, world, rng: ((), {}), scan=True),
+    "character_operations.list_campaign_characters": Case(
+        lambda db, world, rng: ((rng.choice(world.campaign_ids),), {})),
+    "character_operations.list_characters_page": Case(lambda db, world, rng: ((), {})),
+    "character_operations.list_campaign_characters_page": Case(
+        lambda db, world, rng: ((rng.choice(world.campaign_ids),), {})),
+    "character_operations.search_characters": Case(lambda db, world, rng: ((_fragment(rng),), {}), scan=True),
+    "character_operations.lookup_characters_by_name": Case(lambda db, world, rng: ((_fragment(rng),), {})),
+    "character_operations.text_search_characters": Case(lambda db, world, rng: ((rng.choice(WORDS),), {})),
+    "character_operations.delete_all_characters": Case(lambda db, world, rng: ((), {}), destructive=True),
+
+    "setting_operations.create_setting": Case(lambda db, world, rng: ((), _new_setting(world, rng))),
+    "setting_operations.update_setting": Case(
+        lambda db, world, rng: ((rng.choice(world.setting_ids),), {"atmosphere": " ".join(rng.sample(WORDS, 6))})),
+    "setting_operations.delete_setting": Case(lambda db, world, rng: ((_scratch_setting(db, world, rng),), {})),
+    "setting_operations.search_settings": Case(lambda db, world, rng: ((_fragment(rng),), {}), scan=True),
+    "setting_operations.lookup_settings_by_name": Case(lambda db, world, rng: ((_fragment(rng),), {})),
+    "setting_operations.text_search_settings": Case(lambda db, world, rng: ((rng.choice(WORDS),), {})),
+    "setting_operations.filter_settings_by_type": Case(lambda db, world, rng: (("Town",), {}), scan=True),
+    "setting_operations.filter_settings_by_parent": Case(
+        lambda db, world, rng: ((rng.choice(world.parent_ids),), {})),
+    "setting_operations.get_setting_children": Case(lambda db, world, rng: ((rng.choice(world.parent_ids),), {})),
+    "setting_operations.get_setting_subtree": Case(lambda db, world, rng: ((rng.choice(world.parent_ids),), {})),
+    "setting_operations.get_setting_ancestors": Case(lambda db, world, rng: ((rng.choice(world.setting_ids),), {})),
+    "setting_operations.get_setting_tree": Case(lambda db, world, rng: ((rng.choice(world.parent_ids),), {})),
+    "setting_operations.rebuild_setting_paths": Case(lambda db, world, rng: ((), {}), scan=True),
+    "setting_operations.get_setting": Case(lambda db, world, rng: ((rng.choice(world.setting_ids),), {})),
+    "setting_operations.get_setting_by_name": Case(lambda db, world, rng: ((rng.choice(world.setting_names),), {})),
+    "setting_operations.list_settings": Case(lambda db, world, rng: ((), {}), scan=True),
+    "setting_operations.list_settings_page": Case(lambda db, world, rng: ((), {})),
+    "setting_operations.delete_all_settings": Case(lambda db, world, rng: ((), {}), destructive=True),
+}
+
+def operation_names() -> List[str]:
+    """Every public function defined in the benchmarked modules."""
+    names = []
+    for module in BENCHMARKED_MODULES:
+        short = module.__name__.rsplit(".", 1)[-1]
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if function.__module__ == module.__name__ and not name.startswith("_"):
+                names.append(f"{short}.{name}")
+    return names
+
+def _resolve(name: str) -> Callable:
+    module_name, function_name = name.split(".")
+    module = next(module for module in BENCHMARKED_MODULES if module.__name__.endswith(module_name))
+    return getattr(module, function_name)
+
+def _percentile(durations: List[float], fraction: float) -> float:
+    ordered = sorted(durations)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+def time_operation(db: Database, world: World, name: str, case: Case, calls: int, rng: random.Random) -> Dict:
+    function = _resolve(name)
+    durations = []
+    for _ in range(calls):
+        args, kwargs = case.arguments(db, world, rng)
+        db.entity_cache.clear()
+        start = time.perf_counter()
+        function(db, *args, **kwargs)
+        durations.append((time.perf_counter() - start) * 1000)
+    return {
+        "calls": calls,
+        "median_ms": round(median(durations), 4),
+        "p95_ms": round(_percentile(durations, 0.95), 4),
+        "mean_ms": round(mean(durations), 4),
+        "min_ms": round(min(durations), 4),
+        "max_ms": round(max(durations), 4),
+    }
+
+def run_size(size: int, backend: str, calls: int, seed: int, only: Optional[List[str]] = None) -> Dict:
+    db = Database()
+    init_db(db, db_name="dm_benchmark", backend=backend)
+    clear_database(db)
+    start = time.perf_counter()
+    world = load_world(db, size, seed)
+    load_seconds = time.perf_counter() - start
+    rng = random.Random(seed)
+    names = [name for name in CASES if only is None or any(part in name for part in only)]
+    # Destructive operations empty their collection, so they go last
+    names.sort(key=lambda name: CASES[name].destructive)
+    operations = {}
+    for name in names:
+        case = CASES[name]
+        count = 1 if case.destructive else min(calls, SCAN_CALLS) if case.scan else calls
+        operations[name] = time_operation(db, world, name, case, count, rng)
+        print(f"{size:>9}  {name:<52} {operations[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+    close(db)
+    return {"size": size, "load_seconds": round(load_seconds, 3), "operations": operations}
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict, baseline: Dict) -> None:
+    """Print median times next to a baseline run; ratios above 1 are slowdowns."""
+    previous = {entry["size"]: entry["operations"] for entry in baseline["results"]}
+    print(f"{'size':>9}  {'operation':<52} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for entry in results["results"]:
+        for name, current in entry["operations"].items():
+            before = previous.get(entry["size"], {}).get(name)
+            if before is None:
+                continue
+            ratio = current["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+            print(f"{entry['size']:>9}  {name:<52} {before['median_ms']:>10.3f} {current['median_ms']:>10.3f} "
+                  f"{ratio:>6.2f}x")
+
+def run(sizes: List[int], backend: str, calls: int, seed: int, only: Optional[List[str]] = None) -> Dict:
+    missing = sorted(set(operation_names()) - set(CASES))
+    if missing:
+        raise SystemExit(f"No benchmark case for: {', '.join(missing)}")
+    return {
+        "benchmark": "operations",
+        "commit": _commit(),
+        "backend": backend,
+        "seed": seed,
+        "python": platform.python_version(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "results": [run_size(size, backend, calls, seed, only) for size in sizes],
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time every database operation on a synthetic world")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="Comma-separated world sizes (characters), e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--backend", default="memory",
+                        help="Storage backend: memory, sqlite::memory:, sqlite:<path> or a MongoDB URI")
+    parser.add_argument("--calls", type=int, default=20, help="Calls per operation (scans are capped at 3)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic world")
+    parser.add_argument("--only", default=None, help="Comma-separated substrings selecting operations to run")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", default=None, help="A previous JSON results file to compare against")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run([int(size) for size in args.sizes.split(",")], args.backend, args.calls, args.seed,
+                  args.only.split(",") if args.only else None)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    elif not args.compare:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
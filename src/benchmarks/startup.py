@@ -0,0 +1,146 @@
+"""
+Time how quickly the MCP server starts answering over stdio.
+
+Each run spawns `python src/dm.py` and measures, from the moment the process
+is started, the MCP initialize handshake, the first tools/list (which builds
+the tool schemas) and the first tool call (which connects to the database and
+builds the unique indexes; the rest are built in the background). The time
+to import mcp's FastMCP alone is measured too: it is the floor no server
+built on it can start under. Run from the repository root:
+
+    PYTHONPATH=src python -m benchmarks.startup --runs 5
+    PYTHONPATH=src python -m benchmarks.startup --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from statistics import median
+from typing import Dict, List, Optional
+
+from .operations import _commit
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dm.py")
+PROTOCOL_VERSION = "2025-06-18"
+PHASES = ("mcp_import_ms", "handshake_ms", "list_tools_ms", "first_call_ms")
+
+def _request(process: subprocess.Popen, request_id: int, method: str, params: Dict) -> Dict:
+    """Send a JSON-RPC request and wait for its response, skipping anything else the server prints."""
+    process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}) + "\n")
+    process.stdin.flush()
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Server exited before answering {method}: {process.stderr.read()}")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("id") == request_id:
+            if "error" in message:
+                raise RuntimeError(f"{method} failed: {message['error']}")
+            return message["result"]
+
+def _notify(process: subprocess.Popen, method: str) -> None:
+    process.stdin.write(json.dumps({"jsonrpc": "2.0", "method": method}) + "\n")
+    process.stdin.flush()
+
+def time_mcp_import() -> float:
+    """Milliseconds from spawning a Python process to it having imported FastMCP (not to its exit)."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", "import mcp.server.fastmcp; print(flush=True)"],
+                               stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    imported = time.perf_counter()
+    process.communicate()
+    return (imported - started) * 1000
+
+def time_startup(backend: str, directory: str) -> Dict[str, float]:
+    """Milliseconds from spawning the server to each response."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SERVER, "--db-name", "bench_startup", "--backend", backend],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=directory,
+    )
+    try:
+        _request(process, 1, "initialize", {
+            "protocolVersion": PROTOCOL_VERSION, "capabilities": {},
+            "clientInfo": {"name": "benchmarks.startup", "version": "1"},
+        })
+        handshake = time.perf_counter()
+        _notify(process, "notifications/initialized")
+        _request(process, 2, "tools/list", {})
+        list_tools = time.perf_counter()
+        _request(process, 3, "tools/call", {"name": "get_database_info_tool", "arguments": {}})
+        first_call = time.perf_counter()
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+    return {
+        "handshake_ms": (handshake - started) * 1000,
+        "list_tools_ms": (list_tools - handshake) * 1000,
+        "first_call_ms": (first_call - list_tools) * 1000,
+    }
+
+def run(backend: str, runs: int) -> Dict:
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    with tempfile.TemporaryDirectory() as directory:
+        for run_number in range(runs):
+            samples["mcp_import_ms"].append(time_mcp_import())
+            for phase, value in time_startup(backend, directory).items():
+                samples[phase].append(value)
+            print(f"run {run_number + 1}: " + "  ".join(f"{phase} {samples[phase][-1]:.1f}" for phase in PHASES),
+                  file=sys.stderr)
+    results = {phase: round(median(values), 3) for phase, values in samples.items()}
+    # What the server itself adds to the handshake on top of importing mcp
+    results["handshake_over_mcp_import_ms"] = round(results["handshake_ms"] - results["mcp_import_ms"], 3)
+    return {
+        "benchmark": "startup",
+        "commit": _commit(),
+        "backend": backend,
+        "runs": runs,
+        "python": platform.python_version(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+def compare(results: Dict, baseline: Dict) -> None:
+    """Print median times next to a baseline run; ratios above 1 are slowdowns."""
+    print(f"{'phase':<30} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for phase, current in results["results"].items():
+        before = baseline["results"].get(phase)
+        if before is None:
+            continue
+        ratio = current / before if before else float("inf")
+        print(f"{phase:<30} {before:>10.3f} {current:>10.3f} {ratio:>6.2f}x")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time MCP server startup over stdio")
+    parser.add_argument("--backend", default="memory",
+                        help="Storage backend: memory, sqlite::memory:, sqlite:<path> or a MongoDB URI")
+    parser.add_argument("--runs", type=int, default=5, help="Server starts to take the median of")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", default=None, help="A previous JSON results file to compare against")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run(args.backend, args.runs)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    elif not args.compare:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
@@ -0,0 +1,204 @@
+"""
+Seeded synthetic worlds for benchmarks.
+
+A world of size N holds N characters with payloads as full as docs/fizwick.json
+(ability scores, modifiers, proficiencies, personality, spells, equipment),
+one campaign per CHARACTERS_PER_CAMPAIGN characters and one setting per
+CHARACTERS_PER_SETTING characters, arranged as regions > towns > sites with
+the materialized paths setting_operations keeps. The same size and seed always
+produce the same documents, IDs included, so results from different commits
+measure the same data.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+from bson.objectid import ObjectId
+from database.db_operations import Database
+from database.name_index import index_names_many
+
+CHARACTERS_PER_CAMPAIGN = 100
+CHARACTERS_PER_SETTING = 10
+LOAD_BATCH_SIZE = 1000
+
+SYLLABLES = ["fiz", "wick", "bru", "enor", "driz", "zt", "tha", "lia", "mor", "gan",
+             "el", "dra", "kor", "vin", "sha", "rel", "ost", "ara", "gorn", "eth"]
+RACES = ["Human", "Forest Gnome", "Rock Gnome", "High Elf", "Wood Elf", "Hill Dwarf",
+         "Mountain Dwarf", "Lightfoot Halfling", "Half-Orc", "Tiefling", "Dragonborn"]
+CLASSES = {
+    "Wizard": ["Order of Scribes", "School of Evocation", "School of Divination"],
+    "Fighter": ["Champion", "Battle Master", "Eldritch Knight"],
+    "Cleric": ["Life Domain", "Light Domain", "Trickery Domain"],
+    "Rogue": ["Thief", "Assassin", "Arcane Trickster"],
+    "Ranger": ["Hunter", "Beast Master", "Gloom Stalker"],
+    "Bard": ["College of Lore", "College of Valor"],
+}
+CASTERS = {"Wizard", "Cleric", "Bard", "Ranger"}
+BACKGROUNDS = ["Sage", "Soldier", "Acolyte", "Criminal", "Folk Hero", "Noble", "Outlander", "Hermit"]
+ABILITIES = ["strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma"]
+SKILLS = ["Arcana", "History", "Investigation", "Insight", "Athletics", "Perception",
+          "Stealth", "Survival", "Persuasion", "Deception", "Medicine", "Religion"]
+WEAPONS = ["Daggers", "Darts", "Slings", "Quarterstaffs", "Light Crossbows", "Longswords", "Shortbows"]
+LANGUAGES = ["Common", "Gnomish", "Elvish", "Sylvan", "Dwarvish", "Infernal", "Draconic"]
+EQUIPMENT = ["Spellbook", "Component pouch", "Explorer's pack", "Bedroll", "Rope (50 ft)",
+             "Rations (5 days)", "Healing potion", "Lantern", "Chain mail", "Shield"]
+SPELLS = {
+    "cantrips": ["Prestidigitation", "Fire Bolt", "Mage Hand", "Minor Illusion", "Light", "Guidance"],
+    "level_1": ["Find Familiar", "Mage Armor", "Identify", "Chromatic Orb", "Detect Magic", "Cure Wounds"],
+    "level_2": ["Misty Step", "Hold Person", "Invisibility", "Spiritual Weapon"],
+    "level_3": ["Fireball", "Counterspell", "Revivify", "Fly"],
+}
+WORDS = ["ancient", "magic", "forest", "quill", "tower", "river", "ruins", "dragon", "library",
+         "secret", "guild", "storm", "harbor", "crypt", "market", "festival", "oath", "shadow"]
+REGIONS = ["Sword Coast", "Neverwinter Wood", "Dalelands", "Moonshae Isles", "Icewind Dale"]
+SETTING_TYPES = {0: ["Region", "Kingdom"], 1: ["City", "Town", "Village", "Fortress"],
+                 2: ["Tavern", "Temple", "Dungeon", "Forest", "Market"]}
+
+@dataclass
+class World:
+    """IDs and names of everything load_world inserted, for picking benchmark arguments."""
+    size: int
+    seed: int
+    campaign_ids: List[str] = field(default_factory=list)
+    campaign_names: List[str] = field(default_factory=list)
+    character_ids: List[str] = field(default_factory=list)
+    character_names: List[str] = field(default_factory=list)
+    setting_ids: List[str] = field(default_factory=list)
+    setting_names: List[str] = field(default_factory=list)
+    parent_ids: List[str] = field(default_factory=list)
+
+def name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def object_id(rng: random.Random) -> ObjectId:
+    return ObjectId(bytes(rng.getrandbits(8) for _ in range(12)))
+
+def _timestamps(number: int) -> Dict[str, str]:
+    moment = (datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=number)).isoformat()
+    return {"created_at": moment, "updated_at": moment}
+
+def _with_id(rng: random.Random, document: Dict) -> Dict:
+    oid = object_id(rng)
+    return {"_id": oid, "id": str(oid), **document}
+
+def campaign_document(rng: random.Random, number: int) -> Dict:
+    return _with_id(rng, {
+        "name": f"The {name(rng)} Saga {number}",
+        "description": sentence(rng, 12),
+        **_timestamps(number),
+    })
+
+def character_document(rng: random.Random, number: int, campaign_id: str) -> Dict:
+    character_class = rng.choice(list(CLASSES))
+    level = rng.randint(1, 20)
+    scores = {ability: rng.randint(8, 18) for ability in ABILITIES}
+    document = {
+        "campaign_id": campaign_id,
+        "name": f"{name(rng)} {name(rng)} {number}",
+        "player_name": name(rng),
+        "race": rng.choice(RACES),
+        "class": character_class,
+        "subclass": rng.choice(CLASSES[character_class]),
+        "background": rng.choice(BACKGROUNDS),
+        "level": level,
+        "ability_scores": scores,
+        "modifiers": {ability: (score - 10) // 2 for ability, score in scores.items()},
+        "proficiencies": {
+            "saving_throws": [ability.capitalize() for ability in rng.sample(ABILITIES, 2)],
+            "skills": rng.sample(SKILLS, 4),
+            "weapons": rng.sample(WEAPONS, 3),
+            "armor": [],
+            "tools": [],
+            "languages": rng.sample(LANGUAGES, 3),
+        },
+        "personality": {key: sentence(rng, 10) for key in ("trait", "ideal", "bond", "flaw")},
+        "backstory": " ".join(sentence(rng, 15) for _ in range(6)),
+        "equipment": rng.sample(EQUIPMENT, 5),
+        "spells": None,
+        "familiar": None,
+        "motivations": [sentence(rng, 8) for _ in range(3)],
+        "data": {"campaign_progress": {"experience_points": rng.randint(0, 355000)}},
+        **_timestamps(number),
+    }
+    if character_class in CASTERS:
+        levels = ["cantrips"] + [f"level_{spell_level}" for spell_level in range(1, min(3, (level + 1) // 2) + 1)]
+        document["spells"] = {spell_level: rng.sample(SPELLS[spell_level], 3) for spell_level in levels}
+    if character_class == "Wizard":
+        document["familiar"] = {"type": "Owl", "name": name(rng), "special_abilities": ["Flyby", "Keen Hearing"]}
+    return _with_id(rng, document)
+
+def setting_document(rng: random.Random, number: int, depth: int, parent_id: Optional[str]) -> Dict:
+    return _with_id(rng, {
+        "setting_type": rng.choice(SETTING_TYPES[depth]),
+        "name": f"{name(rng)} {number}",
+        "region": rng.choice(REGIONS),
+        "scale": rng.choice(["small", "medium", "large"]),
+        "population": f"{rng.randint(10, 100000)} inhabitants",
+        "first_impression": sentence(rng, 20),
+        "distinctive_features": [sentence(rng, 6) for _ in range(3)],
+        "atmosphere": sentence(rng, 10),
+        "key_locations": [name(rng) for _ in range(5)],
+        "factions": [f"The {name(rng)} {rng.choice(WORDS)}" for _ in range(2)],
+        "recent_history": sentence(rng, 20),
+        "parent_id": parent_id,
+        **_timestamps(number),
+    })
+
+def generate_world(size: int, seed: int = 42) -> Iterator[tuple]:
+    """Yield (collection, document) pairs: campaigns first, then characters, then settings."""
+    rng = random.Random(seed)
+    campaign_ids = []
+    for number in range(max(1, size // CHARACTERS_PER_CAMPAIGN)):
+        campaign = campaign_document(rng, number)
+        campaign_ids.append(campaign["id"])
+        yield "campaigns", campaign
+    for number in range(size):
+        yield "characters", character_document(rng, number, campaign_ids[number % len(campaign_ids)])
+    # A tenth of the settings are top-level regions, the rest hang off an earlier setting one level up
+    levels: List[List[str]] = [[], [], []]
+    # Materialized paths, as setting_operations keeps them ("/<region>/<town>/<site>/")
+    paths: Dict[str, str] = {}
+    for number in range(max(1, size // CHARACTERS_PER_SETTING)):
+        depth = 0 if number % 10 == 0 else rng.choice([1, 1, 2])
+        if depth and not levels[depth - 1]:
+            depth = 0
+        parent_id = rng.choice(levels[depth - 1]) if depth else None
+        setting = setting_document(rng, number, depth, parent_id)
+        setting["path"] = f"{paths[parent_id] if parent_id else '/'}{setting['id']}/"
+        paths[setting["id"]] = setting["path"]
+        levels[depth].append(setting["id"])
+        yield "settings", setting
+
+def load_world(db: Database, size: int, seed: int = 42, batch_size: int = LOAD_BATCH_SIZE) -> World:
+    """Insert a generated world in batches, bypassing the per-document write path."""
+    world = World(size=size, seed=seed)
+    batches: Dict[str, List[Dict]] = {"campaigns": [], "characters": [], "settings": []}
+    for collection, document in generate_world(size, seed):
+        if collection == "campaigns":
+            world.campaign_ids.append(document["id"])
+            world.campaign_names.append(document["name"])
+        elif collection == "characters":
+            world.character_ids.append(document["id"])
+            world.character_names.append(document["name"])
+        else:
+            world.setting_ids.append(document["id"])
+            world.setting_names.append(document["name"])
+            if document["parent_id"] is None:
+                world.parent_ids.append(document["id"])
+        batch = batches[collection]
+        batch.append(document)
+        if len(batch) >= batch_size:
+            _insert_batch(db, collection, batch)
+            batches[collection] = []
+    for collection, batch in batches.items():
+        if batch:
+            _insert_batch(db, collection, batch)
+    return world
+
+def _insert_batch(db: Database, collection: str, documents: List[Dict]) -> None:
+    db.backend.get_collection(collection).insert_many(documents)
+    index_names_many(db, collection, documents)
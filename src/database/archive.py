@@ -0,0 +1,173 @@
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from models.archive import ExportReport
+from models.import_report import ImportReport, RecordError
+from .campaign_operations import get_campaign
+from .db_operations import Database
+from .name_index import index_names_many
+from .pagination import MAX_PAGE_SIZE, fetch_page
+from .setting_operations import rebuild_setting_paths
+
+ARCHIVE_FORMAT = "dm-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_COLLECTIONS = ("campaigns", "characters", "settings")
+
+def open_archive(path: str, mode: str) -> TextIO:
+    """
+    Open an archive for streaming text in mode "r" or "w".
+
+    The extension picks the compression: .gz for gzip, .zst for zstd (needs
+    the zstandard package), anything else is plain JSONL.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd archives need the zstandard package (pip install zstandard); use .gz instead")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor(threads=-1).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def iter_collection(collection, filter: Dict, batch_size: int = MAX_PAGE_SIZE) -> Iterator[Dict]:
+    """Stream every matching document in _id order, holding at most one batch in memory."""
+    cursor = None
+    while True:
+        documents, cursor = fetch_page(collection, filter, batch_size, cursor)
+        yield from documents
+        if cursor is None:
+            return
+
+def export_campaign(db: Database, campaign_id: str, path: str, include_settings: bool = True,
+                    batch_size: int = MAX_PAGE_SIZE) -> ExportReport:
+    """
+    Write a campaign, its characters and (optionally) all settings to a JSONL archive.
+
+    Settings are not tied to campaigns, so include_settings exports every setting.
+    Each line after the header is {"collection": ..., "document": ...}.
+    """
+    get_campaign(db, campaign_id)
+    # Buffered character changes belong in the archive
+    if db.write_behind.has_pending():
+        db.write_behind.flush()
+    start = time.perf_counter()
+    counts = {collection: 0 for collection in ARCHIVE_COLLECTIONS}
+    sources = [
+        ("campaigns", db.campaigns_collection, {"id": campaign_id}),
+        ("characters", db.characters_collection, {"campaign_id": campaign_id}),
+    ]
+    if include_settings:
+        sources.append(("settings", db.settings_collection, {}))
+    with open_archive(path, "w") as archive:
+        archive.write(json.dumps({
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "campaign_id": campaign_id,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+        }) + "\n")
+        for name, collection, filter in sources:
+            for document in iter_collection(collection, filter, batch_size):
+                document.pop("_id", None)
+                archive.write(json.dumps({"collection": name, "document": document}, default=str) + "\n")
+                counts[name] += 1
+    seconds = time.perf_counter() - start
+    total = sum(counts.values())
+    return ExportReport(
+        path=path,
+        campaign_id=campaign_id,
+        counts=counts,
+        bytes=os.path.getsize(path),
+        seconds=round(seconds, 3),
+        documents_per_second=round(total / seconds, 1) if seconds else 0.0,
+    )
+
+def restore_archive(db: Database, path: str, batch_size: int = MAX_PAGE_SIZE) -> ImportReport:
+    """
+    Load an archive written by export_campaign, keeping the original IDs.
+
+    Documents are inserted in unordered batches; any that already exist (same ID
+    or name) are reported as errors and the rest are restored.
+    """
+    if not os.path.isfile(path):
+        raise ValueError(f"File '{path}' does not exist.")
+    start = time.perf_counter()
+    records = restored = 0
+    restored_settings = False
+    errors: List[RecordError] = []
+    pending: Dict[str, List] = {collection: [] for collection in ARCHIVE_COLLECTIONS}
+    name = os.path.basename(path)
+    with open_archive(path, "r") as archive:
+        _check_header(archive.readline(), path)
+        for number, line in enumerate(archive, start=2):
+            if not line.strip():
+                continue
+            records += 1
+            entry = json.loads(line)
+            collection, document = entry.get("collection"), entry.get("document")
+            if collection not in pending or not isinstance(document, dict):
+                errors.append(RecordError(location=f"{name}:{number}", error="Not an archived document"))
+                continue
+            if ObjectId.is_valid(document.get("id", "")):
+                document["_id"] = ObjectId(document["id"])
+            pending[collection].append((f"{name}:{number}", document))
+            if len(pending[collection]) >= batch_size:
+                restored += _restore_batch(db, collection, pending[collection], errors)
+                restored_settings = restored_settings or collection == "settings"
+                pending[collection] = []
+    for collection, batch in pending.items():
+        if batch:
+            restored += _restore_batch(db, collection, batch, errors)
+            restored_settings = restored_settings or collection == "settings"
+    if restored_settings:
+        # Archived paths are rewritten only where they no longer match the parent_id links
+        rebuild_setting_paths(db)
+    seconds = time.perf_counter() - start
+    return ImportReport(
+        files=[path],
+        records=records,
+        imported=restored,
+        failed=records - restored,
+        errors=errors,
+        seconds=round(seconds, 3),
+        records_per_second=round(records / seconds, 1) if seconds else 0.0,
+    )
+
+def _check_header(line: str, path: str) -> None:
+    try:
+        header = json.loads(line)
+    except json.JSONDecodeError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError(f"'{path}' is not a campaign archive")
+    if header.get("version", 0) > ARCHIVE_VERSION:
+        raise ValueError(f"'{path}' was written by a newer version (archive version {header['version']})")
+
+def _restore_batch(db: Database, collection: str, batch: List, errors: List[RecordError]) -> int:
+    failed = set()
+    try:
+        db.backend.get_collection(collection).insert_many([document for _, document in batch], ordered=False)
+    except BulkWriteError as error:
+        for write_error in error.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            location, document = batch[write_error["index"]]
+            errors.append(RecordError(
+                location=location,
+                error=f"{collection[:-1].capitalize()} '{document.get('name')}' ({document.get('id')}) already exists",
+            ))
+    written = [document for index, (_, document) in enumerate(batch) if index not in failed]
+    index_names_many(db, collection, written)
+    db.stats.invalidate(collection)
+    return len(written)
@@ -0,0 +1,112 @@
+from typing import List, Optional, Union
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models.campaign import Campaign
+from models.campaign_stats import CampaignStats
+from models.page import Page
+from models.search import SearchHit
+from .db_operations import Database
+from .pagination import DEFAULT_PAGE_SIZE, fetch_page_async
+from .name_index import index_names_async, unindex_names_async, clear_names_async, lookup_by_name_async
+from .projection import build_projection, project_model, project_result
+from .campaign_operations import (
+    _build_campaign_document,
+    _build_campaign_update,
+    _build_campaign_page,
+    _build_campaign_stats,
+    _campaign_stats_pipeline,
+    _campaign_results,
+    _campaign_search_filter,
+    _convert_to_campaign
+)
+
+async def create_campaign(db: Database, name: str, description: str) -> Campaign:
+    campaign = _build_campaign_document(name, description)
+    try:
+        await db.async_campaigns_collection.insert_one(campaign)
+    except DuplicateKeyError:
+        raise ValueError(f"A campaign with the name '{name}' already exists")
+    await index_names_async(db, "campaigns", campaign)
+    db.stats.invalidate("campaigns")
+    return db.entity_cache.put("campaigns", campaign["id"], _convert_to_campaign(campaign))
+
+async def update_campaign(db: Database, campaign_id: str, name: str, description: str) -> Campaign:
+    try:
+        updated_campaign = await db.async_campaigns_collection.find_one_and_update(
+            {"id": campaign_id},
+            {"$set": _build_campaign_update(name, description)},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise ValueError(f"A campaign with the name '{name}' already exists")
+    if not updated_campaign:
+        raise ValueError(f"Campaign with ID {campaign_id} does not exist.")
+    await index_names_async(db, "campaigns", updated_campaign)
+    db.stats.invalidate("campaigns")
+    return db.entity_cache.put("campaigns", campaign_id, _convert_to_campaign(updated_campaign))
+
+async def delete_campaign(db: Database, campaign_id: str) -> bool:
+    result = await db.async_campaigns_collection.delete_one({"id": campaign_id})
+    db.entity_cache.invalidate("campaigns", campaign_id)
+    db.stats.invalidate("campaigns")
+    await unindex_names_async(db, "campaigns", campaign_id)
+    return result.deleted_count > 0
+
+async def search_campaigns(db: Database, query: str, fields: Optional[List[str]] = None) -> List[Union[Campaign, dict]]:
+    projection = build_projection(Campaign, fields)
+    results = await db.async_campaigns_collection.find(_campaign_search_filter(query), projection).to_list(length=None)
+    return _campaign_results(results, fields)
+
+async def text_search_campaigns(db: Database, query: str, limit: int = 10) -> List[SearchHit]:
+    hits = await db.text_search_async("campaigns", query, limit=limit)
+    return [SearchHit(score=score, item=_convert_to_campaign(campaign)) for campaign, score in hits]
+
+async def lookup_campaigns_by_name(db: Database, fragment: str, limit: int = 10) -> List[Campaign]:
+    campaigns = await lookup_by_name_async(db, "campaigns", fragment, limit=limit)
+    return [_convert_to_campaign(campaign) for campaign in campaigns]
+
+async def get_campaign(db: Database, campaign_id: str, fields: Optional[List[str]] = None) -> Union[Campaign, dict]:
+    projection = build_projection(Campaign, fields)
+    cached = db.entity_cache.get("campaigns", campaign_id)
+    if cached is not None:
+        return project_model(cached, fields) if fields else cached
+    campaign = await db.async_campaigns_collection.find_one({"id": campaign_id}, projection)
+    if not campaign:
+        raise ValueError(f"Campaign with ID {campaign_id} does not exist.")
+    if fields:
+        # Trimmed documents are not cached
+        return project_result(campaign, fields)
+    return db.entity_cache.put("campaigns", campaign_id, _convert_to_campaign(campaign))
+
+async def get_campaign_stats(db: Database, campaign_id: str) -> CampaignStats:
+    """Summarize a campaign's characters in one aggregation, returning only the summary."""
+    await get_campaign(db, campaign_id)
+    # The pipeline reads stored levels, ability scores and spells, so buffered character changes go first
+    if db.write_behind.has_pending():
+        await db.offload(db.write_behind.flush)
+    cursor = db.async_characters_collection.aggregate(_campaign_stats_pipeline(campaign_id))
+    return _build_campaign_stats(campaign_id, await cursor.to_list(length=None))
+
+async def get_campaign_by_name(db: Database, name: str) -> Optional[Campaign]:
+    campaign = await db.async_campaigns_collection.find_one({"name": name})
+    if not campaign:
+        return None
+    return _convert_to_campaign(campaign)
+
+async def list_campaigns(db: Database) -> List[Campaign]:
+    campaigns = await db.async_campaigns_collection.find().to_list(length=None)
+    return [_convert_to_campaign(campaign) for campaign in campaigns]
+
+async def list_campaigns_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                             fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    projection = build_projection(Campaign, fields)
+    documents, next_cursor = await fetch_page_async(db.async_campaigns_collection, {}, limit, cursor, projection)
+    total = await db.async_campaigns_collection.count_documents({}) if include_total else None
+    return _build_campaign_page(documents, next_cursor, fields, total)
+
+async def delete_all_campaigns(db: Database) -> int:
+    result = await db.async_campaigns_collection.delete_many({})
+    db.entity_cache.clear("campaigns")
+    db.stats.invalidate("campaigns")
+    await clear_names_async(db, "campaigns")
+    return result.deleted_count
@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from models.character import Character
+from models.patch import PatchOperation
+from models.page import Page
+from models.search import SearchHit
+from .db_operations import Database
+from .decoding import validate_update
+from .pagination import DEFAULT_PAGE_SIZE, fetch_page_async
+from .name_index import index_names_async, unindex_names_async, clear_names_async, lookup_by_name_async
+from .projection import build_projection, project_model, project_result
+from .patch import empty_containers, overlapping, patched_paths
+from .async_campaign_operations import get_campaign
+from .character_operations import (
+    CHARACTER_FIELD_ALIASES,
+    _build_character_page,
+    _build_character_document,
+    _build_character_update,
+    _character_results,
+    _character_search_filter,
+    _compile_character_patch,
+    _convert_db_character_to_model,
+    _defer_character_patch,
+    _defer_character_update,
+    _NULL_PATH_ERRORS
+)
+
+async def create_character(db: Database, character: Character) -> Character:
+    # Verify campaign exists (usually answered by the entity cache without a round trip)
+    try:
+        await get_campaign(db, character.campaign_id)
+    except ValueError:
+        raise ValueError(f"Campaign with ID {character.campaign_id} does not exist.")
+    
+    character_dict = _build_character_document(character)
+    try:
+        await db.async_characters_collection.insert_one(character_dict)
+    except DuplicateKeyError:
+        raise ValueError(f"Character with name '{character.name}' already exists.")
+    await index_names_async(db, "characters", character_dict)
+    db.stats.invalidate("characters", character_dict["campaign_id"])
+    return db.entity_cache.put("characters", character_dict["id"], _convert_db_character_to_model(character_dict))
+
+async def _take_pending(db: Database, character_id: str) -> dict:
+    """The character's buffered changes; while a flush is writing them, they are waited for off the loop."""
+    pending = db.write_behind.try_take(character_id)
+    if pending is None:
+        pending = await db.offload(db.write_behind.take, character_id)
+    return pending
+
+async def update_character(db: Database, character_id: str, **kwargs) -> Character:
+    validate_update(Character, kwargs)
+    if db.write_behind.covers(kwargs):
+        return _defer_character_update(db, await get_character(db, character_id), kwargs)
+    # Buffered changes go out with this write, so an older flush cannot overwrite it
+    pending = await _take_pending(db, character_id)
+    try:
+        updated_character = await db.async_characters_collection.find_one_and_update(
+            {"id": character_id},
+            {"$set": {**pending, **_build_character_update(kwargs)}},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        db.write_behind.restore(character_id, pending)
+        raise ValueError(f"Character with name '{kwargs.get('name')}' already exists.")
+    except Exception:
+        # Buffered changes outlive a failed write; the next write or flush takes them again
+        db.write_behind.restore(character_id, pending)
+        raise
+    if not updated_character:
+        raise ValueError(f"Character with ID {character_id} does not exist.")
+    await index_names_async(db, "characters", updated_character)
+    # A character moved to another campaign changes two breakdowns, so all are dropped
+    db.stats.invalidate("characters", None if "campaign_id" in kwargs else updated_character.get("campaign_id"))
+    return db.entity_cache.put("characters", character_id, _convert_db_character_to_model(updated_character))
+
+async def patch_character(db: Database, character_id: str, operations: List[PatchOperation]) -> Character:
+    update = _compile_character_patch(operations)
+    roots = {path.split(".")[0] for path in patched_paths(update)}
+    if db.write_behind.covers(dict.fromkeys(roots)):
+        return _defer_character_patch(db, await get_character(db, character_id), update)
+    pending = await _take_pending(db, character_id)
+    collection = db.async_characters_collection
+    try:
+        if overlapping(pending, patched_paths(update)):
+            # MongoDB rejects an update changing a path twice, so buffered changes to the patched fields go first
+            await collection.update_one({"id": character_id}, {"$set": pending})
+            pending = {}
+        update["$set"] = {**pending, **update.get("$set", {}), "updated_at": datetime.now(timezone.utc).isoformat()}
+        try:
+            updated_character = await collection.find_one_and_update(
+                {"id": character_id}, update, return_document=ReturnDocument.AFTER
+            )
+        except OperationFailure as error:
+            if error.code not in _NULL_PATH_ERRORS:
+                raise
+            for path, empty in empty_containers(update):
+                await collection.update_one({"id": character_id, path: None}, {"$set": {path: empty}})
+            updated_character = await collection.find_one_and_update(
+                {"id": character_id}, update, return_document=ReturnDocument.AFTER
+            )
+    except Exception:
+        db.write_behind.restore(character_id, pending)
+        raise
+    if not updated_character:
+        raise ValueError(f"Character with ID {character_id} does not exist.")
+    db.stats.invalidate("characters", updated_character.get("campaign_id"))
+    return db.entity_cache.put("characters", character_id, _convert_db_character_to_model(updated_character))
+
+async def delete_character(db: Database, character_id: str) -> bool:
+    result = await db.async_characters_collection.delete_one({"id": character_id})
+    db.write_behind.discard(character_id)
+    db.entity_cache.invalidate("characters", character_id)
+    # The deleted character's campaign is not known here, so every breakdown is dropped
+    db.stats.invalidate("characters")
+    await unindex_names_async(db, "characters", character_id)
+    return result.deleted_count > 0
+
+async def get_character(db: Database, character_id: str, fields: Optional[List[str]] = None) -> Union[Character, dict]:
+    projection = build_projection(Character, fields, CHARACTER_FIELD_ALIASES)
+    cached = db.entity_cache.get("characters", character_id)
+    if cached is not None:
+        return project_model(cached, fields, CHARACTER_FIELD_ALIASES) if fields else cached
+    character = db.write_behind.overlay(await db.async_characters_collection.find_one({"id": character_id}, projection))
+    if not character:
+        raise ValueError(f"Character with ID {character_id} does not exist.")
+    if fields:
+        # Trimmed documents are not cached
+        return project_result(character, fields, CHARACTER_FIELD_ALIASES)
+    return db.entity_cache.put("characters", character_id, _convert_db_character_to_model(character))
+
+async def get_character_by_name(db: Database, name: str) -> Character:
+    character = db.write_behind.overlay(await db.async_characters_collection.find_one({"name": name}))
+    if not character:
+        raise ValueError(f"Character with name '{name}' does not exist.")
+    return _convert_db_character_to_model(character)
+
+async def list_characters(db: Database) -> List[Character]:
+    characters = db.write_behind.overlay_all(await db.async_characters_collection.find().to_list(length=None))
+    return [_convert_db_character_to_model(character) for character in characters]
+
+async def list_campaign_characters(db: Database, campaign_id: str) -> List[Character]:
+    characters = await db.async_characters_collection.find({"campaign_id": campaign_id}).to_list(length=None)
+    characters = db.write_behind.overlay_all(characters)
+    return [_convert_db_character_to_model(character) for character in characters]
+
+async def list_characters_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    return await _list_characters_page(db, {}, limit, cursor, fields, include_total)
+
+async def list_campaign_characters_page(db: Database, campaign_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                        cursor: Optional[str] = None, fields: Optional[List[str]] = None,
+                                        include_total: bool = False) -> Page:
+    return await _list_characters_page(db, {"campaign_id": campaign_id}, limit, cursor, fields, include_total)
+
+async def _list_characters_page(db: Database, filter: dict, limit: int, cursor: Optional[str],
+                                fields: Optional[List[str]], include_total: bool) -> Page:
+    projection = build_projection(Character, fields, CHARACTER_FIELD_ALIASES)
+    documents, next_cursor = await fetch_page_async(db.async_characters_collection, filter, limit, cursor, projection)
+    total = await db.async_characters_collection.count_documents(filter) if include_total else None
+    return _build_character_page(db.write_behind.overlay_all(documents), next_cursor, fields, total)
+
+async def search_characters(db: Database, query: str = None, campaign_id: Optional[str] = None,
+                            character_class: Optional[str] = None, race: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> List[Union[Character, dict]]:
+    search_query = _character_search_filter(query, campaign_id, character_class, race)
+    projection = build_projection(Character, fields, CHARACTER_FIELD_ALIASES)
+    characters = await db.async_characters_collection.find(search_query, projection).to_list(length=None)
+    return _character_results(db.write_behind.overlay_all(characters), fields)
+
+async def lookup_characters_by_name(db: Database, fragment: str, campaign_id: Optional[str] = None,
+                                    limit: int = 10) -> List[Character]:
+    filter = {"campaign_id": campaign_id} if campaign_id is not None else None
+    characters = db.write_behind.overlay_all(await lookup_by_name_async(db, "characters", fragment, filter, limit))
+    return [_convert_db_character_to_model(character) for character in characters]
+
+async def text_search_characters(db: Database, query: str, campaign_id: Optional[str] = None,
+                                 limit: int = 10) -> List[SearchHit]:
+    filter = {"campaign_id": campaign_id} if campaign_id is not None else None
+    hits = await db.text_search_async("characters", query, filter, limit)
+    return [SearchHit(score=score, item=_convert_db_character_to_model(db.write_behind.overlay(character)))
+            for character, score in hits]
+
+async def delete_all_characters(db: Database) -> int:
+    result = await db.async_characters_collection.delete_many({})
+    db.write_behind.discard()
+    db.entity_cache.clear("characters")
+    db.stats.invalidate("characters")
+    await clear_names_async(db, "characters")
+    return result.deleted_count
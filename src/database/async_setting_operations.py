@@ -0,0 +1,180 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Union
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models.setting import Setting, SettingTree
+from models.page import Page
+from models.search import SearchHit
+from .db_operations import Database
+from .decoding import validate_update
+from .pagination import DEFAULT_PAGE_SIZE, fetch_page_async
+from .name_index import index_names_async, unindex_names_async, clear_names_async, lookup_by_name_async
+from .projection import build_projection, project_model, project_result
+from .setting_operations import (
+    _build_setting_page,
+    _build_setting_document,
+    _build_setting_tree,
+    _check_path_not_set,
+    _in_path_order,
+    _moved_path,
+    _path_ids,
+    _setting_path,
+    _setting_results,
+    _setting_search_filter,
+    _subtree_filter,
+    _convert_to_setting
+)
+
+async def create_setting(db: Database, **setting_data: Dict[str, Any]) -> Setting:
+    _check_path_not_set(setting_data)
+    setting_doc = _build_setting_document(setting_data)
+    setting_doc["path"] = _setting_path(await _parent_path(db, setting_doc.get("parent_id")), setting_doc["id"])
+    try:
+        await db.async_settings_collection.insert_one(setting_doc)
+    except DuplicateKeyError:
+        raise ValueError(f"A setting with the name '{setting_data['name']}' already exists")
+    await index_names_async(db, "settings", setting_doc)
+    db.stats.invalidate("settings")
+    return db.entity_cache.put("settings", setting_doc["id"], _convert_to_setting(setting_doc))
+
+async def update_setting(db: Database, setting_id: str, **update_data: Dict[str, Any]) -> Setting:
+    validate_update(Setting, update_data)
+    _check_path_not_set(update_data)
+    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    old_path = None
+    if "parent_id" in update_data:
+        current = await db.async_settings_collection.find_one({"id": setting_id}, {"path": 1})
+        if not current:
+            raise ValueError(f"Setting with ID {setting_id} does not exist.")
+        old_path = current.get("path")
+        update_data["path"] = _moved_path(setting_id, await _parent_path(db, update_data["parent_id"]))
+    try:
+        updated_setting = await db.async_settings_collection.find_one_and_update(
+            {"id": setting_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise ValueError(f"A setting with the name '{update_data.get('name')}' already exists")
+    if not updated_setting:
+        raise ValueError(f"Setting with ID {setting_id} does not exist.")
+    if old_path is not None and old_path != update_data["path"]:
+        await _repath_descendants(db, old_path, update_data["path"])
+    await index_names_async(db, "settings", updated_setting)
+    db.stats.invalidate("settings")
+    return db.entity_cache.put("settings", setting_id, _convert_to_setting(updated_setting))
+
+async def delete_setting(db: Database, setting_id: str) -> bool:
+    result = await db.async_settings_collection.delete_one({"id": setting_id})
+    db.entity_cache.invalidate("settings", setting_id)
+    db.stats.invalidate("settings")
+    await unindex_names_async(db, "settings", setting_id)
+    return result.deleted_count > 0
+
+async def search_settings(db: Database, query: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    results = await db.async_settings_collection.find(_setting_search_filter(query), projection).to_list(length=None)
+    return _setting_results(results, fields)
+
+async def lookup_settings_by_name(db: Database, fragment: str, setting_type: Optional[str] = None,
+                                  limit: int = 10) -> List[Setting]:
+    filter = {"setting_type": setting_type} if setting_type is not None else None
+    settings = await lookup_by_name_async(db, "settings", fragment, filter, limit)
+    return [_convert_to_setting(setting) for setting in settings]
+
+async def text_search_settings(db: Database, query: str, setting_type: Optional[str] = None,
+                               limit: int = 10) -> List[SearchHit]:
+    filter = {"setting_type": setting_type} if setting_type is not None else None
+    hits = await db.text_search_async("settings", query, filter, limit)
+    return [SearchHit(score=score, item=_convert_to_setting(setting)) for setting, score in hits]
+
+async def filter_settings_by_type(db: Database, setting_type: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    results = await db.async_settings_collection.find({"setting_type": setting_type}, projection).to_list(length=None)
+    return _setting_results(results, fields)
+
+async def filter_settings_by_parent(db: Database, parent_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    results = await db.async_settings_collection.find({"parent_id": parent_id}, projection).to_list(length=None)
+    return _setting_results(results, fields)
+
+async def get_setting(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> Union[Setting, Dict]:
+    projection = build_projection(Setting, fields)
+    cached = db.entity_cache.get("settings", setting_id)
+    if cached is not None:
+        return project_model(cached, fields) if fields else cached
+    setting = await db.async_settings_collection.find_one({"id": setting_id}, projection)
+    if not setting:
+        raise ValueError(f"Setting with ID {setting_id} does not exist.")
+    if fields:
+        # Trimmed documents are not cached
+        return project_result(setting, fields)
+    return db.entity_cache.put("settings", setting_id, _convert_to_setting(setting))
+
+async def get_setting_by_name(db: Database, name: str, fields: Optional[List[str]] = None) -> Optional[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    setting = await db.async_settings_collection.find_one({"name": name}, projection)
+    if not setting:
+        return None
+    return project_result(setting, fields) if fields else _convert_to_setting(setting)
+
+async def list_settings(db: Database) -> List[Setting]:
+    settings = await db.async_settings_collection.find().to_list(length=None)
+    return [_convert_to_setting(setting) for setting in settings]
+
+async def list_settings_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                             fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    projection = build_projection(Setting, fields)
+    documents, next_cursor = await fetch_page_async(db.async_settings_collection, {}, limit, cursor, projection)
+    total = await db.async_settings_collection.count_documents({}) if include_total else None
+    return _build_setting_page(documents, next_cursor, fields, total)
+
+async def delete_all_settings(db: Database) -> int:
+    result = await db.async_settings_collection.delete_many({})
+    db.entity_cache.clear("settings")
+    db.stats.invalidate("settings")
+    await clear_names_async(db, "settings")
+    return result.deleted_count
+
+async def get_setting_subtree(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    await db.wait_for_indexes_async()
+    path = await _path_of(db, setting_id)
+    results = await db.async_settings_collection.find(
+        _subtree_filter(path), projection, sort=[("path", 1)]
+    ).to_list(length=None)
+    return _setting_results(results, fields)
+
+async def get_setting_ancestors(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    projection = build_projection(Setting, fields)
+    await db.wait_for_indexes_async()
+    ancestor_ids = _path_ids(await _path_of(db, setting_id))[:-1]
+    if not ancestor_ids:
+        return []
+    results = await db.async_settings_collection.find({"id": {"$in": ancestor_ids}}, projection).to_list(length=None)
+    return _in_path_order(ancestor_ids, results, fields)
+
+async def get_setting_tree(db: Database, setting_id: str) -> SettingTree:
+    return _build_setting_tree(setting_id, await get_setting_subtree(db, setting_id))
+
+async def _parent_path(db: Database, parent_id: Optional[str]) -> Optional[str]:
+    if not parent_id:
+        return None
+    parent = await db.async_settings_collection.find_one({"id": parent_id}, {"path": 1})
+    if not parent:
+        raise ValueError(f"Parent setting with ID {parent_id} does not exist.")
+    return parent.get("path") or _setting_path(None, parent_id)
+
+async def _path_of(db: Database, setting_id: str) -> str:
+    setting = await db.async_settings_collection.find_one({"id": setting_id}, {"path": 1})
+    if not setting:
+        raise ValueError(f"Setting with ID {setting_id} does not exist.")
+    return setting.get("path") or _setting_path(None, setting_id)
+
+async def _repath_descendants(db: Database, old_path: str, new_path: str) -> None:
+    # The moved setting already has its new path, so only its descendants match the old one
+    descendants = await db.async_settings_collection.find(_subtree_filter(old_path), {"id": 1, "path": 1}).to_list(length=None)
+    for descendant in descendants:
+        await db.async_settings_collection.update_one(
+            {"id": descendant["id"]}, {"$set": {"path": new_path + descendant["path"][len(old_path):]}}
+        )
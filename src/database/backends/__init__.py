@@ -0,0 +1,26 @@
+from typing import Optional
+
+from .base import BulkWriteError, Collection, DuplicateKeyError, IndexOptionsConflict, StorageBackend
+
+def create_backend(spec: Optional[str], db_name: str, connection_string: str, query_log=None) -> StorageBackend:
+    """
+    Create a storage backend from a backend spec, reporting its commands to query_log if given.
+
+    Supported specs:
+        mongodb                     MongoDB at the given connection string
+        mongodb://host:port/        MongoDB at the URI in the spec
+        sqlite                      SQLite file named <db_name>.sqlite3
+        sqlite:path                 SQLite file at path (or sqlite::memory:)
+        memory                      Process memory, nothing persisted
+    """
+    kind, _, location = (spec or "mongodb").partition(":")
+    if kind in ("mongodb", "mongodb+srv"):
+        from .mongo import MongoBackend
+        return MongoBackend(spec if location else connection_string, db_name, query_log)
+    if kind == "sqlite":
+        from .sqlite import SqliteBackend
+        return SqliteBackend(location or f"{db_name}.sqlite3", db_name, query_log)
+    if kind == "memory":
+        from .memory import MemoryBackend
+        return MemoryBackend(db_name, query_log)
+    raise ValueError(f"Unknown storage backend '{spec}'")
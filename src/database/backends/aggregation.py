@@ -0,0 +1,124 @@
+"""
+Aggregation pipelines for backends without a native aggregation engine.
+
+run_pipeline evaluates the subset of MongoDB's pipeline language the
+operation modules use, over documents a backend has already filtered:
+
+  stages        $match, $group, $sort, $limit, $facet
+  accumulators  $sum, $avg, $min, $max
+  expressions   "$field.path", literals, $add, $size, $ifNull, $cond, $gt
+
+Like MongoDB, $sum and $avg skip values that are not numbers, and $min and
+$max skip nulls and missing fields. Anything else raises ValueError, so a
+pipeline that works here also runs unchanged on MongoDB.
+"""
+from numbers import Number
+from typing import Any, Callable, Dict, Iterable, List
+
+from .base import _MISSING, get_path
+from .memory import _sort_key, compile_filter
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+def evaluate(expression: Any, document: Dict) -> Any:
+    """The value of an aggregation expression for one document; missing fields are None."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return get_path(document, expression[1:])
+    if isinstance(expression, dict) and len(expression) == 1:
+        operator, operand = next(iter(expression.items()))
+        if operator.startswith("$"):
+            if operator not in _EXPRESSIONS:
+                raise ValueError(f"Unsupported aggregation expression '{operator}'")
+            return _EXPRESSIONS[operator](operand, document)
+    if isinstance(expression, dict):
+        return {key: evaluate(value, document) for key, value in expression.items()}
+    return expression
+
+def _add(operands: List[Any], document: Dict) -> Any:
+    values = [evaluate(operand, document) for operand in operands]
+    return None if any(value is None for value in values) else sum(values)
+
+def _size(operand: Any, document: Dict) -> int:
+    value = evaluate(operand, document)
+    if not isinstance(value, list):
+        raise ValueError(f"$size needs an array, not {type(value).__name__}")
+    return len(value)
+
+def _if_null(operands: List[Any], document: Dict) -> Any:
+    value = evaluate(operands[0], document)
+    return evaluate(operands[1], document) if value is None else value
+
+def _cond(operands: List[Any], document: Dict) -> Any:
+    condition, then, otherwise = operands
+    return evaluate(then if evaluate(condition, document) else otherwise, document)
+
+def _gt(operands: List[Any], document: Dict) -> bool:
+    left, right = (evaluate(operand, document) for operand in operands)
+    return _sort_key(left) > _sort_key(right)
+
+_EXPRESSIONS: Dict[str, Callable[[Any, Dict], Any]] = {
+    "$add": _add,
+    "$size": _size,
+    "$ifNull": _if_null,
+    "$cond": _cond,
+    "$gt": _gt,
+}
+
+def _accumulate(operator: str, values: List[Any]) -> Any:
+    if operator == "$sum":
+        return sum(value for value in values if _is_number(value))
+    if operator == "$avg":
+        numbers = [value for value in values if _is_number(value)]
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator in ("$min", "$max"):
+        present = [value for value in values if value is not None and value is not _MISSING]
+        if not present:
+            return None
+        return (min if operator == "$min" else max)(present, key=_sort_key)
+    raise ValueError(f"Unsupported accumulator '{operator}'")
+
+def _group(documents: List[Dict], specification: Dict) -> List[Dict]:
+    groups: Dict[Any, List[Dict]] = {}
+    keys: Dict[Any, Any] = {}
+    for document in documents:
+        key = evaluate(specification["_id"], document)
+        hashable = repr(key) if isinstance(key, (dict, list)) else key
+        groups.setdefault(hashable, []).append(document)
+        keys[hashable] = key
+    results = []
+    for hashable, members in groups.items():
+        result = {"_id": keys[hashable]}
+        for field, accumulator in specification.items():
+            if field == "_id":
+                continue
+            (operator, expression), = accumulator.items()
+            result[field] = _accumulate(operator, [evaluate(expression, member) for member in members])
+        results.append(result)
+    return results
+
+def _sort(documents: List[Dict], specification: Dict) -> List[Dict]:
+    documents = list(documents)
+    for field, direction in reversed(list(specification.items())):
+        documents.sort(key=lambda document: _sort_key(get_path(document, field, _MISSING)), reverse=direction == -1)
+    return documents
+
+def run_pipeline(documents: Iterable[Dict], pipeline: List[Dict]) -> List[Dict]:
+    """Run pipeline over documents and return the resulting documents."""
+    documents = list(documents)
+    for stage in pipeline:
+        (name, specification), = stage.items()
+        if name == "$match":
+            test = compile_filter(specification)
+            documents = [document for document in documents if test(document)]
+        elif name == "$group":
+            documents = _group(documents, specification)
+        elif name == "$sort":
+            documents = _sort(documents, specification)
+        elif name == "$limit":
+            documents = documents[:specification]
+        elif name == "$facet":
+            documents = [{field: run_pipeline(documents, sub_pipeline) for field, sub_pipeline in specification.items()}]
+        else:
+            raise ValueError(f"Unsupported aggregation stage '{name}'")
+    return documents
@@ -0,0 +1,421 @@
+import asyncio
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pymongo import UpdateOne, errors
+
+IndexKeys = Union[str, List[Tuple[str, int]]]
+
+_MISSING = object()
+
+class DuplicateKeyError(errors.DuplicateKeyError):
+    """Raised when a write would violate a unique index; callers can catch pymongo's error for every backend."""
+
+class IndexOptionsConflict(errors.OperationFailure):
+    """Raised, as by MongoDB, when an index is created on the keys and collation of an index with another name."""
+
+    def __init__(self, message: str):
+        super().__init__(message, code=85)
+
+class BulkWriteError(errors.BulkWriteError):
+    """Raised by insert_many and bulk_write when some writes failed; details["writeErrors"] lists them."""
+
+@dataclass
+class InsertOneResult:
+    inserted_id: Any
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: List[Any]
+
+@dataclass
+class UpdateResult:
+    matched_count: int
+    modified_count: int
+
+@dataclass
+class DeleteResult:
+    deleted_count: int
+
+@dataclass
+class BulkWriteResult:
+    matched_count: int
+    modified_count: int
+
+class Collection(ABC):
+    """
+    The subset of the pymongo Collection API the operation modules rely on.
+
+    A pymongo Collection satisfies this interface as-is, so backends other
+    than MongoDB only need to implement these methods to be usable by
+    campaign_operations, character_operations and setting_operations.
+    """
+
+    @abstractmethod
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+             sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0, skip: int = 0) -> Iterator[Dict]:
+        ...
+
+    @abstractmethod
+    def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        ...
+
+    @abstractmethod
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        """Insert documents in one round trip; unordered inserts carry on past failures."""
+
+    @abstractmethod
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        ...
+
+    @abstractmethod
+    def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document: bool = False) -> Optional[Dict]:
+        """Atomically update one document, returning it as it was before (or after, if return_document)."""
+
+    @abstractmethod
+    def delete_one(self, filter: Dict) -> DeleteResult:
+        ...
+
+    @abstractmethod
+    def delete_many(self, filter: Dict) -> DeleteResult:
+        ...
+
+    @abstractmethod
+    def count_documents(self, filter: Dict) -> int:
+        ...
+
+    @abstractmethod
+    def create_index(self, keys: IndexKeys, unique: bool = False, **kwargs) -> str:
+        ...
+
+    @abstractmethod
+    def drop_index(self, name: str) -> None:
+        ...
+
+    def bulk_write(self, requests: List[UpdateOne], ordered: bool = True) -> BulkWriteResult:
+        """
+        Apply pymongo UpdateOne requests in one call (one round trip on MongoDB).
+
+        Backends without a native batch apply them one by one; unordered
+        writes carry on past failures, which BulkWriteError then lists.
+        """
+        matched = modified = 0
+        write_errors = []
+        for position, request in enumerate(requests):
+            try:
+                result = self.update_one(request._filter, request._doc, request._upsert)
+            except errors.PyMongoError as error:
+                write_errors.append({"index": position, "errmsg": str(error)})
+                if ordered:
+                    break
+                continue
+            matched += result.matched_count
+            modified += result.modified_count
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nMatched": matched, "nModified": modified})
+        return BulkWriteResult(matched_count=matched, modified_count=modified)
+
+    def aggregate(self, pipeline: List[Dict]) -> Iterator[Dict]:
+        """
+        Run an aggregation pipeline (the stages backends.aggregation supports).
+
+        A leading $match goes to find, so it can use an index; the rest runs in Python.
+        """
+        from .aggregation import run_pipeline
+        match = pipeline[0].get("$match") if pipeline else None
+        documents = self.find(match)
+        return iter(run_pipeline(documents, pipeline[1:] if match is not None else pipeline))
+
+    @abstractmethod
+    def index_information(self) -> Dict[str, Dict]:
+        """Map each index name to its "key" list (and "unique": True for unique indexes)."""
+
+class ProfiledCollection:
+    """
+    Times a Collection's reads, updates and deletes into a slow-query log.
+
+    Backends without command monitoring (everything but MongoDB) hand these
+    out from get_collection when a query log is attached. Other attributes
+    pass through to the wrapped collection.
+    """
+
+    def __init__(self, collection: Collection, query_log):
+        self.collection = collection
+        self.query_log = query_log
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def _timed(self, operation: str, filter: Optional[Dict], call, *args, **kwargs):
+        start = time.perf_counter()
+        result = call(*args, **kwargs)
+        explain = getattr(self.collection, "explain", None)
+        self.query_log.observe(
+            self.collection.name, operation, filter, time.perf_counter() - start,
+            explain=(lambda: explain(filter)) if explain is not None else None,
+        )
+        return result
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs) -> Iterator[Dict]:
+        # Materialized so the time covers reading the documents, not just planning
+        return iter(self._timed("find", filter, lambda: list(self.collection.find(filter, projection, **kwargs))))
+
+    def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return self._timed("find", filter, self.collection.find_one, filter, projection)
+
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        return self._timed("update", filter, self.collection.update_one, filter, update, upsert)
+
+    def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document: bool = False) -> Optional[Dict]:
+        return self._timed("findAndModify", filter, self.collection.find_one_and_update,
+                           filter, update, projection, upsert, return_document)
+
+    def delete_one(self, filter: Dict) -> DeleteResult:
+        return self._timed("delete", filter, self.collection.delete_one, filter)
+
+    def delete_many(self, filter: Dict) -> DeleteResult:
+        return self._timed("delete", filter, self.collection.delete_many, filter)
+
+    def count_documents(self, filter: Dict) -> int:
+        return self._timed("count", filter, self.collection.count_documents, filter)
+
+    def bulk_write(self, requests: List[UpdateOne], ordered: bool = True) -> BulkWriteResult:
+        # The first request's filter stands for the batch, as in the MongoDB listener
+        filter = requests[0]._filter if requests else None
+        return self._timed("update", filter, self.collection.bulk_write, requests, ordered)
+
+    def aggregate(self, pipeline: List[Dict]) -> Iterator[Dict]:
+        match = pipeline[0].get("$match") if pipeline else None
+        return iter(self._timed("aggregate", match, lambda: list(self.collection.aggregate(pipeline))))
+
+    def text_search(self, query: str, filter: Optional[Dict] = None, limit: int = 10) -> List[Tuple[Dict, float]]:
+        start = time.perf_counter()
+        results = self.collection.text_search(query, filter, limit)
+        self.query_log.observe(self.collection.name, "find", {**(filter or {}), "$text": {"$search": query}},
+                               time.perf_counter() - start)
+        return results
+
+class AsyncCursor:
+    """The part of Motor's AsyncIOMotorCursor the async operation modules rely on."""
+
+    def __init__(self, load):
+        self._load = load
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        documents = await asyncio.to_thread(self._load)
+        return documents if length is None else documents[:length]
+
+    async def __aiter__(self):
+        for document in await self.to_list():
+            yield document
+
+class AsyncCollection:
+    """
+    The subset of Motor's AsyncIOMotorCollection API the async operation modules rely on.
+
+    Wraps a synchronous Collection and runs each call in a worker thread, so
+    backends without a native asyncio driver never block the event loop.
+    A Motor collection satisfies the same interface natively.
+    """
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None, **kwargs) -> AsyncCursor:
+        return AsyncCursor(lambda: list(self.collection.find(filter, projection, **kwargs)))
+
+    def aggregate(self, pipeline: List[Dict]) -> AsyncCursor:
+        return AsyncCursor(lambda: list(self.collection.aggregate(pipeline)))
+
+    async def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return await asyncio.to_thread(self.collection.find_one, filter, projection)
+
+    async def insert_one(self, document: Dict) -> InsertOneResult:
+        return await asyncio.to_thread(self.collection.insert_one, document)
+
+    async def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        return await asyncio.to_thread(self.collection.insert_many, documents, ordered)
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        return await asyncio.to_thread(self.collection.update_one, filter, update, upsert)
+
+    async def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                                  upsert: bool = False, return_document: bool = False) -> Optional[Dict]:
+        return await asyncio.to_thread(
+            self.collection.find_one_and_update, filter, update, projection, upsert, return_document
+        )
+
+    async def bulk_write(self, requests: List[UpdateOne], ordered: bool = True) -> BulkWriteResult:
+        return await asyncio.to_thread(self.collection.bulk_write, requests, ordered)
+
+    async def delete_one(self, filter: Dict) -> DeleteResult:
+        return await asyncio.to_thread(self.collection.delete_one, filter)
+
+    async def delete_many(self, filter: Dict) -> DeleteResult:
+        return await asyncio.to_thread(self.collection.delete_many, filter)
+
+    async def count_documents(self, filter: Dict) -> int:
+        return await asyncio.to_thread(self.collection.count_documents, filter)
+
+class StorageBackend(ABC):
+    """A named database holding the campaigns, characters and settings collections."""
+
+    def __init__(self, name: str, query_log=None):
+        self.name = name
+        # A SlowQueryLog (or anything with its observe method) that database commands are reported to
+        self.query_log = query_log
+
+    def profiled(self, collection: Collection) -> Collection:
+        """collection, timed into the query log when one is attached."""
+        return collection if self.query_log is None else ProfiledCollection(collection, self.query_log)
+
+    @abstractmethod
+    def get_collection(self, name: str) -> Collection:
+        ...
+
+    def get_async_collection(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self.get_collection(name))
+
+    @abstractmethod
+    def create_text_index(self, collection: str, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def text_search(self, collection: str, query: str, filter: Optional[Dict] = None,
+                    limit: int = 10) -> List[Tuple[Dict, float]]:
+        """Return up to limit (document, score) pairs matching query, best match first."""
+
+    async def text_search_async(self, collection: str, query: str, filter: Optional[Dict] = None,
+                                limit: int = 10) -> List[Tuple[Dict, float]]:
+        return await asyncio.to_thread(self.text_search, collection, query, filter, limit)
+
+    def index_stats(self, collection: str) -> Optional[Dict[str, int]]:
+        """Map each index name to the number of operations that used it, or None if the backend does not track usage."""
+        return None
+
+    def estimated_document_count(self, collection: str) -> int:
+        """The number of documents in a collection, from its metadata where the backend keeps a count."""
+        return self.get_collection(collection).count_documents({})
+
+    def storage_size(self, collection: str) -> Optional[int]:
+        """Bytes a collection's documents take up, without reading them, or None if the backend cannot tell."""
+        return None
+
+    def data_size(self, collection: str, filter: Dict) -> int:
+        """Bytes the documents matching filter take up, encoded as JSON (BSON on MongoDB)."""
+        return sum(len(json.dumps(document, default=str)) for document in self.get_collection(collection).find(filter))
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+@lru_cache(maxsize=256)
+def compile_regex(pattern: str, options: str) -> re.Pattern:
+    """Compile a $regex pattern with its MongoDB $options (i, m, s)."""
+    flags = re.IGNORECASE if "i" in options else 0
+    if "m" in options:
+        flags |= re.MULTILINE
+    if "s" in options:
+        flags |= re.DOTALL
+    return re.compile(pattern, flags)
+
+def normalize_index_keys(keys: IndexKeys) -> List[Tuple[str, int]]:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return list(keys)
+
+def index_name(keys: IndexKeys) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in normalize_index_keys(keys))
+
+def get_path(document: Dict, path: str, default: Any = None) -> Any:
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+def set_path(document: Dict, path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    target = document
+    for part in parents:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[leaf] = value
+
+def unset_path(document: Dict, path: str) -> None:
+    *parents, leaf = path.split(".")
+    parent = get_path(document, ".".join(parents)) if parents else document
+    if isinstance(parent, dict):
+        parent.pop(leaf, None)
+
+def _push(document: Dict, path: str, value: Any) -> None:
+    items = get_path(document, path)
+    if items is None:
+        items = []
+        set_path(document, path, items)
+    if isinstance(value, dict) and "$each" in value:
+        items.extend(value["$each"])
+    else:
+        items.append(value)
+
+def _pull(document: Dict, path: str, value: Any) -> None:
+    items = get_path(document, path)
+    if isinstance(items, list):
+        set_path(document, path, [item for item in items if item != value])
+
+def _add_to_set(document: Dict, path: str, value: Any) -> None:
+    values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+    for item in values:
+        if item not in (get_path(document, path) or []):
+            _push(document, path, item)
+
+def _inc(document: Dict, path: str, value: Any) -> None:
+    set_path(document, path, (get_path(document, path) or 0) + value)
+
+_UPDATE_OPERATORS = {
+    "$set": set_path,
+    "$unset": lambda document, path, value: unset_path(document, path),
+    "$inc": _inc,
+    "$push": _push,
+    "$pull": _pull,
+    "$addToSet": _add_to_set,
+}
+
+def apply_update(document: Dict, update: Dict) -> Dict:
+    """Apply a MongoDB-style update document ($set, $unset, $inc, $push, $pull, $addToSet) in place."""
+    for operator, fields in update.items():
+        if operator not in _UPDATE_OPERATORS:
+            raise ValueError(f"Unsupported update operator '{operator}'")
+        for path, value in fields.items():
+            _UPDATE_OPERATORS[operator](document, path, value)
+    return document
+
+def project_document(document: Dict, projection: Optional[Union[Dict, Iterable[str]]]) -> Dict:
+    """Apply a MongoDB-style inclusion or exclusion projection to a document."""
+    if not projection:
+        return document
+    if not isinstance(projection, dict):
+        projection = {field: 1 for field in projection}
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if not included:
+        excluded = {field for field, flag in projection.items() if not flag}
+        return {key: value for key, value in document.items() if key not in excluded}
+    projected = {"_id": document["_id"]} if projection.get("_id", 1) and "_id" in document else {}
+    for field in included:
+        value = get_path(document, field, _MISSING)
+        if value is not _MISSING:
+            set_path(projected, field, value)
+    return projected
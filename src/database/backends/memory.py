@@ -0,0 +1,598 @@
+import heapq
+import re
+import threading
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bson.objectid import ObjectId
+
+from .base import (
+    _MISSING,
+    BulkWriteError,
+    Collection,
+    DeleteResult,
+    DuplicateKeyError,
+    IndexKeys,
+    IndexOptionsConflict,
+    InsertManyResult,
+    InsertOneResult,
+    StorageBackend,
+    UpdateResult,
+    apply_update,
+    compile_regex,
+    get_path,
+    index_name,
+    normalize_index_keys,
+    project_document,
+)
+
+_COMPARISONS = {
+    "$gt": lambda value, bound: value > bound,
+    "$gte": lambda value, bound: value >= bound,
+    "$lt": lambda value, bound: value < bound,
+    "$lte": lambda value, bound: value <= bound,
+}
+
+# MongoDB's cross-type sort order, for the types documents hold
+_TYPE_ORDER = {type(None): 0, bool: 4, int: 1, float: 1, str: 2, dict: 3, list: 3, ObjectId: 5}
+
+def _sort_key(value: Any) -> Tuple:
+    if value is _MISSING:
+        value = None
+    rank = _TYPE_ORDER.get(type(value), 6)
+    if rank in (0, 3, 6):
+        return (rank, str(value)) if rank else (rank,)
+    # ObjectId comparisons run in Python; their 12 bytes sort the same way in C
+    return (rank, value.binary) if rank == 5 else (rank, value)
+
+_ATOMIC_TYPES = frozenset({str, int, float, bool, type(None), ObjectId, datetime})
+
+def _clone(value: Any) -> Any:
+    """Copy the containers of a document so callers can never mutate what is stored."""
+    if type(value) is dict:
+        return {key: item if type(item) in _ATOMIC_TYPES else _clone(item) for key, item in value.items()}
+    if type(value) is list:
+        return [item if type(item) in _ATOMIC_TYPES else _clone(item) for item in value]
+    return value
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+def _equals(value: Any, expected: Any) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if value == expected:
+        return True
+    # Like MongoDB, a condition on an array field matches when any element does
+    return isinstance(value, list) and not isinstance(expected, list) and expected in value
+
+def _compare(operator: str, value: Any, bound: Any) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return _COMPARISONS[operator](value, bound)
+    except TypeError:
+        return False
+
+def _in(operand: List[Any]) -> Callable[[Any], bool]:
+    try:
+        members = set(operand)
+    except TypeError:
+        members = None
+    def check(value: Any) -> bool:
+        if value is _MISSING:
+            value = None
+        if members is not None and not isinstance(value, (list, dict)):
+            return value in members
+        return any(_equals(value, item) for item in operand)
+    return check
+
+def _all(operand: List[Any]) -> Callable[[Any], bool]:
+    def check(value: Any) -> bool:
+        values = value if isinstance(value, list) else [value]
+        return bool(operand) and all(any(_equals(item, wanted) for item in values) for wanted in operand)
+    return check
+
+def _regex(pattern: str, options: str) -> Callable[[Any], bool]:
+    compiled = compile_regex(pattern, options)
+    def check(value: Any) -> bool:
+        values = value if isinstance(value, list) else [value]
+        return any(isinstance(item, str) and compiled.search(item) is not None for item in values)
+    return check
+
+def _operator_check(operator: str, operand: Any, condition: Dict) -> Callable[[Any], bool]:
+    if operator == "$eq":
+        return lambda value: _equals(value, operand)
+    if operator == "$ne":
+        return lambda value: not _equals(value, operand)
+    if operator == "$in":
+        return _in(operand)
+    if operator == "$nin":
+        included = _in(operand)
+        return lambda value: not included(value)
+    if operator == "$all":
+        return _all(operand)
+    if operator in _COMPARISONS:
+        return lambda value: _compare(operator, value, operand)
+    if operator == "$regex":
+        return _regex(operand, condition.get("$options", ""))
+    if operator == "$exists":
+        return lambda value: (value is not _MISSING) == bool(operand)
+    raise ValueError(f"Unsupported query operator '{operator}'")
+
+def _field_test(path: str, condition: Any) -> Callable[[Dict], bool]:
+    if isinstance(condition, dict) and any(operator.startswith("$") for operator in condition):
+        checks = [
+            _operator_check(operator, operand, condition)
+            for operator, operand in condition.items() if operator != "$options"
+        ]
+    else:
+        checks = [lambda value: _equals(value, condition)]
+    if "." in path:
+        return lambda document: all(check(get_path(document, path, _MISSING)) for check in checks)
+    return lambda document: all(check(document.get(path, _MISSING)) for check in checks)
+
+def compile_filter(filter: Optional[Dict]) -> Callable[[Dict], bool]:
+    """Turn a MongoDB-style filter into a predicate, so per-query work (sets, regexes) is done once."""
+    tests = []
+    for key, condition in (filter or {}).items():
+        if key in ("$or", "$and"):
+            sub_tests = [compile_filter(sub_filter) for sub_filter in condition]
+            combine = any if key == "$or" else all
+            tests.append(lambda document, sub_tests=sub_tests, combine=combine: combine(
+                test(document) for test in sub_tests))
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported query operator '{key}'")
+        else:
+            tests.append(_field_test(key, condition))
+    if not tests:
+        return lambda document: True
+    if len(tests) == 1:
+        return tests[0]
+    return lambda document: all(test(document) for test in tests)
+
+def _equality_conditions(filter: Dict) -> Dict[str, List[Any]]:
+    """Map each top-level field of filter to the values an equality or $in condition allows."""
+    conditions = {}
+    for key, condition in filter.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(operator.startswith("$") for operator in condition):
+            if "$eq" in condition:
+                conditions[key] = [condition["$eq"]]
+            elif "$in" in condition:
+                conditions[key] = list(condition["$in"])
+        else:
+            conditions[key] = [condition]
+    return conditions
+
+def _stem(word: str) -> str:
+    # A light stand-in for the stemming MongoDB and FTS5 do, so "dragons" finds "dragon"
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+def _tokens(text: Any) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return [_stem(word) for word in re.findall(r"\w+", text.lower())]
+
+class _HashIndex:
+    """
+    A secondary index mapping a tuple of field values to the _ids of documents holding them.
+
+    A compound index also maps each shorter leading run of its values, so, as
+    in MongoDB, it serves equality on any prefix of its fields.
+    """
+
+    def __init__(self, fields: List[Tuple[str, int]], unique: bool, ignore_case: bool):
+        self.fields = fields
+        self.unique = unique
+        self.ignore_case = ignore_case
+        # Array or subdocument values need multikey semantics, which the planner leaves to a scan
+        self.multikey = False
+        self.entries: Dict[Tuple, Set[Any]] = defaultdict(set)
+        self.prefixes: List[Dict[Tuple, Set[Any]]] = [defaultdict(set) for _ in fields[1:]]
+        # Queries the planner answered from this index, reported like MongoDB's $indexStats
+        self.accesses = 0
+
+    def lookup(self, key: Tuple) -> Set[Any]:
+        entries = self.entries if len(key) == len(self.fields) else self.prefixes[len(key) - 1]
+        return entries.get(key, ())
+
+    def clear(self) -> None:
+        self.entries.clear()
+        for prefix in self.prefixes:
+            prefix.clear()
+        self.multikey = False
+
+    def key(self, document: Dict) -> Tuple:
+        values = []
+        for field, _ in self.fields:
+            value = get_path(document, field)
+            if isinstance(value, (list, dict)):
+                self.multikey = True
+                value = _hashable(value)
+            elif self.ignore_case and isinstance(value, str):
+                value = value.casefold()
+            values.append(value)
+        return tuple(values)
+
+    def conflict(self, key: Tuple, document_id: Any) -> bool:
+        holders = self.entries.get(key)
+        return bool(holders) and any(holder != document_id for holder in holders)
+
+    def add(self, key: Tuple, document_id: Any) -> None:
+        self.entries[key].add(document_id)
+        for length, prefix in enumerate(self.prefixes, 1):
+            prefix[key[:length]].add(document_id)
+
+    def remove(self, key: Tuple, document_id: Any) -> None:
+        for length, entries in [(len(key), self.entries)] + list(enumerate(self.prefixes, 1)):
+            holders = entries.get(key[:length])
+            if holders is not None:
+                holders.discard(document_id)
+                if not holders:
+                    del entries[key[:length]]
+
+class MemoryCollection(Collection):
+    """
+    A collection held in a dict keyed by _id.
+
+    Secondary indexes are hash maps from field values to _ids, so equality and
+    $in filters on an indexed field read only the matching documents. A list of
+    _ids kept in sorted order serves _id-ordered pages without sorting the
+    collection. Stored documents are copied on the way in and out.
+    """
+
+    def __init__(self, backend: "MemoryBackend", name: str):
+        self.name = name
+        self._lock = backend.lock
+        self._documents: Dict[Any, Dict] = {}
+        self._indexes: Dict[str, _HashIndex] = {}
+        # (sort key, _id) for every document; appends keep it sorted until an _id arrives out of order.
+        # Deleted _ids stay listed (and are skipped) until a compaction or a re-insert of the same _id.
+        self._order: List[Tuple] = []
+        self._order_sorted = True
+        self._deleted: Set[Any] = set()
+        self._text_fields: Dict[str, float] = {}
+        self._postings: Dict[str, Dict[Any, float]] = defaultdict(dict)
+        self._document_words: Dict[Any, Set[str]] = {}
+
+    def create_index(self, keys: IndexKeys, unique: bool = False, **kwargs) -> str:
+        fields = normalize_index_keys(keys)
+        name = kwargs.get("name") or index_name(keys)
+        with self._lock:
+            if name in self._indexes:
+                return name
+            index = _HashIndex(fields, unique, kwargs.get("collation", {}).get("strength", 3) <= 2)
+            for other_name, other in self._indexes.items():
+                if other.fields == index.fields and other.ignore_case == index.ignore_case:
+                    raise IndexOptionsConflict(f"Index already exists with a different name: {other_name}")
+            for document_id, document in self._documents.items():
+                key = index.key(document)
+                if unique and index.conflict(key, document_id):
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {name} dup key: {key}")
+                index.add(key, document_id)
+            self._indexes[name] = index
+        return name
+
+    def drop_index(self, name: str) -> None:
+        with self._lock:
+            self._indexes.pop(name, None)
+
+    def index_information(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                name: {"key": list(index.fields), **({"unique": True} if index.unique else {})}
+                for name, index in self._indexes.items()
+            }
+
+    def index_stats(self) -> Dict[str, int]:
+        """How many queries each index has answered."""
+        with self._lock:
+            return {name: index.accesses for name, index in self._indexes.items()}
+
+    def _candidates(self, filter: Optional[Dict]) -> Optional[Iterable[Any]]:
+        """The _ids an index narrows filter to, or None when every document must be scanned."""
+        if not filter:
+            return None
+        best, best_index = None, None
+        for sub_filter in filter.get("$and", []):
+            candidates = self._candidates(sub_filter)
+            if candidates is not None and (best is None or len(candidates) < len(best)):
+                best, best_index = candidates, None
+        conditions = _equality_conditions(filter)
+        if "_id" in conditions:
+            candidates = [_hashable(value) for value in conditions["_id"] if _hashable(value) in self._documents]
+            if best is None or len(candidates) < len(best):
+                best, best_index = candidates, None
+        for index in self._indexes.values():
+            if index.ignore_case or index.multikey:
+                continue
+            values = []
+            for field, _ in index.fields:
+                if field not in conditions:
+                    break
+                values.append(conditions[field])
+            if not values:
+                continue
+            if len(values) == 1:
+                keys = [(value,) for value in values[0]]
+            elif all(len(options) == 1 for options in values):
+                keys = [tuple(options[0] for options in values)]
+            else:
+                continue
+            candidates = set()
+            for key in keys:
+                candidates.update(index.lookup(key))
+            if best is None or len(candidates) < len(best):
+                best, best_index = candidates, index
+        if best_index is not None:
+            best_index.accesses += 1
+        return best
+
+    def _ordered_ids(self) -> List[Tuple]:
+        if not self._order_sorted:
+            self._order.sort()
+            self._order_sorted = True
+        return self._order
+
+    def _compact_order(self) -> None:
+        self._order = [entry for entry in self._order if entry[1] not in self._deleted]
+        self._deleted.clear()
+
+    def _matching(self, filter: Optional[Dict], sort: Optional[List[Tuple[str, int]]]) -> Iterator[Dict]:
+        """Yield stored documents matching filter, in sort order."""
+        sort = normalize_index_keys(sort) if sort else []
+        candidates = self._candidates(filter)
+        test = compile_filter(filter)
+        if sort == [("_id", 1)] and candidates is None:
+            # Walk the sorted _ids from the cursor bound rather than sorting the collection
+            order = self._ordered_ids()
+            bound = self._lower_id_bound(filter)
+            start = bisect_right(order, (_sort_key(bound), bound)) if bound is not None else 0
+            documents = (self._documents.get(order[position][1]) for position in range(start, len(order)))
+            return (document for document in documents if document is not None and test(document))
+        if candidates is None:
+            documents = self._documents.values()
+        else:
+            documents = (self._documents[document_id] for document_id in candidates if document_id in self._documents)
+        if not sort:
+            return (document for document in documents if test(document))
+        documents = [document for document in documents if test(document)]
+        for field, direction in reversed(sort):
+            documents.sort(key=lambda document: _sort_key(get_path(document, field, _MISSING)), reverse=direction == -1)
+        return iter(documents)
+
+    @staticmethod
+    def _lower_id_bound(filter: Optional[Dict]) -> Any:
+        for sub_filter in [filter or {}] + list((filter or {}).get("$and", [])):
+            condition = sub_filter.get("_id")
+            if isinstance(condition, dict) and "$gt" in condition:
+                return condition["$gt"]
+        return None
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+             sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0, skip: int = 0) -> Iterator[Dict]:
+        with self._lock:
+            documents = []
+            for position, document in enumerate(self._matching(filter, sort)):
+                if position < skip:
+                    continue
+                documents.append(_clone(project_document(document, projection)))
+                if limit and len(documents) >= limit:
+                    break
+        return iter(documents)
+
+    def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return next(self.find(filter, projection, limit=1), None)
+
+    def _check_unique(self, document: Dict, document_id: Any) -> List[Tuple[_HashIndex, Tuple]]:
+        keys = []
+        for name, index in self._indexes.items():
+            key = index.key(document)
+            if index.unique and index.conflict(key, document_id):
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name} dup key: {key}")
+            keys.append((index, key))
+        return keys
+
+    def _insert(self, document: Dict) -> Any:
+        document.setdefault("_id", ObjectId())
+        document_id = _hashable(document["_id"])
+        if document_id in self._documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {document_id}")
+        stored = _clone(document)
+        for index, key in self._check_unique(stored, document_id):
+            index.add(key, document_id)
+        self._documents[document_id] = stored
+        if document_id in self._deleted:
+            self._compact_order()
+        order_key = (_sort_key(document_id), document_id)
+        if self._order and self._order_sorted and order_key < self._order[-1]:
+            self._order_sorted = False
+        self._order.append(order_key)
+        self._index_text(document_id, stored)
+        return document["_id"]
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        with self._lock:
+            return InsertOneResult(inserted_id=self._insert(document))
+
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        inserted_ids = []
+        write_errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted_ids.append(self._insert(document))
+                except DuplicateKeyError as error:
+                    write_errors.append({"index": index, "code": 11000, "errmsg": str(error), "op": document})
+                    if ordered:
+                        break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids)})
+        return InsertManyResult(inserted_ids=inserted_ids)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Apply update to the first match (or an upserted seed), returning copies from before and after."""
+        with self._lock:
+            current = next(self._matching(filter, None), None)
+            if current is None:
+                if not upsert:
+                    return None, None
+                seed = {key: value for key, value in filter.items() if not key.startswith("$")}
+                document = apply_update(_clone(seed), update)
+                self._insert(document)
+                return None, _clone(document)
+            document_id = _hashable(current["_id"])
+            document = apply_update(_clone(current), update)
+            for index, key in self._check_unique(document, document_id):
+                old_key = index.key(current)
+                if key != old_key:
+                    index.remove(old_key, document_id)
+                    index.add(key, document_id)
+            self._documents[document_id] = document
+            self._unindex_text(document_id)
+            self._index_text(document_id, document)
+            return current, _clone(document)
+
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        before, _ = self._update(filter, update, upsert)
+        matched = int(before is not None)
+        return UpdateResult(matched_count=matched, modified_count=matched)
+
+    def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document: bool = False) -> Optional[Dict]:
+        before, after = self._update(filter, update, upsert)
+        document = after if return_document else before
+        return project_document(document, projection) if document is not None else None
+
+    def _remove(self, document_id: Any) -> None:
+        document = self._documents.pop(document_id)
+        for index in self._indexes.values():
+            index.remove(index.key(document), document_id)
+        self._deleted.add(document_id)
+        if len(self._deleted) > len(self._documents):
+            self._compact_order()
+        self._unindex_text(document_id)
+
+    def delete_one(self, filter: Dict) -> DeleteResult:
+        with self._lock:
+            document = next(self._matching(filter, None), None)
+            if document is None:
+                return DeleteResult(deleted_count=0)
+            self._remove(_hashable(document["_id"]))
+        return DeleteResult(deleted_count=1)
+
+    def delete_many(self, filter: Dict) -> DeleteResult:
+        with self._lock:
+            if not filter:
+                deleted = len(self._documents)
+                self._documents.clear()
+                self._order.clear()
+                self._order_sorted = True
+                self._deleted.clear()
+                self._postings.clear()
+                self._document_words.clear()
+                for index in self._indexes.values():
+                    index.clear()
+                return DeleteResult(deleted_count=deleted)
+            document_ids = [_hashable(document["_id"]) for document in self._matching(filter, None)]
+            for document_id in document_ids:
+                self._remove(document_id)
+        return DeleteResult(deleted_count=len(document_ids))
+
+    def explain(self, filter: Optional[Dict]) -> Dict[str, Any]:
+        """Whether an index narrows filter, and how many documents the query reads."""
+        with self._lock:
+            candidates = self._candidates(filter)
+            if candidates is None:
+                return {"plan": "COLLSCAN", "docs_examined": len(self._documents)}
+            return {"plan": "IXSCAN", "docs_examined": len(candidates)}
+
+    def count_documents(self, filter: Dict) -> int:
+        with self._lock:
+            if not filter:
+                return len(self._documents)
+            return sum(1 for _ in self._matching(filter, None))
+
+    def create_text_index(self, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        """Maintain an inverted index from stemmed words to a per-document relevance score."""
+        with self._lock:
+            self._text_fields = {field: float((weights or {}).get(field, 1)) for field in fields}
+            self._postings.clear()
+            self._document_words.clear()
+            for document_id, document in self._documents.items():
+                self._index_text(document_id, document)
+
+    def _index_text(self, document_id: Any, document: Dict) -> None:
+        # Each field adds weight * (0.5 + 0.5 * occurrences / words) per word, as MongoDB's $text scores do
+        indexed = set()
+        for field, weight in self._text_fields.items():
+            words = _tokens(get_path(document, field))
+            for word, occurrences in Counter(words).items():
+                postings = self._postings[word]
+                postings[document_id] = postings.get(document_id, 0.0) + weight * (0.5 + 0.5 * occurrences / len(words))
+                indexed.add(word)
+        if indexed:
+            self._document_words[document_id] = indexed
+
+    def _unindex_text(self, document_id: Any) -> None:
+        for word in self._document_words.pop(document_id, ()):
+            postings = self._postings[word]
+            postings.pop(document_id, None)
+            if not postings:
+                del self._postings[word]
+
+    def text_search(self, query: str, filter: Optional[Dict] = None, limit: int = 10) -> List[Tuple[Dict, float]]:
+        with self._lock:
+            scores: Dict[Any, float] = defaultdict(float)
+            for word in set(_tokens(query)):
+                for document_id, score in self._postings.get(word, {}).items():
+                    scores[document_id] += score
+            test = compile_filter(filter)
+            hits = [(document_id, score) for document_id, score in scores.items() if test(self._documents[document_id])]
+            best = heapq.nlargest(limit, hits, key=lambda hit: hit[1])
+            return [(_clone(self._documents[document_id]), score) for document_id, score in best]
+
+class MemoryBackend(StorageBackend):
+    """
+    Storage in process memory, for tests, benchmarks and embedded use.
+
+    Nothing is persisted: every backend instance starts empty.
+    """
+
+    def __init__(self, name: str, query_log=None):
+        super().__init__(name, query_log)
+        self.lock = threading.RLock()
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        with self.lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self.profiled(self._collections[name])
+
+    def create_text_index(self, collection: str, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        self.get_collection(collection).create_text_index(fields, weights)
+
+    def text_search(self, collection: str, query: str, filter: Optional[Dict] = None,
+                    limit: int = 10) -> List[Tuple[Dict, float]]:
+        return self.get_collection(collection).text_search(query, filter, limit)
+
+    def index_stats(self, collection: str) -> Optional[Dict[str, int]]:
+        return self.get_collection(collection).index_stats()
+
+    def close(self) -> None:
+        with self.lock:
+            self._collections.clear()
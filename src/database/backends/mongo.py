@@ -0,0 +1,215 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import MongoClient, TEXT, monitoring
+from pymongo.collection import Collection as MongoCollection
+from pymongo.errors import OperationFailure
+
+from .base import StorageBackend
+
+_TEXT_SCORE_SORT = [("score", {"$meta": "textScore"})]
+
+def _text_query(query: str, filter: Optional[Dict]) -> Tuple[Dict, Dict]:
+    return {**(filter or {}), "$text": {"$search": query}}, {"score": {"$meta": "textScore"}}
+
+# The field of each query command holding its filter (or pipeline)
+_COMMAND_FILTERS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes",
+}
+# Session and routing fields that explain does not accept
+_NOT_EXPLAINABLE = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+def _command_filter(name: str, command: Dict) -> Any:
+    value = command.get(_COMMAND_FILTERS[name])
+    if name in ("update", "delete"):
+        # Bulk statements carry one filter each; the first stands for the batch
+        return value[0].get("q") if value else None
+    return value
+
+def _find_value(document: Any, key: str) -> Any:
+    """The first value of key anywhere in a nested explain document."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        children = document.values()
+    elif isinstance(document, list):
+        children = document
+    else:
+        return None
+    for child in children:
+        value = _find_value(child, key)
+        if value is not None:
+            return value
+    return None
+
+def _plan_summary(explanation: Dict) -> str:
+    """The winning plan's stages from the top down, e.g. "FETCH <- IXSCAN campaign_id_1"."""
+    stages = []
+    plan = _find_value(explanation, "winningPlan")
+    while isinstance(plan, dict):
+        plan = plan.get("queryPlan", plan)
+        stages.append(f"{plan.get('stage')} {plan['indexName']}" if "indexName" in plan else str(plan.get("stage")))
+        plan = plan.get("inputStage")
+    return " <- ".join(stages)
+
+class SlowCommandListener(monitoring.CommandListener):
+    """
+    Reports the duration of every query command to the slow-query log of its database.
+
+    One listener serves every database on a shared client, so logs are
+    registered by database name. Commands are remembered from their started
+    event until they succeed or fail. Explains run on the log's worker thread
+    through client, never inside a listener callback.
+    """
+
+    def __init__(self):
+        self.query_logs: Dict[str, Any] = {}
+        self.client: Optional[MongoClient] = None
+        self._commands: Dict[Tuple, Tuple[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in _COMMAND_FILTERS and event.database_name in self.query_logs:
+            with self._lock:
+                self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        with self._lock:
+            started = self._commands.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        database_name, command = started
+        query_log = self.query_logs.get(database_name)
+        if query_log is None:
+            return
+        name = event.command_name
+        query_log.observe(
+            command.get(name), name, _command_filter(name, command), event.duration_micros / 1_000_000,
+            explain=lambda: self._explain(database_name, command),
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with self._lock:
+            self._commands.pop((event.connection_id, event.request_id), None)
+
+    def _explain(self, database_name: str, command: Dict) -> Dict[str, Any]:
+        command = {key: value for key, value in command.items()
+                   if not key.startswith("$") and key not in _NOT_EXPLAINABLE}
+        explanation = self.client[database_name].command("explain", command, verbosity="executionStats")
+        return {"plan": _plan_summary(explanation), "docs_examined": _find_value(explanation, "totalDocsExamined")}
+
+class _SharedClient:
+    """A MongoClient (and, once asked for, a Motor client) shared by every backend on one connection string."""
+
+    def __init__(self, connection_string: str):
+        self.connection_string = connection_string
+        # Command monitoring reports every command, so collections need no profiling wrapper
+        self.listener = SlowCommandListener()
+        self.client = MongoClient(connection_string, event_listeners=[self.listener])
+        self.listener.client = self.client
+        self.async_client = None
+        self.users = 0
+
+    def get_async_client(self):
+        # Motor is imported on first use so sync-only callers never pay for it
+        if self.async_client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self.async_client = AsyncIOMotorClient(self.connection_string, event_listeners=[self.listener])
+        return self.async_client
+
+    def close(self) -> None:
+        if self.async_client is not None:
+            self.async_client.close()
+        self.client.close()
+
+# One client, and so one connection pool, per connection string however many databases use it
+_shared_clients: Dict[str, _SharedClient] = {}
+_shared_clients_lock = threading.Lock()
+
+def _acquire_client(connection_string: str, name: str, query_log) -> _SharedClient:
+    with _shared_clients_lock:
+        shared = _shared_clients.get(connection_string)
+        if shared is None:
+            shared = _shared_clients[connection_string] = _SharedClient(connection_string)
+        shared.users += 1
+        if query_log is not None:
+            shared.listener.query_logs[name] = query_log
+    return shared
+
+def _release_client(shared: _SharedClient, name: str) -> None:
+    with _shared_clients_lock:
+        shared.listener.query_logs.pop(name, None)
+        shared.users -= 1
+        if shared.users:
+            return
+        if _shared_clients.get(shared.connection_string) is shared:
+            del _shared_clients[shared.connection_string]
+    shared.close()
+
+class MongoBackend(StorageBackend):
+    """
+    Storage in a MongoDB database; pymongo collections already provide the Collection interface.
+
+    Backends on the same connection string share one client, which is
+    closed when the last of them is.
+    """
+
+    def __init__(self, connection_string: str, name: str, query_log=None):
+        super().__init__(name, query_log)
+        self.connection_string = connection_string
+        self.shared = _acquire_client(connection_string, name, query_log)
+        self.client = self.shared.client
+        self.database = self.client[name]
+
+    def get_collection(self, name: str) -> MongoCollection:
+        return self.database[name]
+
+    def get_async_collection(self, name: str):
+        return self.shared.get_async_client()[self.name][name]
+
+    def create_text_index(self, collection: str, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        self.database[collection].create_index(
+            [(field, TEXT) for field in fields], weights=weights or {}, name=f"{collection}_text"
+        )
+
+    def text_search(self, collection: str, query: str, filter: Optional[Dict] = None,
+                    limit: int = 10) -> List[Tuple[Dict, float]]:
+        cursor = self.database[collection].find(*_text_query(query, filter)).sort(_TEXT_SCORE_SORT).limit(limit)
+        return [(document, document.pop("score")) for document in cursor]
+
+    async def text_search_async(self, collection: str, query: str, filter: Optional[Dict] = None,
+                                limit: int = 10) -> List[Tuple[Dict, float]]:
+        cursor = self.get_async_collection(collection).find(*_text_query(query, filter)).sort(_TEXT_SCORE_SORT)
+        documents = await cursor.to_list(length=limit)
+        return [(document, document.pop("score")) for document in documents]
+
+    def index_stats(self, collection: str) -> Optional[Dict[str, int]]:
+        # Counts are per server and reset when it restarts or the index is rebuilt
+        stats = {}
+        for index in self.database[collection].aggregate([{"$indexStats": {}}]):
+            stats[index["name"]] = stats.get(index["name"], 0) + index["accesses"]["ops"]
+        return stats
+
+    def estimated_document_count(self, collection: str) -> int:
+        return self.database[collection].estimated_document_count()
+
+    def storage_size(self, collection: str) -> Optional[int]:
+        # collStats reads the size from collection metadata; it fails for a collection that does not exist yet
+        try:
+            return self.database.command("collStats", collection)["size"]
+        except OperationFailure:
+            return None
+
+    def data_size(self, collection: str, filter: Dict) -> int:
+        pipeline = [{"$match": filter}, {"$group": {"_id": None, "size": {"$sum": {"$bsonSize": "$$ROOT"}}}}]
+        result = next(self.database[collection].aggregate(pipeline), None)
+        return result["size"] if result else 0
+
+    def close(self) -> None:
+        _release_client(self.shared, self.name)
@@ -0,0 +1,420 @@
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import (
+    BulkWriteError,
+    Collection,
+    DeleteResult,
+    DuplicateKeyError,
+    IndexKeys,
+    IndexOptionsConflict,
+    InsertManyResult,
+    InsertOneResult,
+    StorageBackend,
+    UpdateResult,
+    apply_update,
+    compile_regex,
+    index_name,
+    normalize_index_keys,
+    project_document,
+)
+
+_COMPARISON_OPERATORS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def _regexp(pattern: str, options: str, value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    return compile_regex(pattern, options or "").search(value) is not None
+
+def _to_sql_value(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+def _encode(document: Dict) -> str:
+    return json.dumps(document, default=str)
+
+def _column_name(field: str) -> str:
+    return field.replace(".", "__")
+
+def _match_expression(query: str) -> str:
+    # Any word may match, like MongoDB's $text; quoting keeps FTS5 syntax characters literal
+    return " OR ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+
+class SqliteCollection(Collection):
+    """
+    A collection stored as one SQLite table of JSON documents.
+
+    Each indexed field is exposed as a virtual generated column over
+    json_extract(doc, ...) so equality filters and sorts on it use a
+    regular B-tree index instead of parsing every document.
+    """
+
+    def __init__(self, backend: "SqliteBackend", name: str):
+        self.name = name
+        self._connection = backend.connection
+        self._lock = backend.lock
+        with self._lock, self._connection:
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" '
+                f'(_id TEXT PRIMARY KEY, doc TEXT NOT NULL CHECK (json_valid(doc)))'
+            )
+        self._columns = self._load_generated_columns()
+        self._text_weights: List[float] = []
+
+    def _load_generated_columns(self) -> Dict[str, str]:
+        rows = self._connection.execute(f'PRAGMA table_xinfo("{self.name}")').fetchall()
+        return {column[1].replace("__", "."): column[1] for column in rows if column[6] in (2, 3)}
+
+    def _ensure_column(self, field: str) -> str:
+        if field == "_id":
+            return "_id"
+        if field not in self._columns:
+            column = _column_name(field)
+            self._connection.execute(
+                f'ALTER TABLE "{self.name}" ADD COLUMN "{column}" '
+                f"GENERATED ALWAYS AS (json_extract(doc, '$.{field}')) VIRTUAL"
+            )
+            self._columns[field] = column
+        return self._columns[field]
+
+    def create_index(self, keys: IndexKeys, unique: bool = False, **kwargs) -> str:
+        fields = normalize_index_keys(keys)
+        name = kwargs.get("name") or index_name(keys)
+        # A MongoDB collation of strength 1 or 2 ignores case; NOCASE is the SQLite equivalent
+        collate = " COLLATE NOCASE" if kwargs.get("collation", {}).get("strength", 3) <= 2 else ""
+        try:
+            with self._lock, self._connection:
+                columns = [
+                    f'"{self._ensure_column(field)}"{collate}{" DESC" if direction == -1 else ""}'
+                    for field, direction in fields
+                ]
+                shape = [(self._ensure_column(field), direction == -1, "NOCASE" if collate else "BINARY")
+                         for field, direction in fields]
+                for other, other_shape in self._index_shapes().items():
+                    if other != name and other_shape == shape:
+                        raise IndexOptionsConflict(f"Index already exists with a different name: {other}")
+                self._connection.execute(
+                    f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{self.name}_{name}" '
+                    f'ON "{self.name}" ({", ".join(columns)})'
+                )
+        except sqlite3.IntegrityError as error:
+            raise DuplicateKeyError(str(error)) from error
+        return name
+
+    def _index_shapes(self) -> Dict[str, List[Tuple[str, bool, str]]]:
+        """The (column, descending, collation) list of each index created by create_index."""
+        prefix = f"{self.name}_"
+        shapes = {}
+        for _, name, _, origin, _ in self._connection.execute(f'PRAGMA index_list("{self.name}")').fetchall():
+            if origin == "c" and name.startswith(prefix):
+                columns = self._connection.execute(f'PRAGMA index_xinfo("{name}")').fetchall()
+                shapes[name[len(prefix):]] = [(column[2], bool(column[3]), column[4].upper())
+                                              for column in columns if column[5]]
+        return shapes
+
+    def drop_index(self, name: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(f'DROP INDEX IF EXISTS "{self.name}_{name}"')
+
+    def index_information(self) -> Dict[str, Dict]:
+        prefix = f"{self.name}_"
+        information = {}
+        with self._lock:
+            for _, name, unique, origin, _ in self._connection.execute(f'PRAGMA index_list("{self.name}")').fetchall():
+                if origin != "c" or not name.startswith(prefix):
+                    continue
+                columns = self._connection.execute(f'PRAGMA index_xinfo("{name}")').fetchall()
+                key = [(column[2].replace("__", "."), -1 if column[3] else 1) for column in columns if column[5]]
+                information[name[len(prefix):]] = {"key": key, **({"unique": True} if unique else {})}
+        return information
+
+    def _field_expression(self, field: str) -> Tuple[str, List[Any]]:
+        if field == "_id":
+            return "_id", []
+        if field in self._columns:
+            return f'"{self._columns[field]}"', []
+        return "json_extract(doc, ?)", [f"$.{field}"]
+
+    def _where(self, filter: Optional[Dict]) -> Tuple[str, List[Any]]:
+        if not filter:
+            return "1", []
+        clauses = [self._clause(key, condition) for key, condition in filter.items()]
+        return " AND ".join(sql for sql, _ in clauses), [param for _, params in clauses for param in params]
+
+    def _clause(self, key: str, condition: Any) -> Tuple[str, List[Any]]:
+        if key in ("$or", "$and"):
+            parts = [self._where(sub_filter) for sub_filter in condition]
+            joiner = " OR " if key == "$or" else " AND "
+            sql = joiner.join(f"({part_sql})" for part_sql, _ in parts) or "1"
+            return f"({sql})", [param for _, params in parts for param in params]
+        if key.startswith("$"):
+            raise ValueError(f"Unsupported query operator '{key}'")
+        expression, params = self._field_expression(key)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            return self._operators(key, expression, params, condition)
+        return self._equality(expression, params, condition)
+
+    def _equality(self, expression: str, params: List[Any], value: Any) -> Tuple[str, List[Any]]:
+        if value is None:
+            return f"{expression} IS NULL", params
+        return f"{expression} = ?", params + [_to_sql_value(value)]
+
+    def _operators(self, field: str, expression: str, params: List[Any], condition: Dict) -> Tuple[str, List[Any]]:
+        clauses = []
+        for operator, value in condition.items():
+            if operator == "$options":
+                continue
+            if operator == "$eq":
+                clauses.append(self._equality(expression, params, value))
+            elif operator == "$ne":
+                clauses.append((f"{expression} IS NOT ?", params + [_to_sql_value(value)]))
+            elif operator in ("$in", "$nin"):
+                placeholders = ", ".join("?" for _ in value) or "NULL"
+                negation = "NOT " if operator == "$nin" else ""
+                clauses.append((f"{expression} {negation}IN ({placeholders})",
+                                params + [_to_sql_value(item) for item in value]))
+            elif operator == "$all":
+                # Every value must be the field or one of its array items; json_each lists both
+                member = "EXISTS (SELECT 1 FROM json_each(doc, ?) WHERE value = ?)"
+                clauses.append((" AND ".join(member for _ in value) or "0",
+                                [param for item in value for param in (f"$.{field}", _to_sql_value(item))]))
+            elif operator in _COMPARISON_OPERATORS:
+                clauses.append((f"{expression} {_COMPARISON_OPERATORS[operator]} ?", params + [_to_sql_value(value)]))
+            elif operator == "$regex":
+                clauses.append((f"dm_regexp(?, ?, {expression})", [value, condition.get("$options", "")] + params))
+            elif operator == "$exists":
+                clauses.append((f"json_type(doc, ?) IS {'NOT ' if value else ''}NULL", [f"$.{field}"]))
+            else:
+                raise ValueError(f"Unsupported query operator '{operator}'")
+        return " AND ".join(sql for sql, _ in clauses), [param for _, ps in clauses for param in ps]
+
+    def _order_by(self, sort: Optional[List[Tuple[str, int]]]) -> Tuple[str, List[Any]]:
+        if not sort:
+            return "", []
+        terms = []
+        params = []
+        for field, direction in normalize_index_keys(sort):
+            expression, expression_params = self._field_expression(field)
+            terms.append(f"{expression}{' DESC' if direction == -1 else ''}")
+            params.extend(expression_params)
+        return f" ORDER BY {', '.join(terms)}", params
+
+    def _select(self, columns: str, filter: Optional[Dict], sort=None, limit: int = 0, skip: int = 0) -> List[Tuple]:
+        where, params = self._where(filter)
+        order_by, order_params = self._order_by(sort)
+        sql = f'SELECT {columns} FROM "{self.name}" WHERE {where}{order_by} LIMIT ? OFFSET ?'
+        with self._lock:
+            return self._connection.execute(sql, params + order_params + [limit or -1, skip]).fetchall()
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+             sort: Optional[List[Tuple[str, int]]] = None, limit: int = 0, skip: int = 0) -> Iterator[Dict]:
+        rows = self._select("doc", filter, sort, limit, skip)
+        return (project_document(json.loads(row[0]), projection) for row in rows)
+
+    def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return next(self.find(filter, projection, limit=1), None)
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        document.setdefault("_id", uuid.uuid4().hex)
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    f'INSERT INTO "{self.name}" (_id, doc) VALUES (?, ?)',
+                    (str(document["_id"]), _encode(document)),
+                )
+        except sqlite3.IntegrityError as error:
+            raise DuplicateKeyError(str(error)) from error
+        return InsertOneResult(inserted_id=document["_id"])
+
+    def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        inserted_ids = []
+        write_errors = []
+        with self._lock, self._connection:
+            for index, document in enumerate(documents):
+                document.setdefault("_id", uuid.uuid4().hex)
+                try:
+                    self._connection.execute(
+                        f'INSERT INTO "{self.name}" (_id, doc) VALUES (?, ?)',
+                        (str(document["_id"]), _encode(document)),
+                    )
+                except sqlite3.IntegrityError as error:
+                    write_errors.append({"index": index, "code": 11000, "errmsg": str(error), "op": document})
+                    if ordered:
+                        break
+                    continue
+                inserted_ids.append(document["_id"])
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids)})
+        return InsertManyResult(inserted_ids=inserted_ids)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Apply update to the first match (or an upserted seed), returning the document before and after."""
+        with self._lock:
+            row = next(iter(self._select("_id, doc", filter, limit=1)), None)
+            if row is None:
+                if not upsert:
+                    return None, None
+                seed = {key: value for key, value in filter.items() if not key.startswith("$")}
+                document = apply_update(seed, update)
+                self.insert_one(document)
+                return None, document
+            before = json.loads(row[1])
+            document = apply_update(json.loads(row[1]), update)
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        f'UPDATE "{self.name}" SET doc = ? WHERE _id = ?', (_encode(document), row[0])
+                    )
+            except sqlite3.IntegrityError as error:
+                raise DuplicateKeyError(str(error)) from error
+        return before, document
+
+    def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        before, _ = self._update(filter, update, upsert)
+        matched = int(before is not None)
+        return UpdateResult(matched_count=matched, modified_count=matched)
+
+    def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                            upsert: bool = False, return_document: bool = False) -> Optional[Dict]:
+        before, after = self._update(filter, update, upsert)
+        document = after if return_document else before
+        return project_document(document, projection) if document is not None else None
+
+    def _delete(self, filter: Dict, limit: int) -> DeleteResult:
+        where, params = self._where(filter)
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                f'DELETE FROM "{self.name}" WHERE _id IN '
+                f'(SELECT _id FROM "{self.name}" WHERE {where} LIMIT ?)',
+                params + [limit],
+            )
+        return DeleteResult(deleted_count=cursor.rowcount)
+
+    def delete_one(self, filter: Dict) -> DeleteResult:
+        return self._delete(filter, 1)
+
+    def delete_many(self, filter: Dict) -> DeleteResult:
+        return self._delete(filter, -1)
+
+    def count_documents(self, filter: Dict) -> int:
+        return self._select("COUNT(*)", filter)[0][0]
+
+    def data_size(self, filter: Dict) -> int:
+        return self._select("SUM(length(doc))", filter)[0][0] or 0
+
+    def explain(self, filter: Optional[Dict]) -> Dict[str, Any]:
+        """SQLite's query plan for filter; it does not report how many rows a query read."""
+        where, params = self._where(filter)
+        with self._lock:
+            rows = self._connection.execute(f'EXPLAIN QUERY PLAN SELECT doc FROM "{self.name}" WHERE {where}',
+                                            params).fetchall()
+        return {"plan": "; ".join(row[-1] for row in rows), "docs_examined": None}
+
+    def create_text_index(self, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        """
+        Maintain an FTS5 table over fields, kept in sync with the documents by triggers.
+
+        The document table is keyed by _id, so its implicit rowids may change on VACUUM.
+        FTS rows are keyed instead by a separate table's INTEGER PRIMARY KEY, mapped to _id.
+        """
+        table, keys = f"{self.name}_fts", f"{self.name}_fts_keys"
+        self._text_weights = [float((weights or {}).get(field, 1)) for field in fields]
+        columns = [_column_name(field) for field in fields]
+        with self._lock:
+            existing = [row[1] for row in self._connection.execute(f'PRAGMA table_info("{table}")')]
+            has_keys = self._connection.execute(f'PRAGMA table_info("{keys}")').fetchall()
+            # Tables from before the key table shared the document rowid; they are rebuilt
+            if existing == columns and has_keys:
+                return
+            values = ", ".join(f"json_extract(new.doc, '$.{field}')" for field in fields)
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            key_of = f'(SELECT text_rowid FROM "{keys}" WHERE doc_id = {{}}._id)'
+            self._connection.executescript(f'''
+                DROP TABLE IF EXISTS "{table}";
+                DROP TABLE IF EXISTS "{keys}";
+                CREATE TABLE "{keys}" (text_rowid INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE);
+                INSERT INTO "{keys}" (doc_id) SELECT _id FROM "{self.name}";
+                CREATE VIRTUAL TABLE "{table}" USING fts5({column_list}, tokenize = 'porter unicode61');
+                INSERT INTO "{table}" (rowid, {column_list})
+                    SELECT text_rowid, {", ".join(f"json_extract(doc, '$.{field}')" for field in fields)}
+                    FROM "{self.name}" JOIN "{keys}" ON doc_id = _id;
+                DROP TRIGGER IF EXISTS "{self.name}_fts_insert";
+                DROP TRIGGER IF EXISTS "{self.name}_fts_update";
+                DROP TRIGGER IF EXISTS "{self.name}_fts_delete";
+                CREATE TRIGGER "{self.name}_fts_insert" AFTER INSERT ON "{self.name}" BEGIN
+                    INSERT OR IGNORE INTO "{keys}" (doc_id) VALUES (new._id);
+                    INSERT INTO "{table}" (rowid, {column_list}) VALUES ({key_of.format("new")}, {values});
+                END;
+                CREATE TRIGGER "{self.name}_fts_update" AFTER UPDATE ON "{self.name}" BEGIN
+                    DELETE FROM "{table}" WHERE rowid = {key_of.format("old")};
+                    DELETE FROM "{keys}" WHERE doc_id = old._id AND old._id IS NOT new._id;
+                    INSERT OR IGNORE INTO "{keys}" (doc_id) VALUES (new._id);
+                    INSERT INTO "{table}" (rowid, {column_list}) VALUES ({key_of.format("new")}, {values});
+                END;
+                CREATE TRIGGER "{self.name}_fts_delete" AFTER DELETE ON "{self.name}" BEGIN
+                    DELETE FROM "{table}" WHERE rowid = {key_of.format("old")};
+                    DELETE FROM "{keys}" WHERE doc_id = old._id;
+                END;
+            ''')
+
+    def text_search(self, query: str, filter: Optional[Dict] = None, limit: int = 10) -> List[Tuple[Dict, float]]:
+        match = _match_expression(query)
+        if not match:
+            return []
+        table, keys = f"{self.name}_fts", f"{self.name}_fts_keys"
+        weights = ", ".join(str(weight) for weight in self._text_weights)
+        where, params = self._where(filter)
+        sql = (
+            f'SELECT doc, score FROM "{self.name}" JOIN "{keys}" ON doc_id = _id JOIN '
+            f'(SELECT rowid AS fts_rowid, -bm25("{table}"{", " + weights if weights else ""}) AS score '
+            f'FROM "{table}" WHERE "{table}" MATCH ?) ON text_rowid = fts_rowid '
+            f'WHERE {where} ORDER BY score DESC LIMIT ?'
+        )
+        with self._lock:
+            rows = self._connection.execute(sql, [match] + params + [limit]).fetchall()
+        return [(json.loads(doc), score) for doc, score in rows]
+
+class SqliteBackend(StorageBackend):
+    """Embedded storage in a single SQLite file (or ':memory:'), one table per collection."""
+
+    def __init__(self, path: str, name: str, query_log=None):
+        super().__init__(name, query_log)
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.create_function("dm_regexp", 3, _regexp, deterministic=True)
+        self._collections: Dict[str, SqliteCollection] = {}
+
+    def get_collection(self, name: str) -> SqliteCollection:
+        if name not in self._collections:
+            self._collections[name] = SqliteCollection(self, name)
+        return self.profiled(self._collections[name])
+
+    def create_text_index(self, collection: str, fields: List[str], weights: Optional[Dict[str, int]] = None) -> None:
+        self.get_collection(collection).create_text_index(fields, weights)
+
+    def text_search(self, collection: str, query: str, filter: Optional[Dict] = None,
+                    limit: int = 10) -> List[Tuple[Dict, float]]:
+        return self.get_collection(collection).text_search(query, filter, limit)
+
+    def storage_size(self, collection: str) -> Optional[int]:
+        # The dbstat table is left out of some SQLite builds
+        try:
+            with self.lock:
+                row = self.connection.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (collection,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] or 0
+
+    def data_size(self, collection: str, filter: Dict) -> int:
+        return self.get_collection(collection).data_size(filter)
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,93 @@
+"""
+Runs the asyncio operation modules for blocking callers.
+
+The async_*_operations modules hold the one implementation of each operation.
+Their blocking counterparts in the *_operations modules call run_blocking,
+which hands the coroutine a view of the database whose async collections are
+the synchronous ones: every await then completes at once, so the coroutine is
+driven to its end in the calling thread, without an event loop (and without
+the Motor collections, which are bound to the server's loop).
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+def run_blocking(operation: Callable, db, *args, **kwargs) -> Any:
+    """Call the async operation with db and the arguments, and return its result."""
+    coroutine = operation(BlockingDatabase(db), *args, **kwargs)
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError(f"{operation.__qualname__} awaited the event loop, which blocking callers do not run")
+
+class BlockingCursor:
+    """A synchronous cursor behind the part of Motor's cursor API the async operation modules rely on."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        documents = list(self.cursor)
+        return documents if length is None else documents[:length]
+
+    async def __aiter__(self):
+        for document in self.cursor:
+            yield document
+
+class BlockingCollection:
+    """A synchronous collection whose methods are awaited like those of an AsyncCollection, without leaving the thread."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs) -> BlockingCursor:
+        return BlockingCursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline: List[Dict]) -> BlockingCursor:
+        return BlockingCursor(self.collection.aggregate(pipeline))
+
+    def __getattr__(self, name: str):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+class BlockingBackend:
+    """Forwards to a storage backend, handing out its synchronous collections as the async ones."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get_async_collection(self, name: str) -> BlockingCollection:
+        return BlockingCollection(self._backend.get_collection(name))
+
+    async def text_search_async(self, collection: str, query: str, filter: Optional[Dict] = None, limit: int = 10):
+        return self._backend.text_search(collection, query, filter, limit)
+
+    def __getattr__(self, name: str):
+        return getattr(self._backend, name)
+
+class BlockingDatabase:
+    """Forwards to a Database (or TenantDatabase), with its async collections and waits answered synchronously."""
+
+    def __init__(self, db):
+        self._db = db
+
+    @property
+    def backend(self) -> BlockingBackend:
+        return BlockingBackend(self._db.backend)
+
+    async def text_search_async(self, collection: str, query: str, filter: Optional[Dict] = None, limit: int = 10):
+        return self._db.text_search(collection, query, filter, limit)
+
+    async def wait_for_indexes_async(self) -> None:
+        self._db.wait_for_indexes()
+
+    async def offload(self, function: Callable, *args) -> Any:
+        return function(*args)
+
+    def __getattr__(self, name: str):
+        if name.startswith("async_") and name.endswith("_collection"):
+            return BlockingCollection(getattr(self._db, name[len("async_"):]))
+        return getattr(self._db, name)
@@ -0,0 +1,249 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from models.character import Character
+from models.import_report import ImportReport, RecordError
+from models.setting import Setting
+from .campaign_operations import get_campaign
+from .character_operations import _build_character_document
+from .db_operations import Database
+from .name_index import index_names_many
+from .pagination import DEFAULT_BATCH_SIZE
+from .setting_operations import _build_setting_document, rebuild_setting_paths
+
+READ_CHUNK_SIZE = 1 << 16
+
+# (location, record) as read from a file; (location, kind, document) once validated
+Record = Tuple[str, Any]
+Validated = Tuple[str, str, Dict]
+
+def iter_records(path: str) -> Iterator[Record]:
+    """
+    Stream the records of a JSON or JSONL file without loading it whole.
+
+    JSONL files hold one record per line. JSON files hold one record, a top-level
+    array of records (read element by element), or several concatenated values.
+    """
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield f"{name}:{number}", _loads(line)
+            return
+        yield from ((f"{name}#{index}", record) for index, record in enumerate(_iter_json_values(file)))
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as error:
+        return error
+
+def _iter_json_values(file) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = None
+    eof = False
+    while True:
+        # Skip whitespace and, inside a top-level array, the separating commas
+        while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ",")):
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(READ_CHUNK_SIZE), 0
+            eof = not buffer
+            continue
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            chunk = "" if eof else file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                # A malformed record cannot be skipped reliably, so it ends the file
+                yield error
+                return
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield value
+        position = end
+
+def classify(record: Any) -> Tuple[str, Dict]:
+    """
+    Work out whether a record is a character or a setting.
+
+    Character sheets may wrap the character in a "character" key next to other
+    sections (such as "campaign_progress"), which are kept in the character's data.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record is not a JSON object")
+    if isinstance(record.get("setting"), dict):
+        return "settings", record["setting"]
+    if isinstance(record.get("character"), dict):
+        extra = {key: value for key, value in record.items() if key != "character"}
+        character = dict(record["character"])
+        if extra:
+            character["data"] = {**(character.get("data") or {}), **extra}
+        return "characters", character
+    if "setting_type" in record:
+        return "settings", record
+    return "characters", record
+
+def validate_batch(batch: List[Record], campaign_id: Optional[str]) -> Tuple[List[Validated], List[Tuple[str, str]]]:
+    """Validate records and build their documents; runs in worker processes."""
+    documents = []
+    errors = []
+    for location, record in batch:
+        try:
+            if isinstance(record, json.JSONDecodeError):
+                raise ValueError(f"Invalid JSON: {record}")
+            kind, fields = classify(record)
+            if kind == "characters":
+                fields = {**fields, "campaign_id": fields.get("campaign_id") or campaign_id}
+                if not fields["campaign_id"]:
+                    raise ValueError("No campaign_id in the record and no campaign given for the import")
+                character = Character.model_validate({**fields, "id": "", "created_at": "", "updated_at": ""})
+                documents.append((location, kind, _build_character_document(character)))
+            else:
+                setting_doc = _build_setting_document(fields)
+                Setting.model_validate(setting_doc)
+                documents.append((location, kind, setting_doc))
+        except (ValueError, ValidationError) as error:
+            errors.append((location, _describe(error)))
+    return documents, errors
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+    return str(error)
+
+def _batches(paths: Iterable[str], batch_size: int) -> Iterator[List[Record]]:
+    batch = []
+    for path in paths:
+        for record in iter_records(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+class _InlineExecutor(Executor):
+    """Runs validation in the calling thread when only one worker is wanted."""
+
+    def submit(self, function, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_result(function(*args, **kwargs))
+        return future
+
+def import_files(db: Database, paths: List[str], campaign_id: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None) -> ImportReport:
+    """
+    Import characters and settings from JSON/JSONL files.
+
+    Files are streamed in batches of batch_size records. Batches are validated
+    by a pool of worker processes (workers defaults to the CPU count; 1 validates
+    inline) and written with unordered insert_many, so one bad record never stops
+    the rest of its batch.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1")
+    for path in paths:
+        if not os.path.isfile(path):
+            raise ValueError(f"File '{path}' does not exist.")
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    records = imported = 0
+    imported_by_kind: Dict[str, int] = {"characters": 0, "settings": 0}
+    errors: List[RecordError] = []
+    known_campaigns: Dict[str, bool] = {}
+
+    # Spawned rather than forked workers, as forking a process that runs threads is unsafe
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 else None
+    with pool or _InlineExecutor() as executor:
+        pending = deque()
+        batches = _batches(paths, batch_size)
+        while True:
+            # Keep a couple of batches per worker in flight so memory stays bounded
+            while len(pending) < workers * 2:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                records += len(batch)
+                pending.append(executor.submit(validate_batch, batch, campaign_id))
+            if not pending:
+                break
+            documents, batch_errors = pending.popleft().result()
+            errors.extend(RecordError(location=location, error=error) for location, error in batch_errors)
+            documents = _drop_unknown_campaigns(db, documents, known_campaigns, errors)
+            for kind, count in _insert(db, documents, errors).items():
+                imported_by_kind[kind] += count
+                imported += count
+    if imported_by_kind["settings"]:
+        # Parents may arrive after their children, so paths are worked out once everything is in
+        rebuild_setting_paths(db)
+
+    seconds = time.perf_counter() - start
+    return ImportReport(
+        files=paths,
+        records=records,
+        imported=imported,
+        failed=records - imported,
+        errors=errors,
+        seconds=round(seconds, 3),
+        records_per_second=round(records / seconds, 1) if seconds else 0.0,
+    )
+
+def _drop_unknown_campaigns(db: Database, documents: List[Validated], known_campaigns: Dict[str, bool],
+                            errors: List[RecordError]) -> List[Validated]:
+    kept = []
+    for location, kind, document in documents:
+        campaign_id = document.get("campaign_id") if kind == "characters" else None
+        if campaign_id is not None and campaign_id not in known_campaigns:
+            try:
+                get_campaign(db, campaign_id)
+                known_campaigns[campaign_id] = True
+            except ValueError:
+                known_campaigns[campaign_id] = False
+        if campaign_id is not None and not known_campaigns[campaign_id]:
+            errors.append(RecordError(location=location, error=f"Campaign with ID {campaign_id} does not exist."))
+            continue
+        kept.append((location, kind, document))
+    return kept
+
+def _insert(db: Database, documents: List[Validated], errors: List[RecordError]) -> Dict[str, int]:
+    inserted = {}
+    for kind in ("characters", "settings"):
+        batch = [(location, document) for location, document_kind, document in documents if document_kind == kind]
+        if not batch:
+            continue
+        collection = db.characters_collection if kind == "characters" else db.settings_collection
+        failed = set()
+        try:
+            collection.insert_many([document for _, document in batch], ordered=False)
+        except BulkWriteError as error:
+            for write_error in error.details.get("writeErrors", []):
+                location, document = batch[write_error["index"]]
+                failed.add(write_error["index"])
+                message = (f"A {kind[:-1]} named '{document.get('name')}' already exists"
+                           if write_error.get("code") == 11000 else write_error.get("errmsg", "Write failed"))
+                errors.append(RecordError(location=location, error=message))
+        written = [document for index, (_, document) in enumerate(batch) if index not in failed]
+        index_names_many(db, kind, written)
+        db.stats.invalidate(kind)
+        inserted[kind] = len(written)
+    return inserted
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class EntityCache:
+    """
+    In-process LRU cache of entity models keyed by (collection, entity id).
+
+    Entries expire after ttl seconds when a ttl is given. A max_size of 0
+    disables caching. Cached models are shared instances, so callers must
+    not mutate them.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, collection: str, entity_id: Hashable) -> Optional[Any]:
+        key = (collection, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, collection: str, entity_id: Hashable, value: Any) -> Any:
+        if self.max_size <= 0:
+            return value
+        key = (collection, entity_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, collection: str, entity_id: Hashable) -> None:
+        with self._lock:
+            self._entries.pop((collection, entity_id), None)
+
+    def clear(self, collection: Optional[str] = None) -> None:
+        with self._lock:
+            if collection is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == collection]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+        }
+
+    def _is_expired(self, entry: Tuple[float, Any]) -> bool:
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
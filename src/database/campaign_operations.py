@@ -1,166 +1,153 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Union
 from models.campaign import Campaign
+from models.campaign_stats import CampaignStats, ValueCount
+from models.character import Ability, Spells
+from models.page import Page
+from models.search import SearchHit
 from bson.objectid import ObjectId
+from .blocking import run_blocking
 from .db_operations import objectid_to_str, Database
+from .decoding import decode_model, with_iso_timestamps
+from .pagination import DEFAULT_PAGE_SIZE
+from .projection import project_result
+
+# Each operation is implemented once, in async_campaign_operations; these run it for blocking callers
 
 def create_campaign(db: Database, name: str, description: str) -> Campaign:
-    # Check if a campaign with this name already exists
-    existing_campaign = db.campaigns_collection.find_one({"name": name})
-    if existing_campaign:
-        raise ValueError(f"A campaign with the name '{name}' already exists")
-    
+    return run_blocking(_async.create_campaign, db, name, description)
+
+def update_campaign(db: Database, campaign_id: str, name: str, description: str) -> Campaign:
+    return run_blocking(_async.update_campaign, db, campaign_id, name, description)
+
+def delete_campaign(db: Database, campaign_id: str) -> bool:
+    return run_blocking(_async.delete_campaign, db, campaign_id)
+
+def search_campaigns(db: Database, query: str, fields: Optional[List[str]] = None) -> List[Union[Campaign, dict]]:
+    return run_blocking(_async.search_campaigns, db, query, fields)
+
+def text_search_campaigns(db: Database, query: str, limit: int = 10) -> List[SearchHit]:
+    return run_blocking(_async.text_search_campaigns, db, query, limit)
+
+def lookup_campaigns_by_name(db: Database, fragment: str, limit: int = 10) -> List[Campaign]:
+    return run_blocking(_async.lookup_campaigns_by_name, db, fragment, limit)
+
+def get_campaign(db: Database, campaign_id: str, fields: Optional[List[str]] = None) -> Union[Campaign, dict]:
+    return run_blocking(_async.get_campaign, db, campaign_id, fields)
+
+def get_campaign_stats(db: Database, campaign_id: str) -> CampaignStats:
+    """Summarize a campaign's characters in one aggregation, returning only the summary."""
+    return run_blocking(_async.get_campaign_stats, db, campaign_id)
+
+def get_campaign_by_name(db: Database, name: str) -> Optional[Campaign]:
+    return run_blocking(_async.get_campaign_by_name, db, name)
+
+def list_campaigns(db: Database) -> List[Campaign]:
+    return run_blocking(_async.list_campaigns, db)
+
+def list_campaigns_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                        fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    return run_blocking(_async.list_campaigns_page, db, limit, cursor, fields, include_total)
+
+def delete_all_campaigns(db: Database) -> int:
+    return run_blocking(_async.delete_all_campaigns, db)
+
+def _build_campaign_document(name: str, description: str) -> dict:
     now = datetime.now(timezone.utc)
     # Create a new ObjectId first
     oid = ObjectId()
-    str_id = objectid_to_str(oid)
-    
-    campaign = {
+    return {
         "_id": oid,
-        "id": str_id,  # Store the string ID in the document
-        "name": name,
-        "description": description,
-        "data": {},
-        "created_at": now.isoformat(),
-        "updated_at": now.isoformat()
-    }
-    db.campaigns_collection.insert_one(campaign)
-    
-    # For the Pydantic model
-    campaign_dict = {
-        "id": str_id,
+        "id": objectid_to_str(oid),  # Store the string ID in the document
         "name": name,
         "description": description,
         "data": {},
         "created_at": now.isoformat(),
         "updated_at": now.isoformat()
     }
-    return Campaign(**campaign_dict)
 
-def update_campaign(db: Database, campaign_id: str, name: str, description: str) -> Campaign:
-    # Find by string ID
-    campaign = db.campaigns_collection.find_one({"id": campaign_id})
-    if not campaign:
-        raise ValueError(f"Campaign with ID {campaign_id} does not exist.")
-    
-    now = datetime.now(timezone.utc)
-    updated_fields = {
+def _build_campaign_update(name: str, description: str) -> dict:
+    return {
         "name": name,
         "description": description,
-        "updated_at": now.isoformat()
+        "updated_at": datetime.now(timezone.utc).isoformat()
     }
-    db.campaigns_collection.update_one({"id": campaign_id}, {"$set": updated_fields})
-    
-    # For the Pydantic model
-    campaign_dict = {
-        "id": campaign_id,
-        "name": name,
-        "description": description,
-        "data": campaign.get("data", {}),
-        "created_at": campaign["created_at"],
-        "updated_at": now.isoformat()
-    }
-    return Campaign(**campaign_dict)
-
-def delete_campaign(db: Database, campaign_id: str) -> bool:
-    result = db.campaigns_collection.delete_one({"id": campaign_id})
-    if result.deleted_count > 0:
-        return True
-    return False
 
-def search_campaigns(db: Database, query: str) -> List[Campaign]:
-    results = db.campaigns_collection.find({"$or": [
+def _campaign_search_filter(query: str) -> dict:
+    return {"$or": [
         {"name": {"$regex": query, "$options": "i"}},
         {"description": {"$regex": query, "$options": "i"}}
-    ]})
-    campaigns = []
-    for campaign in results:
-        campaign_dict = {
-            "id": campaign["id"],
-            "name": campaign["name"],
-            "description": campaign["description"],
-            "data": campaign.get("data", {}),
-            "created_at": campaign["created_at"],
-            "updated_at": campaign["updated_at"]
-        }
-        campaigns.append(Campaign(**campaign_dict))
-    return campaigns
-
-def get_campaign(db: Database, campaign_id: str) -> Campaign:
-    campaign = db.campaigns_collection.find_one({"id": campaign_id})
-    if not campaign:
-        raise ValueError(f"Campaign with ID {campaign_id} does not exist.")
-    
-    # Convert datetime objects to ISO strings if needed
-    created_at = campaign["created_at"]
-    updated_at = campaign["updated_at"]
-    
-    # If they're datetime objects, convert to ISO strings
-    if isinstance(created_at, datetime):
-        created_at = created_at.isoformat()
-    if isinstance(updated_at, datetime):
-        updated_at = updated_at.isoformat()
-    
-    campaign_dict = {
-        "id": campaign["id"],
-        "name": campaign["name"],
-        "description": campaign["description"],
-        "data": campaign.get("data", {}),
-        "created_at": created_at,
-        "updated_at": updated_at
-    }
-    return Campaign(**campaign_dict)
+    ]}
 
-def get_campaign_by_name(db: Database, name: str) -> Optional[Campaign]:
-    campaign = db.campaigns_collection.find_one({"name": name})
-    if not campaign:
-        return None
-    
-    # Convert datetime objects to ISO strings if needed
-    created_at = campaign["created_at"]
-    updated_at = campaign["updated_at"]
-    
-    # If they're datetime objects, convert to ISO strings
-    if isinstance(created_at, datetime):
-        created_at = created_at.isoformat()
-    if isinstance(updated_at, datetime):
-        updated_at = updated_at.isoformat()
-    
-    campaign_dict = {
-        "id": campaign["id"],
-        "name": campaign["name"],
-        "description": campaign["description"],
-        "data": campaign.get("data", {}),
-        "created_at": created_at,
-        "updated_at": updated_at
+def _convert_to_campaign(campaign: dict) -> Campaign:
+    campaign = with_iso_timestamps(campaign)
+    if "data" not in campaign:
+        campaign = {**campaign, "data": {}}
+    return decode_model(Campaign, campaign)
+
+def _campaign_results(documents, fields: Optional[List[str]]) -> List[Union[Campaign, dict]]:
+    """Campaign models, or dicts of the requested fields when a projection is used."""
+    return [project_result(campaign, fields) if fields else _convert_to_campaign(campaign) for campaign in documents]
+
+def _build_campaign_page(documents: List[dict], next_cursor: Optional[str],
+                         fields: Optional[List[str]], total: Optional[int]) -> Page:
+    return Page(items=_campaign_results(documents, fields), next_cursor=next_cursor, total=total)
+
+def _known_spells_expression(spell_level: str) -> dict:
+    return {"$size": {"$ifNull": [f"$spells.{spell_level}", []]}}
+
+def _campaign_stats_pipeline(campaign_id: str) -> List[dict]:
+    """
+    Distributions and totals over a campaign's characters.
+
+    The $match uses the campaign_id index; everything after it runs inside
+    the database, so only the small summary document comes back.
+    """
+    known_spells = {"$add": [_known_spells_expression(spell_level) for spell_level in Spells.model_fields]}
+    summary = {
+        "_id": None,
+        "character_count": {"$sum": 1},
+        "average_level": {"$avg": "$level"},
+        "min_level": {"$min": "$level"},
+        "max_level": {"$max": "$level"},
+        "spellcasters": {"$sum": {"$cond": [{"$gt": [known_spells, 0]}, 1, 0]}},
+        "known_spells": {"$sum": known_spells},
     }
-    return Campaign(**campaign_dict)
+    for ability in Ability.model_fields:
+        summary[f"ability_{ability}"] = {"$avg": f"$ability_scores.{ability}"}
+    for spell_level in Spells.model_fields:
+        summary[f"spells_{spell_level}"] = {"$sum": _known_spells_expression(spell_level)}
+    return [
+        {"$match": {"campaign_id": campaign_id}},
+        {"$facet": {
+            "classes": [{"$group": {"_id": "$class", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+            "races": [{"$group": {"_id": "$race", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+            "levels": [{"$group": {"_id": "$level", "count": {"$sum": 1}}}, {"$sort": {"_id": 1}}],
+            "summary": [{"$group": summary}],
+        }},
+    ]
 
-def list_campaigns(db: Database) -> List[Campaign]:
-    campaigns = db.campaigns_collection.find()
-    campaign_list = []
-    for campaign in campaigns:
-        # Convert datetime objects to ISO strings if needed
-        created_at = campaign["created_at"]
-        updated_at = campaign["updated_at"]
-        
-        # If they're datetime objects, convert to ISO strings
-        if isinstance(created_at, datetime):
-            created_at = created_at.isoformat()
-        if isinstance(updated_at, datetime):
-            updated_at = updated_at.isoformat()
-        
-        campaign_dict = {
-            "id": campaign["id"],
-            "name": campaign["name"],
-            "description": campaign["description"],
-            "data": campaign.get("data", {}),
-            "created_at": created_at,
-            "updated_at": updated_at
-        }
-        campaign_list.append(Campaign(**campaign_dict))
-    return campaign_list
+def _build_campaign_stats(campaign_id: str, result: List[dict]) -> CampaignStats:
+    facets = result[0] if result else {}
+    summary = (facets.get("summary") or [{}])[0]
 
-def delete_all_campaigns(db: Database) -> int:
-    result = db.campaigns_collection.delete_many({})
-    return result.deleted_count
+    def counts(facet: str) -> List[ValueCount]:
+        return [ValueCount(value=group["_id"], count=group["count"]) for group in facets.get(facet, [])]
+
+    return CampaignStats(
+        campaign_id=campaign_id,
+        character_count=summary.get("character_count", 0),
+        classes=counts("classes"),
+        races=counts("races"),
+        levels=counts("levels"),
+        average_level=summary.get("average_level"),
+        min_level=summary.get("min_level"),
+        max_level=summary.get("max_level"),
+        average_ability_scores={ability: summary.get(f"ability_{ability}") for ability in Ability.model_fields},
+        spellcasters=summary.get("spellcasters", 0),
+        known_spells=summary.get("known_spells", 0),
+        spells_by_level={spell_level: summary.get(f"spells_{spell_level}", 0) for spell_level in Spells.model_fields},
+    )
+
+# Imported last: the async module imports the helpers above from this one
+from . import async_campaign_operations as _async
@@ -1,89 +1,85 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Union
 from models.character import Character
+from models.patch import PatchOperation
+from models.page import Page
+from models.search import SearchHit
 from bson.objectid import ObjectId
+from .blocking import run_blocking
 from .db_operations import objectid_to_str
-from .campaign_operations import get_campaign
 from .db_operations import Database
+from .decoding import decode_model
+from .pagination import DEFAULT_PAGE_SIZE
+from .projection import project_result
+from .patch import compile_patch, patched_paths
+from .backends.base import apply_update
+
+# Model field names that are stored under a different document key
+CHARACTER_FIELD_ALIASES = {"character_class": "class"}
+
+# Identity fields, changed with update_character (names are kept unique, timestamps are set here)
+UNPATCHABLE_FIELDS = {"id", "name", "campaign_id", "created_at", "updated_at"}
+
+# MongoDB error codes for an update that meets a null: TypeMismatch, PathNotViable
+_NULL_PATH_ERRORS = {14, 28}
+
+# Each operation is implemented once, in async_character_operations; these run it for blocking callers
 
 def create_character(db: Database, character: Character):
+    return run_blocking(_async.create_character, db, character)
 
-    # Verify campaign exists
-    try:
-        get_campaign(db, character.campaign_id)
-    except ValueError:
-        raise ValueError(f"Campaign with ID {character.campaign_id} does not exist.")
-    
-    # Check if a character with this name already exists
-    existing_character = db.characters_collection.find_one({"name": character.name})
-    if existing_character:
-        raise ValueError(f"Character with name '{character.name}' already exists.")
-    
+def update_character(db: Database, character_id: str, **kwargs) -> Character:
+    return run_blocking(_async.update_character, db, character_id, **kwargs)
+
+def _defer_character_update(db: Database, character: Character, changes: dict) -> Character:
+    """Buffer an update of write-behind fields, returning the character with every pending change applied."""
+    db.write_behind.defer(character.id, _build_character_update(changes))
+    document = db.write_behind.overlay(character.model_dump(by_alias=True))
+    return db.entity_cache.put("characters", character.id, _convert_db_character_to_model(document))
+
+def patch_character(db: Database, character_id: str, operations: List[PatchOperation]) -> Character:
+    return run_blocking(_async.patch_character, db, character_id, operations)
+
+def _compile_character_patch(operations: List[PatchOperation]) -> dict:
+    return compile_patch(Character, operations, CHARACTER_FIELD_ALIASES, UNPATCHABLE_FIELDS)
+
+def _defer_character_patch(db: Database, character: Character, update: dict) -> Character:
+    """Apply a patch of write-behind fields to the character in memory and buffer the fields it changed."""
+    document = apply_update(character.model_dump(by_alias=True), update)
+    roots = {path.split(".")[0] for path in patched_paths(update)}
+    changes = {root: document[root] for root in roots}
+    db.write_behind.defer(character.id, {**changes, "updated_at": datetime.now(timezone.utc).isoformat()})
+    return db.entity_cache.put("characters", character.id, _convert_db_character_to_model(document))
+
+def delete_character(db: Database, character_id: str) -> bool:
+    return run_blocking(_async.delete_character, db, character_id)
+
+def _build_character_document(character: Character) -> dict:
     now = datetime.now(timezone.utc)
     # Create a new ObjectId first
     oid = ObjectId()
-    str_id = objectid_to_str(oid)
     
     # Convert character to dict and prepare for MongoDB
     character_dict = character.model_dump()
     
     # Set ID and timestamps
     character_dict["_id"] = oid
-    character_dict["id"] = str_id
+    character_dict["id"] = objectid_to_str(oid)
     character_dict["created_at"] = now.isoformat()
     character_dict["updated_at"] = now.isoformat()
     
     # Handle class field specially
     if "character_class" in character_dict:
         character_dict["class"] = character_dict.pop("character_class")
-    
-    # Insert into database
-    db.characters_collection.insert_one(character_dict)
-    
-    return _convert_db_character_to_model(character_dict)
-
-    # character.id = character_dict["id"]
-    # character.created_at = character_dict["created_at"]
-    # character.updated_at = character_dict["updated_at"] 
-    # return character
-
-    # # Return updated character
-    # return Character(
-    #     id=str_id,
-    #     campaign_id=character.campaign_id,
-    #     name=character.name,
-    #     player_name=character.player_name,
-    #     race=character.race,
-    #     character_class=character_dict.get("class"),
-    #     level=character.level,
-    #     subclass=character.subclass,
-    #     background=character.background,
-    #     ability_scores=character.ability_scores,
-    #     modifiers=character.modifiers,
-    #     proficiencies=character.proficiencies,
-    #     personality=character.personality,
-    #     backstory=character.backstory,
-    #     equipment=character.equipment,
-    #     spells=character.spells,
-    #     familiar=character.familiar,
-    #     motivations=character.motivations,
-    #     data=character.data,
-    #     created_at=now.isoformat(),
-    #     updated_at=now.isoformat()
-    # )
-
-def update_character(db: Database, character_id: str, **kwargs):
-    # Find by string ID
-    character = db.characters_collection.find_one({"id": character_id})
-    if not character:
-        raise ValueError(f"Character with ID {character_id} does not exist.")
-    
+    return character_dict
+
+def _build_character_update(changes: dict) -> dict:
     now = datetime.now(timezone.utc)
     
     # Prepare update fields
     updated_fields = {"updated_at": now.isoformat()}
     
-    for key, value in kwargs.items():
+    for key, value in changes.items():
         if key == "character_class":  # Handle the class field specially
             updated_fields["class"] = value
         elif key == "ability_scores" and isinstance(value, dict):
@@ -95,70 +91,10 @@ def update_character(db: Database, character_id: str, **kwargs):
                 updated_fields[f"data.campaign_progress.{progress_key}"] = progress_value
         else:
             updated_fields[key] = value
-    
-    db.characters_collection.update_one({"id": character_id}, {"$set": updated_fields})
-    
-    updated_character = db.characters_collection.find_one({"id": character_id})
-    return _convert_db_character_to_model(updated_character)
-
-def delete_character(db: Database, character_id: str) -> bool:
-    result = db.characters_collection.delete_one({"id": character_id})
-    if result.deleted_count > 0:
-        return True
-    return False
-
-def _convert_db_character_to_model(character: dict) -> Character:
-    character_dict = {
-        "id": character["id"],
-        "campaign_id": character["campaign_id"],
-        "name": character["name"],
-        "player_name": character.get("player_name"),
-        "race": character.get("race"),
-        "character_class": character.get("class"),
-        "subclass": character.get("subclass"),
-        "background": character.get("background"),
-        "level": character.get("level", 1),
-        "ability_scores": character.get("ability_scores"),
-        "modifiers": character.get("modifiers"),
-        "proficiencies": character.get("proficiencies"),
-        "personality": character.get("personality"),
-        "backstory": character.get("backstory"),
-        "equipment": character.get("equipment"),
-        "spells": character.get("spells"),
-        "familiar": character.get("familiar"),
-        "motivations": character.get("motivations"),
-        "data": character.get("data", {}),
-        "created_at": character["created_at"],
-        "updated_at": character["updated_at"]
-    }
-    return Character(**character_dict)
-
-def get_character(db: Database, character_id: str):
-    character = db.characters_collection.find_one({"id": character_id})
-    if not character:
-        raise ValueError(f"Character with ID {character_id} does not exist.")
-    
-    return _convert_db_character_to_model(character)
-
-def get_character_by_name(db: Database, name: str):
-    query = {"name": name}
-    character = db.characters_collection.find_one(query)
-    
-    if not character:
-        raise ValueError(f"Character with name '{name}' does not exist.")
-    
-    return _convert_db_character_to_model(character)
-
-def list_characters(db: Database) -> List[Character]:
-    characters = db.characters_collection.find()
-    return [_convert_db_character_to_model(character) for character in characters]
+    return updated_fields
 
-def list_campaign_characters(db: Database, campaign_id: str) -> List[Character]:
-    characters = db.characters_collection.find({"campaign_id": campaign_id})
-    return [_convert_db_character_to_model(character) for character in characters]
-
-def search_characters(db: Database, query: str = None, campaign_id: Optional[str] = None, 
-                     character_class: Optional[str] = None, race: Optional[str] = None) -> List[Character]:
+def _character_search_filter(query: Optional[str] = None, campaign_id: Optional[str] = None,
+                             character_class: Optional[str] = None, race: Optional[str] = None) -> dict:
     # Build the search query
     search_query = {}
     
@@ -176,10 +112,58 @@ def search_characters(db: Database, query: str = None, campaign_id: Optional[str
         
     if race:
         search_query["race"] = {"$regex": race, "$options": "i"}
-    
-    characters = db.characters_collection.find(search_query)
-    return [_convert_db_character_to_model(character) for character in characters]
+    return search_query
+
+def _convert_db_character_to_model(character: dict) -> Character:
+    return decode_model(Character, character)
+
+def get_character(db: Database, character_id: str, fields: Optional[List[str]] = None) -> Union[Character, dict]:
+    return run_blocking(_async.get_character, db, character_id, fields)
+
+def get_character_by_name(db: Database, name: str):
+    return run_blocking(_async.get_character_by_name, db, name)
+
+def list_characters(db: Database) -> List[Character]:
+    return run_blocking(_async.list_characters, db)
+
+def list_campaign_characters(db: Database, campaign_id: str) -> List[Character]:
+    return run_blocking(_async.list_campaign_characters, db, campaign_id)
+
+def list_characters_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    return run_blocking(_async.list_characters_page, db, limit, cursor, fields, include_total)
+
+def list_campaign_characters_page(db: Database, campaign_id: str, limit: int = DEFAULT_PAGE_SIZE,
+                                  cursor: Optional[str] = None, fields: Optional[List[str]] = None,
+                                  include_total: bool = False) -> Page:
+    return run_blocking(_async.list_campaign_characters_page, db, campaign_id, limit, cursor, fields, include_total)
+
+def search_characters(db: Database, query: str = None, campaign_id: Optional[str] = None, 
+                     character_class: Optional[str] = None, race: Optional[str] = None,
+                     fields: Optional[List[str]] = None) -> List[Union[Character, dict]]:
+    return run_blocking(_async.search_characters, db, query, campaign_id, character_class, race, fields)
+
+def lookup_characters_by_name(db: Database, fragment: str, campaign_id: Optional[str] = None,
+                              limit: int = 10) -> List[Character]:
+    return run_blocking(_async.lookup_characters_by_name, db, fragment, campaign_id, limit)
+
+def text_search_characters(db: Database, query: str, campaign_id: Optional[str] = None,
+                           limit: int = 10) -> List[SearchHit]:
+    return run_blocking(_async.text_search_characters, db, query, campaign_id, limit)
 
 def delete_all_characters(db: Database) -> int:
-    result = db.characters_collection.delete_many({})
-    return result.deleted_count
+    return run_blocking(_async.delete_all_characters, db)
+
+def _character_results(documents, fields: Optional[List[str]]) -> List[Union[Character, dict]]:
+    """Character models, or dicts of the requested fields when a projection is used."""
+    return [
+        project_result(character, fields, CHARACTER_FIELD_ALIASES) if fields else _convert_db_character_to_model(character)
+        for character in documents
+    ]
+
+def _build_character_page(documents: List[dict], next_cursor: Optional[str],
+                          fields: Optional[List[str]], total: Optional[int]) -> Page:
+    return Page(items=_character_results(documents, fields), next_cursor=next_cursor, total=total)
+
+# Imported last: the async module imports the helpers above from this one
+from . import async_character_operations as _async
@@ -1,65 +1,268 @@
-from pymongo import MongoClient
+import asyncio
 import os
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from .cache import EntityCache
+from .name_index import NAME_INDEX_COLLECTION, TrigramIndex, load_name_index
+from .query_log import SlowQueryLog
+from .stats import StatsCache, campaign_breakdown, collection_totals
+from .write_behind import WriteBehindBuffer
+
+if TYPE_CHECKING:
+    from .backends import StorageBackend
 
 # Default connection settings
 MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/")
 DB_NAME = os.environ.get("DB_NAME", "dnd_gm")
+DB_BACKEND = os.environ.get("DB_BACKEND", "mongodb")
+
+# Entity cache settings (size 0 disables the cache, empty TTL means entries never expire)
+ENTITY_CACHE_SIZE = int(os.environ.get("ENTITY_CACHE_SIZE", "1024"))
+ENTITY_CACHE_TTL = float(os.environ["ENTITY_CACHE_TTL"]) if os.environ.get("ENTITY_CACHE_TTL") else None
+
+# Treat names differing only in case as duplicates ("Lost Mines" vs "lost mines")
+UNIQUE_NAMES_IGNORE_CASE = os.environ.get("UNIQUE_NAMES_IGNORE_CASE", "").lower() in ("1", "true", "yes")
+
+# Character update fields written behind in batches (see database.write_behind); none turns it off
+WRITE_BEHIND_FIELDS = [field.strip() for field in os.environ.get("WRITE_BEHIND_FIELDS", "").split(",") if field.strip()]
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", "2"))
+
+# Slow-query log settings (an empty threshold turns the log off, an empty path keeps entries in memory only)
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100")) if os.environ.get("SLOW_QUERY_MS", "100") else None
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG") or None
+
+# Attributes that only exist once connected; on a deferred database the first use of any of them connects
+CONNECTED_ATTRIBUTES = (
+    "backend", "campaigns_collection", "characters_collection", "settings_collection", "name_trigrams_collection",
+    "async_campaigns_collection", "async_characters_collection", "async_settings_collection",
+    "async_name_trigrams_collection", "name_index",
+)
 
 class Database:
-    def __init__(self):
-        self.client = None
-        self.db = None
+    def __init__(self, query_log: Optional[SlowQueryLog] = None):
+        self.backend: Optional["StorageBackend"] = None
         self.campaigns_collection = None
         self.characters_collection = None
         self.settings_collection = None  # Added settings collection
         # Add other collections as needed
+        # Asyncio counterparts (Motor on MongoDB, worker threads elsewhere)
+        self.async_campaigns_collection = None
+        self.async_characters_collection = None
+        self.async_settings_collection = None
+        self.entity_cache = EntityCache(ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+        # Counts and sizes for get_info, invalidated by the writes that change them
+        self.stats = StatsCache()
+        self.write_behind = WriteBehindBuffer(self, WRITE_BEHIND_FIELDS, WRITE_BEHIND_INTERVAL)
+        # Databases of one process may share a log (see database.registry)
+        self.query_log = query_log or SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, SLOW_QUERY_LOG)
+        # Trigram index of entity names, persisted in the backend and mirrored in memory
+        self.name_index = TrigramIndex()
+        self.name_trigrams_collection = None
+        self.async_name_trigrams_collection = None
         self.initialized = False
-    
-    def get_info(self):
-        return {
-            'name': self.db.name if self.db is not None else None,
-            'campaign_count': self.campaigns_collection.count_documents({}) if self.campaigns_collection is not None else 0,
-            'character_count': self.characters_collection.count_documents({}) if self.characters_collection is not None else 0,
-            'setting_count': self.settings_collection.count_documents({}) if self.settings_collection is not None else 0,
+        # Whether other processes serve the same database (see share_between_processes)
+        self.shared = False
+        # Set once every index is built; text searches wait for it
+        self.indexes_ready = threading.Event()
+        self.index_build_error: Optional[Exception] = None
+        # init_db arguments of a deferred database, until its first use connects
+        self._deferred: Optional[Tuple[str, str, str]] = None
+        self._connect_lock = threading.Lock()
+
+    def share_between_processes(self) -> None:
+        """
+        Turn off the state kept in this process that writes from other processes would leave stale.
+
+        Used when several server processes serve one database: entities and statistics are
+        always read from the database, character updates are written through, and name
+        lookups read the persisted name index instead of this process's copy of it.
+        """
+        self.shared = True
+        self.entity_cache = EntityCache(0)
+        self.stats.enabled = False
+        self.stats.clear()
+        self.write_behind.configure([])
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes that are not set: the connected ones of a deferred database
+        if name in CONNECTED_ATTRIBUTES and self.__dict__.get("_deferred") is not None:
+            _connect_deferred(self)
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    async def connect_async(self) -> None:
+        """Connect a deferred database on a worker thread, so connecting does not hold up the event loop."""
+        if self.__dict__.get("_deferred") is not None:
+            await asyncio.to_thread(_connect_deferred, self)
+
+    def wait_for_indexes(self) -> None:
+        """Block until the background index build (and setting path backfill) has finished."""
+        if self.backend is None:
+            raise RuntimeError("Database not initialized. Call init_db() first.")
+        self.indexes_ready.wait()
+
+    async def wait_for_indexes_async(self) -> None:
+        if self.backend is None:
+            raise RuntimeError("Database not initialized. Call init_db() first.")
+        if not self.indexes_ready.is_set():
+            await asyncio.to_thread(self.indexes_ready.wait)
+
+    def text_search(self, collection: str, query: str, filter: Optional[Dict] = None,
+                    limit: int = 10) -> List[Tuple[Dict, float]]:
+        """Full-text search the backend once its text indexes are built."""
+        self.wait_for_indexes()
+        return self.backend.text_search(collection, query, filter, limit)
+
+    async def text_search_async(self, collection: str, query: str, filter: Optional[Dict] = None,
+                                limit: int = 10) -> List[Tuple[Dict, float]]:
+        await self.wait_for_indexes_async()
+        return await self.backend.text_search_async(collection, query, filter, limit)
+
+    def get_info(self, campaign_id: Optional[str] = None):
+        """Document counts and sizes (cached until a write, see database.stats), optionally with a campaign's breakdown."""
+        if self.backend is None:
+            return {'name': None, 'campaign_count': 0, 'character_count': 0, 'setting_count': 0,
+                    'cache': self.entity_cache.stats()}
+        totals = collection_totals(self)
+        info = {
+            'name': self.backend.name,
+            'campaign_count': totals['campaigns']['count'],
+            'character_count': totals['characters']['count'],
+            'setting_count': totals['settings']['count'],
+            'collections': totals,
+            'cache': self.entity_cache.stats(),
+            'write_behind': self.write_behind.stats(),
         }
+        if campaign_id is not None:
+            info['campaign'] = campaign_breakdown(self, campaign_id)
+        info['stats_cache'] = self.stats.stats()
+        return info
 
-def init_db(db: Database, connection_string: Optional[str] = None, db_name: Optional[str] = None):
-    """Initialize the database connection and collections"""
+    async def get_info_async(self, campaign_id: Optional[str] = None):
+        return await asyncio.to_thread(self.get_info, campaign_id)
+
+    async def offload(self, function, *args):
+        """Run a blocking call (e.g. one waiting on a write-behind flush) on a worker thread."""
+        return await asyncio.to_thread(function, *args)
+
+def init_db(db: Database, connection_string: Optional[str] = None, db_name: Optional[str] = None,
+            backend: Optional[str] = None, deferred: bool = False):
+    """
+    Initialize the database connection and collections.
+
+    backend selects the storage engine, e.g. "mongodb" (default) or "sqlite:path".
+
+    With deferred, nothing is imported or connected yet: the first use of a
+    collection connects, and only the unique indexes are built before that use
+    returns, the rest in a background thread. Async callers connect first with
+    connect_async, which does this work off the event loop.
+    """
     if db.initialized:
         return
         
     # Default connection values
     connection_string = connection_string or MONGODB_URI
     db_name = db_name or DB_NAME
-    
-    db.client = MongoClient(connection_string)
-    db.db = db.client[db_name]
-    
-    # Set up campaigns collection
-    db.campaigns_collection = db.db.campaigns
-    db.campaigns_collection.create_index("name")
-    db.campaigns_collection.create_index("description")
-    
-    # Set up characters collection
-    db.characters_collection = db.db.characters
-    db.characters_collection.create_index("name")
-    db.characters_collection.create_index("campaign_id")
-    db.characters_collection.create_index("class")
-    db.characters_collection.create_index("race")
-
-    # Set up settings collection
-    db.settings_collection = db.db.settings
-    db.settings_collection.create_index("name")
-    db.settings_collection.create_index("setting_type")
-    db.settings_collection.create_index("region")
+    backend = backend or DB_BACKEND
 
+    if deferred:
+        db._deferred = (connection_string, db_name, backend)
+        for name in CONNECTED_ATTRIBUTES:
+            db.__dict__.pop(name, None)
+    else:
+        _connect(db, connection_string, db_name, backend, background_indexes=False)
     db.initialized = True
 
+def _connect_deferred(db: Database):
+    with db._connect_lock:
+        if db._deferred is not None:
+            connection_string, db_name, backend = db._deferred
+            _connect(db, connection_string, db_name, backend, background_indexes=True)
+            db._deferred = None
+
+def _connect(db: Database, connection_string: str, db_name: str, backend: str, background_indexes: bool):
+    # Imported here so a deferred database loads no driver until it is used
+    from .backends import create_backend
+
+    db.indexes_ready.clear()
+    db.index_build_error = None
+    # Queries, updates and deletes are timed into the slow-query log
+    db.backend = create_backend(backend, db_name, connection_string, query_log=db.query_log)
+    
+    db.campaigns_collection = db.backend.get_collection("campaigns")
+    db.characters_collection = db.backend.get_collection("characters")
+    db.settings_collection = db.backend.get_collection("settings")
+    db.name_trigrams_collection = db.backend.get_collection(NAME_INDEX_COLLECTION)
+    db.async_campaigns_collection = db.backend.get_async_collection("campaigns")
+    db.async_characters_collection = db.backend.get_async_collection("characters")
+    db.async_settings_collection = db.backend.get_async_collection("settings")
+    db.async_name_trigrams_collection = db.backend.get_async_collection(NAME_INDEX_COLLECTION)
+    db.name_index = TrigramIndex()
+    db.stats.clear()
+
+    # Unique indexes enforce names, so they must exist before the first write
+    _build_indexes(db, unique=True)
+    if background_indexes:
+        threading.Thread(target=_build_indexes, args=(db, False), name="index-build", daemon=True).start()
+    else:
+        _build_indexes(db, unique=False)
+
+    load_name_index(db)
+
+def _build_indexes(db: Database, unique: bool):
+    """
+    Build the unique indexes, after dropping the name indexes they replace, or the others (dropping retired
+    ones) and the text indexes (see database.indexes).
+
+    The second step also backfills setting paths, which the hierarchy queries wait for like text searches.
+    """
+    from .indexes import collection_indexes, ensure_indexes, name_indexes
+    try:
+        for collection in (db.campaigns_collection, db.characters_collection, db.settings_collection,
+                           db.name_trigrams_collection):
+            specs, retired = collection_indexes(collection.name, UNIQUE_NAMES_IGNORE_CASE)
+            if unique:
+                # MongoDB refuses a unique name index on the keys of an older name index, so those go first
+                stale = tuple(name for name in name_indexes(UNIQUE_NAMES_IGNORE_CASE)[1] if name in retired)
+                ensure_indexes(collection, [spec for spec in specs if spec.unique], stale)
+            else:
+                ensure_indexes(collection, [spec for spec in specs if not spec.unique], retired)
+        if unique:
+            return
+        db.backend.create_text_index("campaigns", ["name", "description"], weights={"name": 3})
+        db.backend.create_text_index("characters", ["name", "player_name", "backstory"], weights={"name": 3})
+        db.backend.create_text_index(
+            "settings", ["name", "description", "region", "atmosphere", "first_impression"], weights={"name": 3}
+        )
+        # Settings written before paths were kept get theirs from the parent_id links
+        from .setting_operations import rebuild_setting_paths
+        if db.settings_collection.find_one({"path": {"$exists": False}}, {"id": 1}) is not None:
+            rebuild_setting_paths(db)
+    except Exception as error:
+        if unique:
+            raise
+        db.index_build_error = error
+    finally:
+        if not unique:
+            db.indexes_ready.set()
+
 def close(db: Database):
     """Close the database connection"""
-    if db.client:
-        db.client.close()
+    if db._deferred is not None:
+        # Never used, so never connected
+        db._deferred = None
+        for name in CONNECTED_ATTRIBUTES:
+            setattr(db, name, None)
+        db.initialized = False
+    elif db.backend:
+        # Buffered character changes are written before the connection goes
+        db.write_behind.stop()
+        try:
+            db.write_behind.flush()
+        finally:
+            db.backend.close()
+        db.query_log.close()
         db.initialized = False
 
 def clear_database(db: Database):
@@ -70,6 +273,11 @@ def clear_database(db: Database):
     db.campaigns_collection.delete_many({})
     db.characters_collection.delete_many({})
     db.settings_collection.delete_many({})  # Added settings collection
+    db.name_trigrams_collection.delete_many({})
+    db.write_behind.discard()
+    db.entity_cache.clear()
+    db.stats.clear()
+    db.name_index = TrigramIndex()
     return True
 
 # Helper function to convert between MongoDB ObjectId and integer ID
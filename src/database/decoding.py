@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+# Validate documents read from the database in strict mode (no type coercion), to audit stored data
+STRICT_READS = os.environ.get("STRICT_DB_READS", "").lower() in ("1", "true", "yes")
+
+Model = TypeVar("Model", bound=BaseModel)
+
+def set_strict_reads(enabled: bool) -> None:
+    global STRICT_READS
+    STRICT_READS = enabled
+
+def decode_model(model: Type[Model], document: Dict[str, Any]) -> Model:
+    """
+    Build a model straight from a stored document.
+
+    The document goes to the model's compiled validator as-is (aliases such as
+    "class" are resolved and "_id" is ignored by the model), rather than being
+    copied into an intermediate dict first. With pydantic 2 this is cheaper than
+    model_construct, which rebuilds every nested model in Python.
+    """
+    return model.model_validate(document, strict=STRICT_READS or None)
+
+def with_iso_timestamps(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Older documents store created_at/updated_at as datetimes; the models expect ISO strings."""
+    if not isinstance(document.get("created_at"), datetime) and not isinstance(document.get("updated_at"), datetime):
+        return document
+    document = dict(document)
+    for key in ("created_at", "updated_at"):
+        if isinstance(document.get(key), datetime):
+            document[key] = document[key].isoformat()
+    return document
+
+def validate_update(model: Type[BaseModel], values: Dict[str, Any]) -> None:
+    """
+    Check partial-update values against the types of the model fields they set.
+
+    Invalid values are rejected before they are written rather than when the
+    document is next read. Keys that are not model fields are left to the caller.
+    """
+    adapters = _field_adapters(model)
+    for key, value in values.items():
+        adapter = adapters.get(key)
+        if adapter is not None:
+            adapter.validate_python(value)
+
+@lru_cache(maxsize=None)
+def _field_adapters(model: Type[BaseModel]) -> Dict[str, TypeAdapter]:
+    adapters = {}
+    for name, field in model.model_fields.items():
+        adapters[name] = adapters[field.alias or name] = TypeAdapter(field.annotation)
+    return adapters
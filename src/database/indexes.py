@@ -0,0 +1,190 @@
+"""
+The indexes each collection should have, and a report on how well they fit the queries.
+
+init_db builds the registry with ensure_indexes, which only creates what is
+missing and drops retired indexes, so it is cheap to run on every start.
+index_report compares the indexes that exist with how often each was used
+($indexStats on MongoDB) and with the filter shapes the query log has
+counted, listing indexes nothing uses and query shapes no index serves.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .backends import DuplicateKeyError
+from .backends.base import index_name
+from .name_index import NAME_INDEX_COLLECTION
+
+CASE_INSENSITIVE_COLLATION = {"locale": "en", "strength": 2}
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """An index a collection should have, and the queries it serves."""
+    keys: Tuple[Tuple[str, int], ...]
+    serves: str
+    name: Optional[str] = None
+    unique: bool = False
+    # MongoDB partialFilterExpression; other backends index every document, which is equally correct
+    partial: Optional[Dict[str, Any]] = None
+    collation: Optional[Dict[str, Any]] = None
+
+    @property
+    def index_name(self) -> str:
+        return self.name or index_name(list(self.keys))
+
+    def options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"name": self.index_name, "unique": self.unique}
+        if self.partial is not None:
+            options["partialFilterExpression"] = self.partial
+        if self.collation is not None:
+            options["collation"] = self.collation
+        return options
+
+def _keys(*fields: str) -> Tuple[Tuple[str, int], ...]:
+    return tuple((field, 1) for field in fields)
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "campaigns": [
+        IndexSpec(_keys("id"), "get_campaign"),
+    ],
+    "characters": [
+        IndexSpec(_keys("id"), "get_character, updates and deletes"),
+        # Equality on campaign_id narrows search_characters; the class and race regexes are then
+        # checked against index keys, so non-matching characters are never fetched
+        IndexSpec(_keys("campaign_id", "class", "race"), "search_characters within a campaign"),
+        IndexSpec(_keys("campaign_id", "_id"), "list_campaign_characters, paging and export in _id order"),
+    ],
+    "settings": [
+        IndexSpec(_keys("id"), "get_setting, updates and deletes"),
+        IndexSpec(_keys("setting_type"), "filter_settings_by_type and type-filtered name lookups"),
+        # Top-level settings have no parent, so they are left out of the index
+        IndexSpec(_keys("parent_id", "setting_type"), "filter_settings_by_parent, optionally by type",
+                  partial={"parent_id": {"$gt": ""}}),
+        IndexSpec(_keys("path"), "get_setting_subtree and the setting tree, by a range on the materialized path"),
+    ],
+    NAME_INDEX_COLLECTION: [
+        IndexSpec(_keys("collection"), "rebuilding one collection's name trigrams"),
+        # Multikey on trigrams; shared databases look names up here rather than in process memory
+        IndexSpec(_keys("collection", "trigrams"), "name lookups in a database shared between processes"),
+    ],
+}
+
+# Indexes earlier versions created, dropped on start
+RETIRED_INDEXES: Dict[str, Tuple[str, ...]] = {
+    # Descriptions are only matched by unanchored regexes, which cannot use an index
+    "campaigns": ("description_1",),
+    # Covered by the compound indexes leading with campaign_id; class and race alone are only regex-matched
+    "characters": ("campaign_id_1", "class_1", "race_1"),
+    # region is only regex-matched; parent_id is covered by parent_id_1_setting_type_1
+    "settings": ("region_1", "parent_id_1"),
+}
+
+def name_indexes(ignore_case: bool) -> Tuple[List[IndexSpec], Tuple[str, ...]]:
+    """
+    The indexes enforcing unique names, and those to drop after UNIQUE_NAMES_IGNORE_CASE changes.
+
+    Case-insensitive uniqueness uses a collated index, which plain equality queries cannot
+    use, so the ordinary name index is kept alongside it for lookups.
+    """
+    if ignore_case:
+        return [
+            IndexSpec(_keys("name"), "get by name"),
+            IndexSpec(_keys("name"), "unique names, ignoring case", name="name_unique_ci", unique=True,
+                      collation=CASE_INSENSITIVE_COLLATION),
+        ], ("name_unique",)
+    return [IndexSpec(_keys("name"), "get by name and unique names", name="name_unique", unique=True)], \
+        ("name_1", "name_unique_ci")
+
+def collection_indexes(collection: str, ignore_case: bool) -> Tuple[List[IndexSpec], Tuple[str, ...]]:
+    """The registered indexes of a collection, and the retired ones."""
+    specs, retired = list(INDEXES.get(collection, [])), RETIRED_INDEXES.get(collection, ())
+    if collection != NAME_INDEX_COLLECTION:
+        unique_names, stale = name_indexes(ignore_case)
+        specs, retired = unique_names + specs, stale + retired
+    return specs, retired
+
+def ensure_indexes(collection, specs: List[IndexSpec], retired: Tuple[str, ...] = ()) -> List[str]:
+    """
+    Create the registered indexes a collection lacks and drop retired ones; return the names created.
+
+    Indexes are matched by name, so an existing index is never rebuilt. MongoDB
+    builds them without blocking other operations on the collection.
+    """
+    existing = collection.index_information()
+    for name in retired:
+        if name in existing:
+            collection.drop_index(name)
+    created = []
+    for spec in specs:
+        if spec.index_name in existing:
+            continue
+        try:
+            collection.create_index(list(spec.keys), **spec.options())
+        except DuplicateKeyError as error:
+            raise ValueError(
+                f"Cannot create unique index '{spec.index_name}' on '{collection.name}' because some values "
+                f"are already duplicated; fix them and restart. ({error})"
+            ) from error
+        created.append(spec.index_name)
+    return created
+
+def _serving_fields(fields: Tuple[Tuple[str, str], ...]) -> Tuple[List[str], List[str]]:
+    """The equality and range fields of a filter shape, the only ones an index can seek on."""
+    return [field for field, kind in fields if kind == "eq"], [field for field, kind in fields if kind == "range"]
+
+def _is_served(leading_fields: List[str], equality: List[str], ranges: List[str]) -> bool:
+    if equality:
+        return any(field in equality for field in leading_fields)
+    return any(field in ranges for field in leading_fields)
+
+def _collection_report(db, name: str, ignore_case: bool) -> Dict[str, Any]:
+    collection = db.backend.get_collection(name)
+    specs, _ = collection_indexes(name, ignore_case)
+    registered = {spec.index_name for spec in specs}
+    existing = {index: information for index, information in collection.index_information().items()
+                if not index.endswith("_text")}
+    stats = db.backend.index_stats(name)
+    shapes = db.query_log.shapes(name)
+
+    leading_fields = ["_id"] + [information["key"][0][0] for information in existing.values()]
+    missing, used_fields = [], set()
+    for _, fields, count in shapes:
+        equality, ranges = _serving_fields(fields)
+        used_fields.update(equality + ranges)
+        if (equality or ranges) and not _is_served(leading_fields, equality, ranges):
+            missing.append({
+                "fields": dict(fields),
+                "count": count,
+                "suggested_key": [[field, 1] for field in equality + ranges],
+            })
+
+    # Unique indexes enforce constraints whether or not queries use them
+    candidates = [index for index, information in existing.items()
+                  if index != "_id_" and not information.get("unique")]
+    if stats is not None:
+        unused = [index for index in candidates if not stats.get(index)]
+    else:
+        unused = [index for index in candidates if existing[index]["key"][0][0] not in used_fields]
+    return {
+        "indexes": [
+            {"name": index, "key": [list(key) for key in information["key"]], "registered": index in registered,
+             "ops": stats.get(index) if stats is not None else None}
+            for index, information in sorted(existing.items())
+        ],
+        "not_built": sorted(registered - set(existing)),
+        "unused": sorted(unused),
+        "missing": missing,
+        "usage_basis": "index_stats" if stats is not None else "query_shapes",
+        "observed_queries": sum(count for _, _, count in shapes),
+    }
+
+def index_report(db, ignore_case: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Report, per collection, the indexes nothing has used and the filter shapes no index serves.
+
+    Usage comes from the backend's index statistics where it keeps them, and
+    otherwise from whether an observed filter constrains the index's leading
+    field. A shape is served when an index leads with one of its equality
+    fields (or, with none, one of its range fields); regex and $or conditions
+    cannot seek an index, so shapes with only those are never reported missing.
+    """
+    return {name: _collection_report(db, name, ignore_case) for name in INDEXES}
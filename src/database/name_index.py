@@ -0,0 +1,230 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+NAME_INDEX_COLLECTION = "name_trigrams"
+INDEXED_COLLECTIONS = ("campaigns", "characters", "settings")
+
+def trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def name_terms(document: Dict) -> List[str]:
+    """The name of an entity plus any aliases kept in its data (or top-level aliases)."""
+    aliases = document.get("aliases") or (document.get("data") or {}).get("aliases") or []
+    return [term for term in [document.get("name"), *aliases] if isinstance(term, str) and term]
+
+class TrigramIndex:
+    """
+    In-memory trigram inverted index over entity names and aliases.
+
+    A case-insensitive substring query intersects the posting sets of its
+    trigrams, then confirms each candidate against the stored terms, so no
+    false positives are returned.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._terms: Dict[str, Dict[str, List[str]]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def add(self, collection: str, entity_id: str, terms: Iterable[str]) -> bool:
+        """Index an entity's terms, returning False when they were already indexed unchanged."""
+        terms = [term.lower() for term in terms]
+        with self._lock:
+            if self._terms[collection].get(entity_id) == terms:
+                return False
+            self._discard(collection, entity_id)
+            self._terms[collection][entity_id] = terms
+            postings = self._postings[collection]
+            for gram in set().union(*(trigrams(term) for term in terms)):
+                postings[gram].add(entity_id)
+            return True
+
+    def remove(self, collection: str, entity_id: str) -> None:
+        with self._lock:
+            self._discard(collection, entity_id)
+
+    def clear(self, collection: str) -> None:
+        with self._lock:
+            self._postings.pop(collection, None)
+            self._terms.pop(collection, None)
+
+    def search(self, collection: str, fragment: str) -> List[str]:
+        """Return the ids whose name or alias contains fragment, best matches first."""
+        fragment = fragment.lower()
+        with self._lock:
+            terms = self._terms[collection]
+            matches = [
+                entity_id for entity_id in self._candidates(collection, fragment)
+                if any(fragment in term for term in terms[entity_id])
+            ]
+            return sorted(matches, key=lambda entity_id: self._rank(terms[entity_id], fragment))
+
+    def _candidates(self, collection: str, fragment: str) -> Iterable[str]:
+        grams = trigrams(fragment)
+        if not grams:
+            # Too short to have a trigram; fall back to checking every indexed term
+            return list(self._terms[collection])
+        postings = self._postings[collection]
+        sets = sorted((postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(sets[0])
+        for posting in sets[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return candidates
+
+    @staticmethod
+    def _rank(terms: List[str], fragment: str) -> tuple:
+        best = min(terms, key=lambda term: (not term.startswith(fragment), len(term)))
+        return (not best.startswith(fragment), len(best), best)
+
+    def _discard(self, collection: str, entity_id: str) -> None:
+        terms = self._terms[collection].pop(entity_id, None)
+        if not terms:
+            return
+        postings = self._postings[collection]
+        for gram in set().union(*(trigrams(term) for term in terms)):
+            posting = postings.get(gram)
+            if posting is not None:
+                posting.discard(entity_id)
+                if not posting:
+                    del postings[gram]
+
+def _index_key(collection: str, entity_id: str) -> str:
+    return f"{collection}:{entity_id}"
+
+def _index_document(collection: str, entity_id: str, terms: List[str]) -> Dict:
+    return {
+        "collection": collection,
+        "entity_id": entity_id,
+        "terms": terms,
+        "trigrams": sorted(set().union(*(trigrams(term) for term in terms))),
+    }
+
+def index_names(db, collection: str, document: Dict) -> None:
+    """
+    Index an entity's name and aliases in memory and persist them when they changed.
+
+    A shared database always persists them, since another process may have changed them.
+    """
+    terms = name_terms(document)
+    if db.name_index.add(collection, document["id"], terms) or db.shared:
+        db.name_trigrams_collection.update_one(
+            {"_id": _index_key(collection, document["id"])},
+            {"$set": _index_document(collection, document["id"], terms)},
+            upsert=True
+        )
+
+async def index_names_async(db, collection: str, document: Dict) -> None:
+    terms = name_terms(document)
+    if db.name_index.add(collection, document["id"], terms) or db.shared:
+        await db.async_name_trigrams_collection.update_one(
+            {"_id": _index_key(collection, document["id"])},
+            {"$set": _index_document(collection, document["id"], terms)},
+            upsert=True
+        )
+
+def index_names_many(db, collection: str, documents: Iterable[Dict]) -> None:
+    """Index many newly inserted entities, persisting their index entries in one round trip."""
+    entries = []
+    for document in documents:
+        terms = name_terms(document)
+        if db.name_index.add(collection, document["id"], terms) or db.shared:
+            entries.append({"_id": _index_key(collection, document["id"]), **_index_document(collection, document["id"], terms)})
+    if entries:
+        from pymongo.errors import BulkWriteError
+        try:
+            db.name_trigrams_collection.insert_many(entries, ordered=False)
+        except BulkWriteError:
+            # Entries left over from an earlier write already hold these terms
+            pass
+
+def unindex_names(db, collection: str, entity_id: str) -> None:
+    db.name_index.remove(collection, entity_id)
+    db.name_trigrams_collection.delete_one({"_id": _index_key(collection, entity_id)})
+
+async def unindex_names_async(db, collection: str, entity_id: str) -> None:
+    db.name_index.remove(collection, entity_id)
+    await db.async_name_trigrams_collection.delete_one({"_id": _index_key(collection, entity_id)})
+
+def clear_names(db, collection: str) -> None:
+    db.name_index.clear(collection)
+    db.name_trigrams_collection.delete_many({"collection": collection})
+
+async def clear_names_async(db, collection: str) -> None:
+    db.name_index.clear(collection)
+    await db.async_name_trigrams_collection.delete_many({"collection": collection})
+
+def rebuild_name_index(db) -> None:
+    """Re-index every entity's names from the entity collections."""
+    for collection in INDEXED_COLLECTIONS:
+        clear_names(db, collection)
+        for document in db.backend.get_collection(collection).find({}, {"id": 1, "name": 1, "aliases": 1, "data.aliases": 1}):
+            index_names(db, collection, document)
+
+def load_name_index(db) -> None:
+    """Mirror the persisted name index in memory, building it first if it was never persisted."""
+    documents = db.name_trigrams_collection.find({}, {"collection": 1, "entity_id": 1, "terms": 1})
+    loaded = False
+    for document in documents:
+        db.name_index.add(document["collection"], document["entity_id"], document["terms"])
+        loaded = True
+    if not loaded and any(db.backend.get_collection(name).find_one({}) for name in INDEXED_COLLECTIONS):
+        rebuild_name_index(db)
+
+LOOKUP_BATCH_SIZE = 500
+
+def _collect_in_order(found: List[Dict], documents: Iterable[Dict], ids: List[str]) -> None:
+    by_id = {document["id"]: document for document in documents}
+    found.extend(by_id[entity_id] for entity_id in ids if entity_id in by_id)
+
+_PERSISTED_FIELDS = {"entity_id": 1, "terms": 1}
+
+def _persisted_filter(collection: str, fragment: str) -> Dict:
+    """Select the persisted entries holding every trigram of fragment, served by the (collection, trigrams) index."""
+    grams = trigrams(fragment)
+    return {"collection": collection, **({"trigrams": {"$all": sorted(grams)}} if grams else {})}
+
+def _confirmed(documents: Iterable[Dict], fragment: str) -> List[str]:
+    fragment = fragment.lower()
+    matches = [(document["entity_id"], [term.lower() for term in document["terms"]]) for document in documents]
+    matches = [(entity_id, terms) for entity_id, terms in matches if any(fragment in term for term in terms)]
+    return [entity_id for entity_id, _ in sorted(matches, key=lambda match: TrigramIndex._rank(match[1], fragment))]
+
+def _search_names(db, collection: str, fragment: str) -> List[str]:
+    if not db.shared:
+        return db.name_index.search(collection, fragment)
+    # Other processes change the names too, so the persisted index is queried for each lookup
+    return _confirmed(db.name_trigrams_collection.find(_persisted_filter(collection, fragment), _PERSISTED_FIELDS),
+                      fragment)
+
+async def _search_names_async(db, collection: str, fragment: str) -> List[str]:
+    if not db.shared:
+        return db.name_index.search(collection, fragment)
+    cursor = db.async_name_trigrams_collection.find(_persisted_filter(collection, fragment), _PERSISTED_FIELDS)
+    return _confirmed(await cursor.to_list(length=None), fragment)
+
+def lookup_by_name(db, collection: str, fragment: str, filter: Dict = None, limit: int = 10) -> List[Dict]:
+    """Fetch up to limit documents whose name or alias contains fragment, best matches first."""
+    ids = _search_names(db, collection, fragment)
+    found: List[Dict] = []
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        documents = db.backend.get_collection(collection).find({**(filter or {}), "id": {"$in": batch}})
+        _collect_in_order(found, documents, batch)
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+async def lookup_by_name_async(db, collection: str, fragment: str, filter: Dict = None, limit: int = 10) -> List[Dict]:
+    ids = await _search_names_async(db, collection, fragment)
+    found: List[Dict] = []
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        cursor = db.backend.get_async_collection(collection).find({**(filter or {}), "id": {"$in": batch}})
+        _collect_in_order(found, await cursor.to_list(length=None), batch)
+        if len(found) >= limit:
+            break
+    return found[:limit]
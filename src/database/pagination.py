@@ -0,0 +1,59 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Records a bulk import validates and inserts together (here so the server can show it without loading the importer)
+DEFAULT_BATCH_SIZE = 500
+
+def encode_cursor(document_id: Any) -> str:
+    return base64.urlsafe_b64encode(str(document_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Any:
+    from bson.objectid import ObjectId
+    try:
+        value = base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        value = ""
+    if not value:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+def _page_size(limit: int) -> int:
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"Page limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def _after_cursor(filter: Dict, cursor: Optional[str]) -> Dict:
+    if not cursor:
+        return filter
+    after = {"_id": {"$gt": decode_cursor(cursor)}}
+    return {"$and": [filter, after]} if filter else after
+
+def _split_page(documents: List[Dict], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1]["_id"])
+
+def fetch_page(collection, filter: Dict, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+               projection: Optional[Dict] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one page of documents in _id order, resuming after cursor.
+
+    One extra document is read to decide whether there is a next page, so no
+    count is needed.
+    """
+    limit = _page_size(limit)
+    documents = list(collection.find(_after_cursor(filter, cursor), projection, sort=[("_id", 1)], limit=limit + 1))
+    return _split_page(documents, limit)
+
+async def fetch_page_async(collection, filter: Dict, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                           projection: Optional[Dict] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Asyncio counterpart of fetch_page for Motor-style collections."""
+    limit = _page_size(limit)
+    documents = await collection.find(
+        _after_cursor(filter, cursor), projection, sort=[("_id", 1)], limit=limit + 1
+    ).to_list(length=None)
+    return _split_page(documents, limit)
@@ -0,0 +1,133 @@
+"""
+Partial updates of nested fields, compiled into one MongoDB update document.
+
+A patch is a list of operations on dotted paths (data.hp, spells.level_1,
+equipment). compile_patch turns it into $inc, $set, $push and $pull
+clauses, so a patch is applied in a single atomic find_one_and_update and
+counters change in the database, without reading the document first.
+
+Paths are checked against the model before anything is written: the first
+part must be a model field, and further parts must go into a nested model
+or a dict. Values are validated against the type of the field they change,
+the items of a list field for push and pull. MongoDB rejects an update in
+which one changed path contains another, so a patch may not hold both.
+"""
+import numbers
+import typing
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+from models.patch import PatchOperation
+
+_OPERATORS = {"inc": "$inc", "set": "$set", "push": "$push", "pull": "$pull"}
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if typing.get_origin(annotation) is typing.Union:
+        arguments = [argument for argument in typing.get_args(annotation) if argument is not type(None)]
+        if len(arguments) == 1:
+            return arguments[0]
+    return annotation
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+def _field_type(model: Type[BaseModel], path: str, aliases: Dict[str, str]) -> Tuple[str, Any]:
+    """The stored path and the type of the value at path, Any inside a dict."""
+    stored_names = {stored: name for name, stored in aliases.items()}
+    root, *rest = path.split(".")
+    name = stored_names.get(root, root)
+    if name not in model.model_fields or not root:
+        raise ValueError(f"Unknown field '{root}'. Valid fields: {', '.join(model.model_fields)}")
+    annotation = model.model_fields[name].annotation
+    for depth, part in enumerate(rest):
+        annotation = _unwrap_optional(annotation)
+        if _is_model(annotation) and part in annotation.model_fields:
+            annotation = annotation.model_fields[part].annotation
+        elif annotation in (dict, Dict) or typing.get_origin(annotation) is dict:
+            arguments = typing.get_args(annotation)
+            annotation = arguments[1] if arguments else Any
+        elif annotation is Any:
+            continue
+        else:
+            reached = ".".join([root, *rest[:depth]])
+            raise ValueError(f"Cannot patch '{path}': '{reached}' has no field '{part}'")
+    return ".".join([aliases.get(name, name), *rest]), annotation
+
+def _list_item_type(path: str, annotation: Any) -> Any:
+    annotation = _unwrap_optional(annotation)
+    if annotation is Any:
+        return Any
+    if typing.get_origin(annotation) is list:
+        arguments = typing.get_args(annotation)
+        return arguments[0] if arguments else Any
+    raise ValueError(f"Cannot push to or pull from '{path}': it is not a list")
+
+def _check_value(operation: PatchOperation, path: str, annotation: Any) -> None:
+    if operation.op == "inc":
+        if not isinstance(operation.value, numbers.Number) or isinstance(operation.value, bool):
+            raise ValueError(f"inc needs a number for '{path}', not {operation.value!r}")
+        target = _unwrap_optional(annotation)
+        if target is not Any and target not in (int, float):
+            raise ValueError(f"Cannot inc '{path}': it is not a number")
+        if target is int and not isinstance(operation.value, int):
+            raise ValueError(f"inc needs a whole number for '{path}', not {operation.value!r}")
+        return
+    if operation.op in ("push", "pull"):
+        annotation = _list_item_type(path, annotation)
+    TypeAdapter(annotation).validate_python(operation.value)
+
+def _overlaps(path: str, other: str) -> bool:
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+def overlapping(paths: Iterable[str], others: Iterable[str]) -> bool:
+    """Whether a path of one set is, contains or is contained in a path of the other."""
+    others = list(others)
+    return any(_overlaps(path, other) for path in paths for other in others)
+
+def compile_patch(model: Type[BaseModel], operations: List[PatchOperation], aliases: Optional[Dict[str, str]] = None,
+                  protected: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    Translate patch operations into an update document ({"$inc": {...}, "$set": {...}, ...}).
+
+    aliases maps model field names to their stored names (e.g. character_class -> class);
+    fields in protected (stored names) cannot be patched.
+    """
+    if not operations:
+        raise ValueError("A patch needs at least one operation")
+    aliases = aliases or {}
+    protected = set(protected)
+    update: Dict[str, Dict[str, Any]] = {}
+    paths: List[str] = []
+    for operation in operations:
+        path, annotation = _field_type(model, operation.path, aliases)
+        if path.split(".")[0] in protected:
+            raise ValueError(f"Field '{operation.path.split('.')[0]}' cannot be patched")
+        if overlapping([path], paths):
+            raise ValueError(f"Patch paths overlap at '{operation.path}'; change each field once")
+        _check_value(operation, operation.path, annotation)
+        update.setdefault(_OPERATORS[operation.op], {})[path] = operation.value
+        paths.append(path)
+    return update
+
+def patched_paths(update: Dict[str, Dict[str, Any]]) -> List[str]:
+    return [path for fields in update.values() for path in fields]
+
+def empty_containers(update: Dict[str, Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """
+    The (path, empty value) pairs that let the update apply to a document holding nulls.
+
+    MongoDB will not set a field inside a null, push to a null or inc a null, and
+    stored models keep unset fields as nulls. Parents come before their children.
+    """
+    containers: Dict[str, Any] = {}
+    for operator, fields in update.items():
+        for path in fields:
+            parts = path.split(".")
+            for depth in range(1, len(parts)):
+                containers.setdefault(".".join(parts[:depth]), {})
+            if operator in ("$push", "$pull"):
+                containers[path] = []
+            elif operator == "$inc":
+                containers[path] = 0
+    return sorted(containers.items(), key=lambda item: item[0].count("."))
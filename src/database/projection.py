@@ -0,0 +1,37 @@
+from typing import Dict, Iterable, List, Optional, Type
+from pydantic import BaseModel
+
+def _validate_fields(model: Type[BaseModel], fields: Iterable[str]) -> List[str]:
+    fields = list(fields)
+    unknown = [field for field in fields if field not in model.model_fields]
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s) {', '.join(unknown)}. Valid fields: {', '.join(model.model_fields)}"
+        )
+    return fields
+
+def build_projection(model: Type[BaseModel], fields: Optional[Iterable[str]],
+                     aliases: Optional[Dict[str, str]] = None) -> Optional[Dict[str, int]]:
+    """
+    Translate model field names into a database projection that always includes id.
+
+    aliases maps model field names to their stored names (e.g. character_class -> class).
+    """
+    if not fields:
+        return None
+    aliases = aliases or {}
+    projection = {aliases.get(field, field): 1 for field in _validate_fields(model, fields)}
+    projection["id"] = 1
+    return projection
+
+def project_result(document: Dict, fields: Iterable[str], aliases: Optional[Dict[str, str]] = None) -> Dict:
+    """Build a trimmed result holding id and the requested model fields of a stored document."""
+    aliases = aliases or {}
+    result = {"id": document["id"]}
+    for field in fields:
+        result[field] = document.get(aliases.get(field, field))
+    return result
+
+def project_model(item: BaseModel, fields: Iterable[str], aliases: Optional[Dict[str, str]] = None) -> Dict:
+    """Build the same trimmed result from a model already in memory, e.g. a cached one."""
+    return project_result(item.model_dump(by_alias=True), fields, aliases)
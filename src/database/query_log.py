@@ -0,0 +1,208 @@
+"""
+A log of database commands slower than a threshold.
+
+Backends report each timed command with observe(). Commands at or above the
+threshold are kept in a bounded in-memory ring for the slow-query tool and
+appended, one JSON object per line, to a rotating log file if one is
+configured. Writing the file is best effort: a file that cannot be opened or
+written turns file output off rather than failing the command. With explain
+enabled, each slow command's plan is fetched on a worker thread (so the
+caller never waits for it) and recorded with the number of documents examined.
+
+Every command, slow or not, is also counted by the fields its filter uses,
+which the index report compares with the indexes that exist.
+"""
+import json
+import logging
+import os
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# Distinct filter shapes counted per log; rarer shapes beyond this are not counted
+MAX_SHAPES = 1000
+
+# How a filter constrains a field, from most to least useful to an index
+FIELD_KINDS = ("eq", "range", "regex", "other")
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+def query_shape(value: Any) -> Any:
+    """
+    Replace every literal in a filter (or pipeline) with "?", keeping fields and operators.
+
+    Queries differing only in their values share a shape, e.g.
+    {"campaign_id": "?", "level": {"$gte": "?"}}.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+def _merge_field(fields: Dict[str, str], field: str, kind: str) -> None:
+    if field not in fields or FIELD_KINDS.index(kind) < FIELD_KINDS.index(fields[field]):
+        fields[field] = kind
+
+def _condition_kind(condition: Any) -> str:
+    if not isinstance(condition, dict) or not any(str(operator).startswith("$") for operator in condition):
+        return "eq"
+    if "$eq" in condition or "$in" in condition or "$all" in condition:
+        return "eq"
+    if _RANGE_OPERATORS.intersection(condition):
+        return "range"
+    if "$regex" in condition:
+        return "regex"
+    return "other"
+
+def filter_fields(filter: Optional[Dict]) -> Tuple[Tuple[str, str], ...]:
+    """
+    The fields a filter constrains and how, e.g. (("campaign_id", "eq"), ("class", "regex")).
+
+    Conditions under $and constrain the whole query; those under $or only
+    constrain a branch, so they count as "other". $text is left out.
+    """
+    fields: Dict[str, str] = {}
+    for key, condition in (filter or {}).items():
+        if key == "$and":
+            for sub_filter in condition:
+                for field, kind in filter_fields(sub_filter):
+                    _merge_field(fields, field, kind)
+        elif key in ("$or", "$nor"):
+            for sub_filter in condition:
+                for field, _ in filter_fields(sub_filter):
+                    _merge_field(fields, field, "other")
+        elif not key.startswith("$"):
+            _merge_field(fields, key, _condition_kind(condition))
+    return tuple(sorted(fields.items()))
+
+class SlowQueryLog:
+    """
+    Records commands that took at least threshold_ms milliseconds.
+
+    A threshold of None turns the log off. path is the log file (rotated at
+    LOG_MAX_BYTES, keeping LOG_BACKUPS old files), made absolute when the log is
+    created; None keeps entries in memory only.
+    """
+
+    def __init__(self, threshold_ms: Optional[float] = 100.0, explain: bool = False,
+                 path: Optional[str] = None, max_entries: int = 200):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.path = os.path.abspath(path) if path else None
+        # Why file output was turned off, if it was
+        self.write_error: Optional[str] = None
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self._shapes: Counter = Counter()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._logger: Optional[logging.Logger] = None
+
+    def observe(self, collection: str, operation: str, filter: Any, seconds: float,
+                explain: Optional[Callable[[], Dict[str, Any]]] = None) -> None:
+        """
+        Count a command's filter shape, and record the command if it was slow.
+
+        explain, when given, returns {"plan": ..., "docs_examined": ...} for the command.
+        """
+        if self.threshold_ms is None:
+            return
+        shape = (collection, filter_fields(filter) if isinstance(filter, dict) else ())
+        with self._lock:
+            if shape in self._shapes or len(self._shapes) < MAX_SHAPES:
+                self._shapes[shape] += 1
+        if seconds * 1000 < self.threshold_ms:
+            return
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "collection": collection,
+            "operation": operation,
+            "filter_shape": query_shape(filter or {}),
+            "duration_ms": round(seconds * 1000, 3),
+            "docs_examined": None,
+            "plan": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            if self.explain and explain is not None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+                self._executor.submit(self._explain, entry, explain)
+                return
+        self._write(entry)
+
+    def _explain(self, entry: Dict[str, Any], explain: Callable[[], Dict[str, Any]]) -> None:
+        try:
+            entry.update(explain())
+        except Exception as error:
+            entry["explain_error"] = str(error)
+        self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if self._logger is None:
+                try:
+                    handler = RotatingFileHandler(self.path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+                except OSError as error:
+                    self._disable_file(error)
+                    return
+                # A logger outside the logging hierarchy, so the entries never reach the root handlers
+                logger = logging.Logger("dm.slow_queries")
+                logger.addHandler(handler)
+                self._logger = logger
+            logger = self._logger
+        try:
+            logger.warning(json.dumps(entry, default=str))
+        except OSError as error:
+            with self._lock:
+                self._disable_file(error)
+
+    def _disable_file(self, error: OSError) -> None:
+        """Stop writing the log file, keeping entries in memory; called holding the lock."""
+        logging.getLogger(__name__).warning("Slow-query log file %s turned off: %s", self.path, error)
+        self.write_error = str(error)
+        self.path = None
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
+            self._logger = None
+
+    def entries(self, limit: int = 20, collection: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The most recent slow commands, newest first."""
+        with self._lock:
+            entries = [entry for entry in reversed(self._entries)
+                       if collection is None or entry["collection"] == collection]
+        return [dict(entry) for entry in entries[:limit]]
+
+    def shapes(self, collection: Optional[str] = None) -> List[Tuple[str, Tuple[Tuple[str, str], ...], int]]:
+        """(collection, filter fields, count) for each observed filter shape, most frequent first."""
+        with self._lock:
+            counts = self._shapes.most_common()
+        return [(name, fields, count) for (name, fields), count in counts
+                if collection is None or name == collection]
+
+    def drain(self) -> None:
+        """Wait for pending explains to finish."""
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._shapes.clear()
+
+    def close(self) -> None:
+        self.drain()
+        with self._lock:
+            if self._logger is not None:
+                for handler in self._logger.handlers:
+                    handler.close()
+                self._logger = None
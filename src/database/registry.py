@@ -0,0 +1,168 @@
+"""
+Named databases served by one process, one per game table (tenant).
+
+The default database is the one the server was started with. A tool called
+with a tenant uses that tenant's database instead, which is created on first
+use on the same backend and connects like a deferred database. On MongoDB
+every tenant's backend shares one pooled client (see backends.mongo), so more
+tables add no connections. Tenant databases are named <default>_<tenant> and
+share the default database's slow-query log.
+
+The tenant of the current call is held in a context variable, which
+select_tenant sets for a tool handler and TenantDatabase reads, so handlers
+written against one database serve all of them. select_tenant and connected
+also connect a deferred database on a worker thread before the handler runs,
+so a new tenant's first call does not stall the event loop for other clients.
+"""
+import functools
+import inspect
+import os
+import re
+import threading
+from contextvars import ContextVar
+from typing import Annotated, Dict, List, Optional, Set
+
+from pydantic import Field
+
+from .db_operations import DB_BACKEND, DB_NAME, MONGODB_URI, Database, close, init_db
+
+# Most tenant databases one process opens; 0 removes the limit
+MAX_TENANTS = int(os.environ.get("MAX_TENANTS", "100"))
+
+# Letters, digits, "_" and "-", so the name is valid in a database name and a file name
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,48}$")
+
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+TenantArgument = Annotated[Optional[str], Field(
+    description="The game table whose database to use; the server's default database when omitted"
+)]
+
+def _tenant_backend(backend: str, tenant: str) -> str:
+    """The backend spec for a tenant, giving a SQLite file of its own next to the default one."""
+    kind, _, location = backend.partition(":")
+    if kind != "sqlite" or not location or location == ":memory:":
+        return backend
+    root, extension = os.path.splitext(location)
+    return f"sqlite:{root}_{tenant}{extension}"
+
+class DatabaseRegistry:
+    """The default database and the tenant databases opened so far, by name."""
+
+    def __init__(self, default: Database):
+        self.default = default
+        self.db_name = DB_NAME
+        self.connection_string = MONGODB_URI
+        self.backend = DB_BACKEND
+        # Tenants allowed to connect; None allows any valid name, up to MAX_TENANTS
+        self.allowed: Optional[Set[str]] = None
+        # Whether other server processes serve the same databases (see Database.share_between_processes)
+        self.shared = False
+        self._tenants: Dict[str, Database] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, db_name: str, connection_string: Optional[str] = None, backend: Optional[str] = None,
+                  allowed: Optional[List[str]] = None) -> None:
+        """Set what tenant databases are created from: the default database's name and backend."""
+        self.db_name = db_name
+        self.connection_string = connection_string or MONGODB_URI
+        self.backend = backend or DB_BACKEND
+        self.allowed = set(allowed) if allowed is not None else None
+
+    def get(self, tenant: Optional[str] = None) -> Database:
+        """The database of tenant (the default database for None), created on first use."""
+        if tenant is None:
+            return self.default
+        database = self._tenants.get(tenant)
+        if database is not None:
+            return database
+        if not _TENANT_NAME.match(tenant):
+            raise ValueError(f"Invalid tenant '{tenant}': use up to 48 letters, digits, '_' or '-'")
+        if self.allowed is not None and tenant not in self.allowed:
+            raise ValueError(f"Tenant '{tenant}' is not served here")
+        with self._lock:
+            database = self._tenants.get(tenant)
+            if database is None:
+                if MAX_TENANTS and len(self._tenants) >= MAX_TENANTS:
+                    raise ValueError(f"Cannot open more than {MAX_TENANTS} tenant databases")
+                database = Database(query_log=self.default.query_log)
+                if self.shared:
+                    database.share_between_processes()
+                init_db(database, self.connection_string, f"{self.db_name}_{tenant}",
+                        _tenant_backend(self.backend, tenant), deferred=True)
+                self._tenants[tenant] = database
+        return database
+
+    async def connect(self, tenant: Optional[str] = None) -> Database:
+        """The database of tenant, connected off the event loop if it was deferred."""
+        database = self.get(tenant)
+        await database.connect_async()
+        return database
+
+    def select_tenant(self, fn):
+        """Give an async tool handler a `tenant` argument selecting the database its call uses."""
+        signature = inspect.signature(fn)
+        parameter = inspect.Parameter("tenant", inspect.Parameter.KEYWORD_ONLY, default=None,
+                                      annotation=TenantArgument)
+
+        @functools.wraps(fn)
+        async def handler(*args, tenant: Optional[str] = None, **kwargs):
+            token = current_tenant.set(tenant)
+            try:
+                await self.connect(tenant)
+                return await fn(*args, **kwargs)
+            finally:
+                current_tenant.reset(token)
+
+        handler.__signature__ = signature.replace(parameters=[*signature.parameters.values(), parameter])
+        return handler
+
+    def connected(self, fn):
+        """Connect the current call's database off the event loop before an async handler runs."""
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            await self.connect(current_tenant.get())
+            return await fn(*args, **kwargs)
+
+        return handler
+
+    def share_between_processes(self) -> None:
+        """Make the default database and every tenant database safe to serve from several processes."""
+        self.shared = True
+        for database in [self.default, *list(self._tenants.values())]:
+            database.share_between_processes()
+
+    def tenants(self) -> List[str]:
+        """The tenants whose databases have been opened, in name order."""
+        return sorted(self._tenants)
+
+    def close_tenant(self, tenant: str) -> bool:
+        """Close a tenant's database; it is opened again on its next use."""
+        with self._lock:
+            database = self._tenants.pop(tenant, None)
+        if database is None:
+            return False
+        close(database)
+        return True
+
+    def flush_all(self) -> None:
+        """Write the buffered character changes of every database (see database.write_behind)."""
+        for database in [self.default, *list(self._tenants.values())]:
+            if database.write_behind.has_pending():
+                database.write_behind.flush()
+
+    def close_all(self) -> None:
+        for tenant in self.tenants():
+            self.close_tenant(tenant)
+
+class TenantDatabase:
+    """Stands in for the database of the current call's tenant, forwarding every attribute to it."""
+
+    def __init__(self, registry: DatabaseRegistry):
+        object.__setattr__(self, "registry", registry)
+
+    def __getattr__(self, name: str):
+        return getattr(self.registry.get(current_tenant.get()), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.registry.get(current_tenant.get()), name, value)
@@ -1,24 +1,69 @@
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
-from models.setting import Setting
+from typing import List, Optional, Dict, Any, Union
+from models.setting import Setting, SettingTree
+from models.page import Page
+from models.search import SearchHit
 from bson.objectid import ObjectId
+from .blocking import run_blocking
 from .db_operations import objectid_to_str, Database
+from .decoding import decode_model, with_iso_timestamps
+from .pagination import DEFAULT_PAGE_SIZE
+from .projection import project_result
+
+# Settings keep a materialized path of ancestor IDs (see _setting_path), so a whole subtree is one
+# indexed range query and the ancestors one $in query, however deep the hierarchy
+PATH_SEPARATOR = "/"
+
+# Each operation is implemented once, in async_setting_operations; these run it for blocking callers
 
 def create_setting(db: Database, **setting_data: Dict[str, Any]) -> Setting:
-    # Check if a setting with this name already exists
-    existing_setting = db.settings_collection.find_one({"name": setting_data["name"]})
-    if existing_setting:
-        raise ValueError(f"A setting with the name '{setting_data['name']}' already exists")
-    
+    return run_blocking(_async.create_setting, db, **setting_data)
+
+def update_setting(db: Database, setting_id: str, **update_data: Dict[str, Any]) -> Setting:
+    return run_blocking(_async.update_setting, db, setting_id, **update_data)
+
+def delete_setting(db: Database, setting_id: str) -> bool:
+    return run_blocking(_async.delete_setting, db, setting_id)
+
+def search_settings(db: Database, query: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    return run_blocking(_async.search_settings, db, query, fields)
+
+def lookup_settings_by_name(db: Database, fragment: str, setting_type: Optional[str] = None,
+                            limit: int = 10) -> List[Setting]:
+    return run_blocking(_async.lookup_settings_by_name, db, fragment, setting_type, limit)
+
+def text_search_settings(db: Database, query: str, setting_type: Optional[str] = None,
+                         limit: int = 10) -> List[SearchHit]:
+    return run_blocking(_async.text_search_settings, db, query, setting_type, limit)
+
+def filter_settings_by_type(db: Database, setting_type: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    return run_blocking(_async.filter_settings_by_type, db, setting_type, fields)
+
+def get_setting(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> Union[Setting, Dict]:
+    return run_blocking(_async.get_setting, db, setting_id, fields)
+
+def get_setting_by_name(db: Database, name: str, fields: Optional[List[str]] = None) -> Optional[Union[Setting, Dict]]:
+    return run_blocking(_async.get_setting_by_name, db, name, fields)
+
+def list_settings(db: Database) -> List[Setting]:
+    return run_blocking(_async.list_settings, db)
+
+def list_settings_page(db: Database, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                       fields: Optional[List[str]] = None, include_total: bool = False) -> Page:
+    return run_blocking(_async.list_settings_page, db, limit, cursor, fields, include_total)
+
+def delete_all_settings(db: Database) -> int:
+    return run_blocking(_async.delete_all_settings, db)
+
+def _build_setting_document(setting_data: Dict[str, Any]) -> Dict:
     now = datetime.now(timezone.utc)
     # Create a new ObjectId first
     oid = ObjectId()
-    str_id = objectid_to_str(oid)
     
     # Prepare the document for MongoDB
     setting_doc = {
         "_id": oid,
-        "id": str_id,
+        "id": objectid_to_str(oid),
         "created_at": now.isoformat(),
         "updated_at": now.isoformat()
     }
@@ -26,117 +71,42 @@ def create_setting(db: Database, **setting_data: Dict[str, Any]) -> Setting:
     # Add all fields from setting_data
     for key, value in setting_data.items():
         setting_doc[key] = value
-    
-    db.settings_collection.insert_one(setting_doc)
-    
-    # For the Pydantic model
-    setting_dict = {
-        "id": str_id,
-        "created_at": now.isoformat(),
-        "updated_at": now.isoformat(),
-        **setting_data  # Include all provided setting data
-    }
-    return Setting(**setting_dict)
-
-def update_setting(db: Database, setting_id: str, **update_data: Dict[str, Any]) -> Setting:
-    # Find by string ID
-    setting = db.settings_collection.find_one({"id": setting_id})
-    if not setting:
-        raise ValueError(f"Setting with ID {setting_id} does not exist.")
-    
-    now = datetime.now(timezone.utc)
-    update_data["updated_at"] = now.isoformat()
-    
-    db.settings_collection.update_one(
-        {"id": setting_id},
-        {"$set": update_data}
-    )
-    
-    # Get the updated document
-    updated_setting = db.settings_collection.find_one({"id": setting_id})
-    if not updated_setting:
-        raise ValueError(f"Failed to retrieve updated setting with ID {setting_id}")
-    
-    # Convert to Pydantic model
-    setting_dict = {
-        "id": setting_id,
-        "created_at": updated_setting["created_at"],
-        "updated_at": now.isoformat(),
-        **{k: v for k, v in updated_setting.items() if k not in ["_id", "id", "created_at", "updated_at"]}
-    }
-    return Setting(**setting_dict)
-
-def delete_setting(db: Database, setting_id: str) -> bool:
-    result = db.settings_collection.delete_one({"id": setting_id})
-    return result.deleted_count > 0
+    return setting_doc
 
-def search_settings(db: Database, query: str) -> List[Setting]:
-    results = db.settings_collection.find({
+def _setting_search_filter(query: str) -> Dict:
+    return {
         "$or": [
             {"name": {"$regex": query, "$options": "i"}},
             {"region": {"$regex": query, "$options": "i"}},
             {"description": {"$regex": query, "$options": "i"}}
         ]
-    })
-    return [_convert_to_setting(setting) for setting in results]
-
-def filter_settings_by_type(db: Database, setting_type: str) -> List[Setting]:
-    results = db.settings_collection.find({"setting_type": setting_type})
-    return [_convert_to_setting(setting) for setting in results]
-
-def get_setting(db: Database, setting_id: str) -> Setting:
-    setting = db.settings_collection.find_one({"id": setting_id})
-    if not setting:
-        raise ValueError(f"Setting with ID {setting_id} does not exist.")
-    return _convert_to_setting(setting)
-
-def get_setting_by_name(db: Database, name: str) -> Optional[Setting]:
-    setting = db.settings_collection.find_one({"name": name})
-    if not setting:
-        return None
-    return _convert_to_setting(setting)
+    }
 
-def list_settings(db: Database) -> List[Setting]:
-    settings = db.settings_collection.find()
-    return [_convert_to_setting(setting) for setting in settings]
+def _setting_results(documents, fields: Optional[List[str]]) -> List[Union[Setting, Dict]]:
+    """Setting models, or dicts of the requested fields when a projection is used."""
+    return [project_result(setting, fields) if fields else _convert_to_setting(setting) for setting in documents]
 
-def delete_all_settings(db: Database) -> int:
-    result = db.settings_collection.delete_many({})
-    return result.deleted_count
+def _build_setting_page(documents: List[Dict], next_cursor: Optional[str],
+                        fields: Optional[List[str]], total: Optional[int]) -> Page:
+    return Page(items=_setting_results(documents, fields), next_cursor=next_cursor, total=total)
 
 def _convert_to_setting(setting_doc: Dict) -> Setting:
     """Helper function to convert a MongoDB document to a Setting model."""
-    # Convert datetime objects to ISO strings if needed
-    created_at = setting_doc["created_at"]
-    updated_at = setting_doc["updated_at"]
-    
-    if isinstance(created_at, datetime):
-        created_at = created_at.isoformat()
-    if isinstance(updated_at, datetime):
-        updated_at = updated_at.isoformat()
-    
-    # Create the dictionary for the Pydantic model
-    setting_dict = {
-        "id": setting_doc["id"],
-        "created_at": created_at,
-        "updated_at": updated_at,
-        **{k: v for k, v in setting_doc.items() if k not in ["_id", "id", "created_at", "updated_at"]}
-    }
-    return Setting(**setting_dict)
+    return decode_model(Setting, with_iso_timestamps(setting_doc))
 
-def filter_settings_by_parent(db: Database, parent_id: str) -> List[Setting]:
+def filter_settings_by_parent(db: Database, parent_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
     """
     Filter settings to get all children of a specific parent setting.
     
     Args:
         db: Database instance
         parent_id: ID of the parent setting
+        fields: Only return these fields (plus id)
         
     Returns:
         List of Setting objects that are children of the specified parent
     """
-    results = db.settings_collection.find({"parent_id": parent_id})
-    return [_convert_to_setting(setting) for setting in results]
+    return run_blocking(_async.filter_settings_by_parent, db, parent_id, fields)
 
 def get_setting_children(db: Database, parent_id: str) -> List[Setting]:
     """
@@ -151,4 +121,91 @@ def get_setting_children(db: Database, parent_id: str) -> List[Setting]:
     """
     # This is essentially the same as filter_settings_by_parent,
     # created as a separate function for semantic clarity
-    return filter_settings_by_parent(db, parent_id) 
\ No newline at end of file
+    return filter_settings_by_parent(db, parent_id)
+
+def get_setting_subtree(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    """
+    Get a setting and all its descendants at any depth, each after its parent.
+
+    Answered with one range query on the indexed path, however deep the hierarchy.
+    """
+    return run_blocking(_async.get_setting_subtree, db, setting_id, fields)
+
+def get_setting_ancestors(db: Database, setting_id: str, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    """
+    Get the settings above a setting, outermost first (e.g. world, region, city).
+
+    The IDs come from the setting's path, so they are fetched with one $in query on id.
+    """
+    return run_blocking(_async.get_setting_ancestors, db, setting_id, fields)
+
+def get_setting_tree(db: Database, setting_id: str) -> SettingTree:
+    """Get a setting with its descendants nested under their parents."""
+    return run_blocking(_async.get_setting_tree, db, setting_id)
+
+def rebuild_setting_paths(db: Database) -> int:
+    """
+    Recompute every setting's path from the parent_id links, returning how many changed.
+
+    Used for settings stored before paths were kept and after bulk loads. A
+    setting whose parent is missing (or that is part of a parent_id cycle)
+    becomes the root of its own path.
+    """
+    documents = {document["id"]: document
+                 for document in db.settings_collection.find({}, {"id": 1, "parent_id": 1, "path": 1})}
+    changed = 0
+    for setting_id, path in _paths_from_parents(documents).items():
+        if documents[setting_id].get("path") != path:
+            db.settings_collection.update_one({"id": setting_id}, {"$set": {"path": path}})
+            changed += 1
+    return changed
+
+def _check_path_not_set(setting_data: Dict[str, Any]) -> None:
+    if "path" in setting_data:
+        raise ValueError("A setting's path is kept from its parent_id and cannot be set directly.")
+
+def _setting_path(parent_path: Optional[str], setting_id: str) -> str:
+    """A setting's materialized path: its ancestors' IDs and its own, e.g. "/<world>/<region>/<city>/"."""
+    return f"{parent_path or PATH_SEPARATOR}{setting_id}{PATH_SEPARATOR}"
+
+def _path_ids(path: str) -> List[str]:
+    return path.strip(PATH_SEPARATOR).split(PATH_SEPARATOR)
+
+def _subtree_filter(path: str) -> Dict:
+    """Matches every path starting with path: the setting itself and all its descendants."""
+    # Such paths sort from path up to, but not including, path with its final separator incremented
+    return {"path": {"$gte": path, "$lt": path[:-1] + chr(ord(PATH_SEPARATOR) + 1)}}
+
+def _moved_path(setting_id: str, parent_path: Optional[str]) -> str:
+    if parent_path is not None and setting_id in _path_ids(parent_path):
+        raise ValueError(f"Setting with ID {setting_id} cannot be moved under itself or one of its descendants.")
+    return _setting_path(parent_path, setting_id)
+
+def _in_path_order(ancestor_ids: List[str], documents, fields: Optional[List[str]] = None) -> List[Union[Setting, Dict]]:
+    by_id = {document["id"]: document for document in documents}
+    return _setting_results([by_id[ancestor_id] for ancestor_id in ancestor_ids if ancestor_id in by_id], fields)
+
+def _paths_from_parents(documents: Dict[str, Dict]) -> Dict[str, str]:
+    paths: Dict[str, str] = {}
+    for setting_id in documents:
+        chain: List[str] = []
+        current = setting_id
+        while current in documents and current not in paths and current not in chain:
+            chain.append(current)
+            current = documents[current].get("parent_id") or None
+        parent_path = paths.get(current)
+        for node in reversed(chain):
+            parent_path = paths[node] = _setting_path(parent_path, node)
+    return paths
+
+def _build_setting_tree(setting_id: str, settings: List[Setting]) -> SettingTree:
+    nodes = {setting.id: SettingTree(setting=setting) for setting in settings}
+    for setting in settings:
+        if setting.id != setting_id and setting.parent_id in nodes:
+            nodes[setting.parent_id].children.append(nodes[setting.id])
+    for node in nodes.values():
+        node.children.sort(key=lambda child: child.setting.name)
+    return nodes[setting_id]
+
+# Imported last: the async module imports the helpers above from this one
+from . import async_setting_operations as _async
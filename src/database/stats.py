@@ -0,0 +1,106 @@
+"""
+Document counts and sizes for the database info tool, cached until a write changes them.
+
+Collection totals come from the backend's estimated count and storage size,
+which MongoDB reads from collection metadata and the memory backend keeps as
+it goes, so their cost does not grow with the collection. A campaign's
+breakdown counts and sizes its characters through the campaign_id index.
+Both are cached. The operation modules invalidate a collection's totals when
+they write to it and, for a character write, only the breakdown of that
+character's campaign.
+
+Settings are not tied to a campaign, so breakdowns cover characters only.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional
+
+STATS_COLLECTIONS = ("campaigns", "characters", "settings")
+
+class StatsCache:
+    """Collection totals and per-campaign breakdowns, computed on first request."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # Off when other processes write the same database, since their writes invalidate nothing here
+        self.enabled = True
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._campaigns: Dict[str, Dict[str, Any]] = {}
+        # Bumped by every invalidation, so a result computed while a write happened is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def total(self, collection: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        return self._get(self._totals, collection, compute)
+
+    def campaign(self, campaign_id: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        return self._get(self._campaigns, campaign_id, compute)
+
+    def _get(self, entries: Dict[str, Dict[str, Any]], key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        if not self.enabled:
+            with self._lock:
+                self.misses += 1
+            return compute()
+        with self._lock:
+            cached = entries.get(key)
+            if cached is not None:
+                self.hits += 1
+                return dict(cached)
+            self.misses += 1
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            if generation == self._generation:
+                entries[key] = value
+        return dict(value)
+
+    def invalidate(self, collection: str, campaign_id: Optional[str] = None) -> None:
+        """
+        Forget a collection's totals after a write to it.
+
+        A character write also forgets the breakdown of campaign_id, or of
+        every campaign when the campaign is not known.
+        """
+        with self._lock:
+            self._generation += 1
+            self._totals.pop(collection, None)
+            if collection == "characters":
+                if campaign_id is None:
+                    self._campaigns.clear()
+                else:
+                    self._campaigns.pop(campaign_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._totals.clear()
+            self._campaigns.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+def collection_totals(db) -> Dict[str, Dict[str, Any]]:
+    """The document count and storage size in bytes (None where the backend cannot tell) of each collection."""
+    def compute(collection: str) -> Dict[str, Any]:
+        return {
+            'count': db.backend.estimated_document_count(collection),
+            'size_bytes': db.backend.storage_size(collection),
+        }
+    return {collection: db.stats.total(collection, lambda collection=collection: compute(collection))
+            for collection in STATS_COLLECTIONS}
+
+def campaign_breakdown(db, campaign_id: str) -> Dict[str, Any]:
+    """The number of characters in a campaign and the bytes their documents take up."""
+    def compute() -> Dict[str, Any]:
+        filter = {"campaign_id": campaign_id}
+        return {
+            'campaign_id': campaign_id,
+            'character_count': db.characters_collection.count_documents(filter),
+            'character_size_bytes': db.backend.data_size("characters", filter),
+        }
+    return db.stats.campaign(campaign_id, compute)
@@ -0,0 +1,192 @@
+"""
+Write-behind buffering of volatile character fields.
+
+During combat a character's hit points, conditions and spell slots change
+several times a round. With WRITE_BEHIND_FIELDS set (e.g. "data,spells"),
+an update_character touching only those fields is not written straight
+away: its $set is merged into the character's pending changes, later values
+replacing earlier ones, and the updated character is returned at once.
+Pending changes are written in one unordered bulk_write every
+WRITE_BEHIND_INTERVAL seconds, when flush_character_writes_tool is called
+(e.g. at the end of an encounter or session) and when the database is closed
+or the server exits.
+
+Reads of characters overlay the pending changes, so they see the state the
+updates returned. Filters and aggregations run in the database and see the
+state of the last flush; the operations that depend on volatile fields
+(campaign stats, archive export) flush first. An update touching any other
+field is written through, taking the character's pending changes with it.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# Changes to these always go straight to the database: names are kept unique by an index,
+# and moving a character between campaigns changes the campaign breakdowns
+WRITE_THROUGH_FIELDS = {"id", "name", "campaign_id", "created_at"}
+
+def _set_path(document: Dict, path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for key in parents:
+        child = document.get(key)
+        if not isinstance(child, dict):
+            child = document[key] = {}
+        else:
+            child = document[key] = dict(child)
+        document = child
+    document[leaf] = value
+
+class WriteBehindBuffer:
+    """Pending $set changes per character ID, flushed to the characters collection of db in batches."""
+
+    def __init__(self, db, fields: Iterable[str] = (), interval: float = 2.0):
+        self.db = db
+        self.fields: frozenset = frozenset()
+        self.interval = interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Changes taken by a flush that is still writing them; reads overlay these too
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.buffered = 0
+        self.flushes = 0
+        self.written = 0
+        self.last_error: Optional[str] = None
+        self.configure(fields, interval)
+
+    def configure(self, fields: Iterable[str], interval: Optional[float] = None) -> None:
+        """Set the buffered update fields (none turns buffering off) and the flush interval in seconds."""
+        fields = frozenset(field for field in fields if field)
+        not_allowed = fields & WRITE_THROUGH_FIELDS
+        if not_allowed:
+            raise ValueError(f"Fields {sorted(not_allowed)} cannot be written behind")
+        if interval is not None:
+            if interval <= 0:
+                raise ValueError("The write-behind interval must be positive")
+            self.interval = interval
+        self.fields = fields
+
+    def covers(self, changes: Dict[str, Any]) -> bool:
+        """Whether an update with these changes (update_character keyword arguments) is buffered."""
+        return bool(self.fields) and bool(changes) and all(field in self.fields for field in changes)
+
+    def has_pending(self) -> bool:
+        return bool(self._pending or self._flushing)
+
+    def defer(self, character_id: str, update: Dict[str, Any]) -> None:
+        """Merge a $set into the character's pending changes, starting the interval flusher if needed."""
+        with self._condition:
+            self._pending[character_id] = {**self._pending.get(character_id, {}), **update}
+            self.buffered += 1
+            if self._flusher is None:
+                self._stop.clear()
+                self._flusher = threading.Thread(target=self._flush_periodically, name="write-behind",
+                                                 daemon=True)
+                self._flusher.start()
+
+    def take(self, character_id: str) -> Dict[str, Any]:
+        """
+        Remove and return a character's pending changes, for a write-through update to include.
+
+        Waits for a flush already writing the character, so that older write cannot land after this one.
+        """
+        with self._condition:
+            while character_id in self._flushing:
+                self._condition.wait()
+            return self._pending.pop(character_id, {})
+
+    def try_take(self, character_id: str) -> Optional[Dict[str, Any]]:
+        """Like take, but None instead of waiting while a flush is writing the character."""
+        with self._condition:
+            if character_id in self._flushing:
+                return None
+            return self._pending.pop(character_id, {})
+
+    def restore(self, character_id: str, changes: Dict[str, Any]) -> None:
+        """Put back changes taken for a write that failed, under any made since."""
+        if changes:
+            with self._condition:
+                self._pending[character_id] = {**changes, **self._pending.get(character_id, {})}
+
+    def overlay(self, document: Optional[Dict]) -> Optional[Dict]:
+        """The document with its character's pending changes applied (the document itself if there are none)."""
+        if document is None or not (self._pending or self._flushing):
+            return document
+        with self._condition:
+            changes = {**self._flushing.get(document.get("id"), {}), **self._pending.get(document.get("id"), {})}
+        if not changes:
+            return document
+        document = dict(document)
+        for path, value in changes.items():
+            _set_path(document, path, value)
+        return document
+
+    def overlay_all(self, documents: Iterable[Dict]) -> List[Dict]:
+        return [self.overlay(document) for document in documents]
+
+    def discard(self, character_id: Optional[str] = None) -> None:
+        """Drop a deleted character's pending changes, or everyone's."""
+        with self._condition:
+            if character_id is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(character_id, None)
+
+    def flush(self) -> int:
+        """Write every pending change in one bulk_write, returning the number of characters written."""
+        with self._condition:
+            while self._flushing:
+                # Another flush is writing; wait so the two never write the same character out of order
+                self._condition.wait()
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            batch = self._flushing
+        # Imported here so the server does not load pymongo before its first database call
+        from pymongo import UpdateOne
+        try:
+            requests = [UpdateOne({"id": character_id}, {"$set": changes}) for character_id, changes in batch.items()]
+            self.db.characters_collection.bulk_write(requests, ordered=False)
+        except Exception as error:
+            # Tried again on the next flush
+            for character_id, changes in batch.items():
+                self.restore(character_id, changes)
+            self.last_error = str(error)
+            raise
+        finally:
+            with self._condition:
+                self._flushing = {}
+                self._condition.notify_all()
+        self.flushes += 1
+        self.written += len(batch)
+        self.db.stats.invalidate("characters")
+        return len(batch)
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # Kept in last_error and retried on the next tick
+                pass
+
+    def stop(self) -> None:
+        """Stop the interval flusher (pending changes stay until the next flush)."""
+        with self._condition:
+            flusher, self._flusher = self._flusher, None
+        self._stop.set()
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            pending = len(self._pending) + len(self._flushing)
+        return {
+            'fields': sorted(self.fields),
+            'interval_seconds': self.interval,
+            'pending_characters': pending,
+            'buffered_updates': self.buffered,
+            'flushes': self.flushes,
+            'characters_written': self.written,
+            'last_error': self.last_error,
+        }
@@ -1,67 +1,78 @@
-from mcp.server.fastmcp import FastMCP
-from database.db_operations import Database, init_db
+from database.db_operations import DB_BACKEND, Database, init_db, UNIQUE_NAMES_IGNORE_CASE
+from database.registry import DatabaseRegistry, TenantDatabase
 import argparse
+import asyncio
+import atexit
+import json
+import os
 from typing import Annotated, Dict, List
 
-from database.campaign_operations import (
-    create_campaign,
-    update_campaign,
-    delete_campaign,
-    search_campaigns,
-    get_campaign,
-    list_campaigns,
-    delete_all_campaigns
-)
-from database.character_operations import (
-    create_character,
-    update_character,
-    delete_character,
-    get_character,
-    list_characters,
-    list_campaign_characters,
-    search_characters,
-    delete_all_characters
-)
-from database.setting_operations import (
-    create_setting,
-    update_setting,
-    delete_setting,
-    search_settings,
-    get_setting,
-    list_settings,
-    filter_settings_by_type,
-    get_setting_by_name,
-    delete_all_settings
-)
 from models.campaign import Campaign
+from models.campaign_stats import CampaignStats
 from models.character import Character
-from models.setting import Setting
-from utils.helpers import validate_campaign_data, validate_character_data, validate_setting_data
+from models.patch import PatchOperation
+from models.setting import Setting, SettingTree
+from models.page import Page
+from models.search import SearchHit
+from database.pagination import DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE
+from database.decoding import set_strict_reads
+from models.import_report import ImportReport
+from models.archive import ExportReport
+from utils.helpers import validate_campaign_data, validate_character_data, validate_setting_data, validate_search_limit, parse_list_query, split_item_query, lazy_import
+from utils.metrics import InstrumentedFastMCP
+from utils.profiling import DEFAULT_DIRECTORY, MODES
+from utils import serving
 from pydantic import Field
-
-# Initialize database connection
-db = Database()
-
-# Setup MCP
-mcp = FastMCP("D&D Game Master Assistant", dependencies=["pydantic", "sqlite-utils", "rich"])
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+# The operation modules load pymongo and bson, so they are imported on first use rather than at startup
+campaign_ops = lazy_import("database.async_campaign_operations")
+character_ops = lazy_import("database.async_character_operations")
+setting_ops = lazy_import("database.async_setting_operations")
+bulk_import = lazy_import("database.bulk_import")
+archive = lazy_import("database.archive")
+indexes = lazy_import("database.indexes")
+
+# The server's database and those of the game tables (tenants) it also serves; tools given a
+# tenant argument use that tenant's database through db (see database.registry)
+databases = DatabaseRegistry(Database())
+db = TenantDatabase(databases)
+# Tools take a tenant argument, and resources use the default database; both connect it off the event loop
+select_tenant = databases.select_tenant
+connected = databases.connected
+
+# The files tools may read and write; over HTTP only those under --data-dir (see utils.serving)
+data_directory = serving.DataDirectory()
+
+# Setup MCP; every tool and resource handler is timed (see utils.metrics)
+mcp = InstrumentedFastMCP("D&D Game Master Assistant", dependencies=["pydantic", "sqlite-utils", "rich"])
 
 # Flag to track whether database is initialized
 is_db_initialized = False
 
-def initialize_db(db_name: str):
-    """Initialize the database with the given name"""
+def initialize_db(db_name: str, backend: str | None = None, deferred: bool = False,
+                  tenants: List[str] | None = None):
+    """
+    Initialize the default database with the given name on the given storage backend.
+
+    A deferred database connects on the first tool call, so the server can answer the handshake first.
+    Tenant databases are created on the same backend when first used; tenants limits which are served.
+    """
     global is_db_initialized
     if is_db_initialized:
         raise RuntimeError(f"Database '{db_name}' has already been initialized")
     
-    init_db(db, db_name=db_name)
+    init_db(databases.default, db_name=db_name, backend=backend, deferred=deferred)
+    databases.configure(db_name, backend=backend, allowed=tenants)
     print(f"Database '{db_name}' initialized")
     is_db_initialized = True
 
 # Campaign Management Tools
 
 @mcp.tool()
-def create_campaign_tool(
+@select_tenant
+async def create_campaign_tool(
     name: str,
     description: str
 ) -> Campaign:
@@ -73,10 +84,11 @@ def create_campaign_tool(
         description: A detailed description of the campaign setting and storyline
     """
     validate_campaign_data(name, description)
-    return create_campaign(db, name, description)
+    return await campaign_ops.create_campaign(db, name, description)
 
 @mcp.tool()
-def update_campaign_tool(
+@select_tenant
+async def update_campaign_tool(
     campaign_id: int,
     name: str,
     description: str
@@ -90,10 +102,11 @@ def update_campaign_tool(
         description: The new description for the campaign
     """
     validate_campaign_data(name, description)
-    return update_campaign(db, campaign_id, name, description)
+    return await campaign_ops.update_campaign(db, campaign_id, name, description)
 
 @mcp.tool()
-def delete_campaign_tool(
+@select_tenant
+async def delete_campaign_tool(
     campaign_id: int
 ) -> bool:
     """
@@ -104,42 +117,103 @@ def delete_campaign_tool(
 
     Warning: This will permanently delete the campaign and all associated data.
     """
-    return delete_campaign(db, campaign_id)
+    return await campaign_ops.delete_campaign(db, campaign_id)
 
 @mcp.tool()
-def search_campaigns_tool(
-    query: str
-) -> list[Campaign]:
+@select_tenant
+async def search_campaigns_tool(
+    query: str,
+    fields: List[str] | None = None
+) -> list[Campaign | dict]:
     """
     Search campaigns by name or description.
 
     Args:
         query: Search term to look for in campaign names and descriptions
+        fields: Only return these fields (plus id), e.g. ["name"]
+    """
+    return await campaign_ops.search_campaigns(db, query, fields)
+
+@mcp.tool()
+@select_tenant
+async def text_search_campaigns_tool(
+    query: str,
+    limit: int = 10
+) -> list[SearchHit]:
+    """
+    Full-text search campaigns, best matches first.
+
+    Matches whole words in campaign names and descriptions using the text index,
+    so it stays fast on large databases. Use search_campaigns_tool for substring matches.
+
+    Args:
+        query: Words to look for
+        limit: Maximum number of results to return (1-100)
     """
-    return search_campaigns(db, query)
+    validate_search_limit(limit)
+    return await campaign_ops.text_search_campaigns(db, query, limit)
 
 @mcp.tool()
-def delete_all_campaigns_tool() -> int:
+@select_tenant
+async def get_campaign_stats_tool(
+    campaign_id: str
+) -> CampaignStats:
+    """
+    Summarize a campaign's party: class, race and level distributions, average
+    ability scores and known spell counts.
+
+    The summary is computed inside the database, so only the small result is returned
+    however many characters the campaign has.
+
+    Args:
+        campaign_id: The ID of the campaign to summarize
+    """
+    return await campaign_ops.get_campaign_stats(db, campaign_id)
+
+@mcp.tool()
+@select_tenant
+async def list_campaigns_tool(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    fields: List[str] | None = None,
+    include_total: bool = False
+) -> Page:
+    """
+    List campaigns one page at a time.
+
+    Args:
+        limit: Maximum number of campaigns to return (1-500)
+        cursor: The next_cursor of the previous page; omit for the first page
+        fields: Only return these fields (plus id), e.g. ["name"]
+        include_total: Also count all campaigns (slower on large databases)
+    """
+    return await campaign_ops.list_campaigns_page(db, limit, cursor, fields, include_total)
+
+@mcp.tool()
+@select_tenant
+async def delete_all_campaigns_tool() -> int:
     """
     Delete all campaigns from the database.
 
     Warning: This will permanently delete ALL campaigns and associated data.
     """
-    return delete_all_campaigns(db)
+    return await campaign_ops.delete_all_campaigns(db)
 
 @mcp.tool()
-def delete_all_characters_tool() -> int:
+@select_tenant
+async def delete_all_characters_tool() -> int:
     """
     Delete all characters from the database.
 
     Warning: This will permanently delete ALL characters and their data.
     """
-    return delete_all_characters(db)
+    return await character_ops.delete_all_characters(db)
 
 # Character Management Tools
 
 @mcp.tool()
-def create_character_tool(
+@select_tenant
+async def create_character_tool(
     name: str,
     campaign_id: str,
     player_name: str | None = None,
@@ -208,10 +282,11 @@ def create_character_tool(
         updated_at=""   # Will be set by the database operation
     )
     
-    return create_character(db, character)
+    return await character_ops.create_character(db, character)
 
 @mcp.tool()
-def update_character_tool(
+@select_tenant
+async def update_character_tool(
     character_id: int,
     name: str | None = None,
     campaign_id: str | None = None,
@@ -258,25 +333,49 @@ def update_character_tool(
     """
     update_data = {k: v for k, v in locals().items() 
                   if k not in ['character_id', 'db'] and v is not None}
-    return update_character(db, character_id, **update_data)
+    return await character_ops.update_character(db, character_id, **update_data)
 
 @mcp.tool()
-def delete_character_tool(character_id: int) -> bool:
+@select_tenant
+async def patch_character_tool(character_id: str, operations: List[PatchOperation]) -> Character:
+    """
+    Change parts of a character in place, in one atomic write, e.g. to track hit points or spell slots.
+
+    Each operation has an op, a dotted path and a value:
+        inc: add value (negative to subtract) to a number, e.g. {"op": "inc", "path": "data.hp", "value": -7}
+        set: replace the value at path, e.g. {"op": "set", "path": "ability_scores.strength", "value": 16}
+        push: append value to a list, e.g. {"op": "push", "path": "equipment", "value": "Rope"}
+        pull: remove every item equal to value from a list, e.g. {"op": "pull", "path": "spells.level_1", "value": "Shield"}
+
+    The name, campaign and timestamps are changed with update_character_tool instead.
+    Each field may be changed by one operation of a patch.
+
+    Args:
+        character_id: The ID of the character to patch
+        operations: The changes to make, applied together
+    """
+    return await character_ops.patch_character(db, character_id, operations)
+
+@mcp.tool()
+@select_tenant
+async def delete_character_tool(character_id: int) -> bool:
     """
     Delete a character.
 
     Args:
         character_id: The ID of the character to delete
     """
-    return delete_character(db, character_id)
+    return await character_ops.delete_character(db, character_id)
 
 @mcp.tool()
-def search_characters_tool(
+@select_tenant
+async def search_characters_tool(
     query: str | None = None,
     campaign_id: int | None = None,
     character_class: str | None = None,
-    race: str | None = None
-) -> list[Character]:
+    race: str | None = None,
+    fields: List[str] | None = None
+) -> list[Character | dict]:
     """
     Search characters by name, race, class, etc.
 
@@ -285,19 +384,66 @@ def search_characters_tool(
         campaign_id: Filter characters by campaign ID
         character_class: Filter characters by character class
         race: Filter characters by race
+        fields: Only return these fields (plus id), e.g. ["name", "level", "data"]
     """
-    return search_characters(
+    return await character_ops.search_characters(
         db,
         query=query,
         campaign_id=campaign_id,
         character_class=character_class,
-        race=race
+        race=race,
+        fields=fields
     )
 
+@mcp.tool()
+@select_tenant
+async def text_search_characters_tool(
+    query: str,
+    campaign_id: str | None = None,
+    limit: int = 10
+) -> list[SearchHit]:
+    """
+    Full-text search characters, best matches first.
+
+    Matches whole words in character names, player names and backstories using the
+    text index. Use search_characters_tool for substring matches.
+
+    Args:
+        query: Words to look for
+        campaign_id: Only search characters in this campaign
+        limit: Maximum number of results to return (1-100)
+    """
+    validate_search_limit(limit)
+    return await character_ops.text_search_characters(db, query, campaign_id, limit)
+
+@mcp.tool()
+@select_tenant
+async def list_characters_tool(
+    campaign_id: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    fields: List[str] | None = None,
+    include_total: bool = False
+) -> Page:
+    """
+    List characters one page at a time.
+
+    Args:
+        campaign_id: Only list characters in this campaign
+        limit: Maximum number of characters to return (1-500)
+        cursor: The next_cursor of the previous page; omit for the first page
+        fields: Only return these fields (plus id), e.g. ["name", "level"]
+        include_total: Also count all matching characters (slower on large databases)
+    """
+    if campaign_id is not None:
+        return await character_ops.list_campaign_characters_page(db, campaign_id, limit, cursor, fields, include_total)
+    return await character_ops.list_characters_page(db, limit, cursor, fields, include_total)
+
 # Setting Management Tools
 
 @mcp.tool()
-def create_setting_tool(
+@select_tenant
+async def create_setting_tool(
     setting_type: str,
     name: str,
     region: str,
@@ -381,10 +527,11 @@ def create_setting_tool(
     # Remove None values
     setting_data = {k: v for k, v in setting_data.items() if v is not None}
     
-    return create_setting(db, **setting_data)
+    return await setting_ops.create_setting(db, **setting_data)
 
 @mcp.tool()
-def update_setting_tool(
+@select_tenant
+async def update_setting_tool(
     setting_id: str,
     setting_type: str | None = None,
     name: str | None = None,
@@ -452,11 +599,12 @@ def update_setting_tool(
     warning = None
     if unknown_fields:
         warning = f"Warning: Unknown fields ignored: {', '.join(unknown_fields)}"
-    updated_setting = update_setting(db, setting_id, **filtered_update_data)
+    updated_setting = await setting_ops.update_setting(db, setting_id, **filtered_update_data)
     return {"setting": updated_setting, "warning": warning}
 
 @mcp.tool()
-def delete_setting_tool(
+@select_tenant
+async def delete_setting_tool(
     setting_id: str
 ) -> bool:
     """
@@ -467,22 +615,25 @@ def delete_setting_tool(
 
     Warning: This will permanently delete the setting and all its data.
     """
-    return delete_setting(db, setting_id)
+    return await setting_ops.delete_setting(db, setting_id)
 
 @mcp.tool()
-def search_settings_tool(
-    query: str
+@select_tenant
+async def search_settings_tool(
+    query: str,
+    fields: List[str] | None = None
 ) -> Dict:
     """
     Search settings by name, region, or description.
 
     Args:
         query: Search term to look for in setting names, regions, or descriptions
+        fields: Only return these fields (plus id), e.g. ["name", "setting_type"]
 
     Returns:
         dict: The matching settings, a message, and a count.
     """
-    settings = search_settings(db, query)
+    settings = await setting_ops.search_settings(db, query, fields)
     result = {
         "settings": settings,
         "message": f"No settings found matching '{query}'." if not settings else f"Found {len(settings)} setting(s) matching '{query}'.",
@@ -491,19 +642,62 @@ def search_settings_tool(
     return result
 
 @mcp.tool()
-def filter_settings_by_type_tool(
-    setting_type: str
+@select_tenant
+async def text_search_settings_tool(
+    query: str,
+    setting_type: str | None = None,
+    limit: int = 10
+) -> list[SearchHit]:
+    """
+    Full-text search settings, best matches first.
+
+    Matches whole words in setting names, descriptions, regions, atmosphere and first
+    impressions using the text index. Use search_settings_tool for substring matches.
+
+    Args:
+        query: Words to look for
+        setting_type: Only search settings of this type (e.g., City, Forest)
+        limit: Maximum number of results to return (1-100)
+    """
+    validate_search_limit(limit)
+    return await setting_ops.text_search_settings(db, query, setting_type, limit)
+
+@mcp.tool()
+@select_tenant
+async def list_settings_tool(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+    fields: List[str] | None = None,
+    include_total: bool = False
+) -> Page:
+    """
+    List settings one page at a time.
+
+    Args:
+        limit: Maximum number of settings to return (1-500)
+        cursor: The next_cursor of the previous page; omit for the first page
+        fields: Only return these fields (plus id), e.g. ["name", "setting_type"]
+        include_total: Also count all settings (slower on large databases)
+    """
+    return await setting_ops.list_settings_page(db, limit, cursor, fields, include_total)
+
+@mcp.tool()
+@select_tenant
+async def filter_settings_by_type_tool(
+    setting_type: str,
+    fields: List[str] | None = None
 ) -> Dict:
     """
     Filter settings by their type (e.g., City, Town, Forest).
 
     Args:
         setting_type: The type of setting to filter by (e.g., City, Town, Forest)
+        fields: Only return these fields (plus id), e.g. ["name"]
 
     Returns:
         dict: The matching settings, a message, and a count.
     """
-    settings = filter_settings_by_type(db, setting_type)
+    settings = await setting_ops.filter_settings_by_type(db, setting_type, fields)
     result = {
         "settings": settings,
         "message": f"No settings found with type '{setting_type}'." if not settings else f"Found {len(settings)} setting(s) with type '{setting_type}'.",
@@ -512,21 +706,22 @@ def filter_settings_by_type_tool(
     return result
 
 @mcp.tool()
-def filter_settings_by_parent_tool(
-    parent_id: str
+@select_tenant
+async def filter_settings_by_parent_tool(
+    parent_id: str,
+    fields: List[str] | None = None
 ) -> Dict:
     """
     Filter settings by their parent setting ID.
 
     Args:
         parent_id: The ID of the parent setting to filter by
+        fields: Only return these fields (plus id), e.g. ["name", "setting_type"]
 
     Returns:
         dict: Child settings of the specified parent, a message, and a count.
     """
-    # Get all settings and filter by parent_id
-    all_settings = list_settings(db)
-    settings = [s for s in all_settings if s.parent_id == parent_id]
+    settings = await setting_ops.filter_settings_by_parent(db, parent_id, fields)
     
     result = {
         "settings": settings,
@@ -536,93 +731,384 @@ def filter_settings_by_parent_tool(
     return result
 
 @mcp.tool()
-def get_setting_by_name_tool(
-    name: str
-) -> Setting:
+@select_tenant
+async def get_setting_subtree_tool(
+    setting_id: str,
+    fields: List[str] | None = None
+) -> Dict:
+    """
+    Get a setting and everything below it at any depth (e.g. a region, its cities, their districts and taverns).
+
+    Args:
+        setting_id: The ID of the setting at the top of the subtree
+        fields: Only return these fields (plus id), e.g. ["name", "parent_id"]
+
+    Returns:
+        dict: The setting and its descendants, each listed after its parent, and a count.
+    """
+    settings = await setting_ops.get_setting_subtree(db, setting_id, fields)
+    return {"settings": settings, "count": len(settings)}
+
+@mcp.tool()
+@select_tenant
+async def get_setting_ancestors_tool(
+    setting_id: str,
+    fields: List[str] | None = None
+) -> Dict:
+    """
+    Get the settings a setting lies within, outermost first (e.g. world, continent, region).
+
+    Args:
+        setting_id: The ID of the setting whose ancestors to get
+        fields: Only return these fields (plus id), e.g. ["name"]
+
+    Returns:
+        dict: The ancestor settings and a count; top-level settings have none.
+    """
+    settings = await setting_ops.get_setting_ancestors(db, setting_id, fields)
+    return {"settings": settings, "count": len(settings)}
+
+@mcp.tool()
+@select_tenant
+async def get_setting_by_name_tool(
+    name: str,
+    fields: List[str] | None = None
+) -> Setting | dict:
     """
     Get a setting by its name.
 
     Args:
         name: The name of the setting to retrieve
+        fields: Only return these fields (plus id), e.g. ["description"]
 
     Raises:
         ValueError: If the setting is not found
     """
-    setting = get_setting_by_name(db, name)
+    setting = await setting_ops.get_setting_by_name(db, name, fields)
     if not setting:
         raise ValueError(f"Setting with name '{name}' not found")
     return setting
 
 @mcp.tool()
-def delete_all_settings_tool() -> bool:
+@select_tenant
+async def delete_all_settings_tool() -> bool:
     """
     Delete all settings from the database.
 
     Warning: This will permanently delete ALL settings and their data.
     """
-    return delete_all_settings(db)
+    return await setting_ops.delete_all_settings(db)
+
+@mcp.tool()
+@select_tenant
+async def lookup_by_name_tool(
+    fragment: str,
+    kinds: List[str] | None = None,
+    campaign_id: str | None = None,
+    limit: int = 10
+) -> dict:
+    """
+    Find campaigns, characters and settings whose name or alias contains a fragment.
+
+    Matching is case-insensitive and uses the trigram name index, so partial names
+    such as "wick" for "Fizwick" are found without scanning every document.
+
+    Args:
+        fragment: Part of a name or alias to look for
+        kinds: Which of "campaigns", "characters" and "settings" to search (default: all)
+        campaign_id: Only return characters from this campaign
+        limit: Maximum number of results of each kind to return (1-100)
+    """
+    validate_search_limit(limit)
+    kinds = kinds or ["campaigns", "characters", "settings"]
+    unknown = set(kinds) - {"campaigns", "characters", "settings"}
+    if unknown:
+        raise ValueError(f"Unknown kinds: {', '.join(sorted(unknown))}. Valid kinds are campaigns, characters and settings.")
+    result = {}
+    if "campaigns" in kinds:
+        result["campaigns"] = await campaign_ops.lookup_campaigns_by_name(db, fragment, limit)
+    if "characters" in kinds:
+        result["characters"] = await character_ops.lookup_characters_by_name(db, fragment, campaign_id, limit)
+    if "settings" in kinds:
+        result["settings"] = await setting_ops.lookup_settings_by_name(db, fragment, limit=limit)
+    return result
 
 @mcp.tool()
-def get_database_info_tool() -> dict:
+@select_tenant
+async def import_records_tool(
+    paths: List[str],
+    campaign_id: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int | None = None
+) -> ImportReport:
+    """
+    Bulk import characters and settings from JSON or JSONL files on the server.
+
+    Each record is a character sheet (see docs/fizwick.json), a character, or a setting
+    (recognised by its setting_type). Invalid records are reported and skipped.
+
+    Args:
+        paths: JSON or JSONL files to import, relative to the server's data directory if it has one
+        campaign_id: Campaign for characters whose record has no campaign_id
+        batch_size: Number of records validated and inserted together
+        workers: Number of processes validating records (default: one per CPU)
+    """
+    paths = [data_directory.resolve(path) for path in paths]
+    return await asyncio.to_thread(bulk_import.import_files, db, paths, campaign_id, batch_size, workers)
+
+@mcp.tool()
+@select_tenant
+async def export_campaign_tool(
+    campaign_id: str,
+    path: str,
+    include_settings: bool = True
+) -> ExportReport:
+    """
+    Export a campaign and its characters to a JSONL archive file on the server.
+
+    The archive is compressed with gzip when path ends in .gz, or zstd when it ends in .zst.
+
+    Args:
+        campaign_id: The ID of the campaign to export
+        path: Where to write the archive, relative to the server's data directory if it has one
+        include_settings: Also export all settings (settings are shared by campaigns)
+    """
+    path = data_directory.resolve(path)
+    return await asyncio.to_thread(archive.export_campaign, db, campaign_id, path, include_settings)
+
+@mcp.tool()
+@select_tenant
+async def restore_archive_tool(path: str) -> ImportReport:
+    """
+    Restore a campaign archive written by export_campaign_tool, keeping the original IDs.
+
+    Documents that already exist are reported and skipped.
+
+    Args:
+        path: The archive file on the server, relative to its data directory if it has one
+    """
+    path = data_directory.resolve(path)
+    return await asyncio.to_thread(archive.restore_archive, db, path)
+
+@mcp.tool()
+@select_tenant
+async def get_database_info_tool(campaign_id: str | None = None) -> dict:
     """
     Get database information including name and counts for campaigns, characters, and settings.
+
+    Counts and sizes are cached until a write changes them, so repeated calls are cheap.
+
+    Args:
+        campaign_id: Also report the number of characters in this campaign and the bytes they take up
     """
-    return db.get_info()
+    if campaign_id is not None:
+        await campaign_ops.get_campaign(db, campaign_id)
+    return await db.get_info_async(campaign_id)
+
+@mcp.tool()
+@select_tenant
+async def flush_character_writes_tool() -> dict:
+    """
+    Write buffered character changes to the database now, e.g. at the end of an encounter or session.
+
+    Updates that only change the fields named in WRITE_BEHIND_FIELDS are buffered and written
+    in batches every few seconds; reads already see them. Returns the number of characters
+    written and the buffer's statistics.
+    """
+    written = await asyncio.to_thread(db.write_behind.flush)
+    # The number this flush wrote, rather than the running total in the statistics
+    return {**db.write_behind.stats(), "characters_written": written}
+
+@mcp.tool()
+async def list_tenants_tool() -> dict:
+    """
+    List the tenants (game tables) whose databases this server has opened, besides its default database.
+
+    Pass a tenant as the tenant argument of any database tool to use its database; it is created on first use.
+    """
+    return {
+        "default_database": databases.db_name,
+        "tenants": databases.tenants(),
+        "allowed": sorted(databases.allowed) if databases.allowed is not None else None,
+    }
+
+@mcp.tool()
+async def get_metrics_tool() -> dict:
+    """
+    Get call counts, error counts and p50/p95/p99 latencies for every tool and resource,
+    split into database time (inside the handler) and serialization time, and how many
+    calls are running and waiting under the concurrency limit.
+    """
+    return {**mcp.metrics.snapshot(), "concurrency": mcp.concurrency.stats()}
+
+@mcp.tool()
+@select_tenant
+async def get_slow_queries_tool(limit: int = 20, collection: str | None = None) -> dict:
+    """
+    Get the most recent database commands slower than the slow-query threshold, newest first.
+
+    Each entry has the collection, operation, filter shape (values replaced by "?") and duration,
+    plus the query plan and documents examined when explain is enabled.
+
+    Args:
+        limit: The maximum number of entries to return
+        collection: Only return commands on this collection
+    """
+    validate_search_limit(limit)
+    # Let explains still running for the returned commands finish
+    await asyncio.to_thread(db.query_log.drain)
+    return {
+        "threshold_ms": db.query_log.threshold_ms,
+        "explain": db.query_log.explain,
+        "log_file": db.query_log.path,
+        "log_file_error": db.query_log.write_error,
+        "entries": db.query_log.entries(limit, collection),
+    }
+
+@mcp.tool()
+@select_tenant
+async def get_index_report_tool() -> dict:
+    """
+    Report each collection's indexes with how often they were used, the indexes nothing uses,
+    and the query shapes seen since startup that no index serves, with a suggested index key.
+    """
+    return await asyncio.to_thread(indexes.index_report, db, UNIQUE_NAMES_IGNORE_CASE)
+
+@mcp.tool()
+async def configure_profiling_tool(rate: float, mode: str | None = None, directory: str | None = None) -> dict:
+    """
+    Profile a sample of tool calls, writing a file per profiled call tagged with the tool name
+    and a hash of its arguments.
+
+    Args:
+        rate: The percentage of tool calls to profile (0 turns profiling off)
+        mode: "cpu" for cProfile .prof files, "memory" for tracemalloc allocation top-lists, or "both"
+        directory: The directory on the server the files are written to (default "profiles"),
+            relative to the server's data directory if it has one
+    """
+    return mcp.profiler.configure(rate, mode, data_directory.resolve(directory) if directory else None)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """The same metrics in the Prometheus text format, served on the HTTP transports."""
+    return PlainTextResponse(mcp.metrics.prometheus(), media_type="text/plain; version=0.0.4")
 
 # Campaign Resources
 
+# Paged list resources take a query such as ?limit=20&cursor=...&fields=name,level.
+# They are registered before the {id} templates, which would otherwise match "list?..." as an ID.
+# Item resources take ?fields=name,level too; the template's ID then holds the query, which is split off.
+
+@mcp.resource("campaign://list{query}")
+@connected
+async def list_campaigns_page_resource(query: str) -> Page:
+    """
+    List campaigns one page at a time.
+    """
+    return await campaign_ops.list_campaigns_page(db, **parse_list_query(query))
+
+@mcp.resource("campaign://{campaign_id}/stats")
+@connected
+async def get_campaign_stats_resource(campaign_id: str) -> CampaignStats:
+    """
+    Get the class, race, level, ability score and spell summary of a campaign's characters.
+    """
+    return await campaign_ops.get_campaign_stats(db, campaign_id)
+
 @mcp.resource("campaign://{campaign_id}")
-def get_campaign_resource(campaign_id: int) -> Campaign:
+@connected
+async def get_campaign_resource(campaign_id: str) -> Campaign | dict:
     """
-    Get campaign details.
+    Get campaign details, or only some fields with ?fields=name,description.
     """
-    return get_campaign(db, campaign_id)
+    campaign_id, fields = split_item_query(campaign_id)
+    return await campaign_ops.get_campaign(db, campaign_id, fields)
 
 @mcp.resource("campaign://list")
-def list_campaigns_resource() -> list[Campaign]:
+@connected
+async def list_campaigns_resource() -> list[Campaign]:
     """
     List all campaigns.
     """
-    return list_campaigns(db)
+    return await campaign_ops.list_campaigns(db)
 
 # Character Resources
 
+@mcp.resource("character://list{query}")
+@connected
+async def list_characters_page_resource(query: str) -> Page:
+    """
+    List characters one page at a time.
+    """
+    return await character_ops.list_characters_page(db, **parse_list_query(query))
+
+@mcp.resource("character://campaign/{campaign_id}/list{query}")
+@connected
+async def list_campaign_characters_page_resource(campaign_id: str, query: str) -> Page:
+    """
+    List the characters in a campaign one page at a time.
+    """
+    return await character_ops.list_campaign_characters_page(db, campaign_id, **parse_list_query(query))
+
 @mcp.resource("character://{character_id}")
-def get_character_resource(character_id: int) -> Character:
+@connected
+async def get_character_resource(character_id: str) -> Character | dict:
     """
-    Get character details.
+    Get character details, or only some fields with ?fields=name,level,data.
     """
-    return get_character(db, character_id)
+    character_id, fields = split_item_query(character_id)
+    return await character_ops.get_character(db, character_id, fields)
 
 @mcp.resource("character://list")
-def list_characters_resource() -> list[Character]:
+@connected
+async def list_characters_resource() -> list[Character]:
     """
     List all characters.
     """
-    return list_characters(db)
+    return await character_ops.list_characters(db)
 
 @mcp.resource("character://campaign/{campaign_id}/list")
-def list_campaign_characters_resource(campaign_id: int) -> list[Character]:
+@connected
+async def list_campaign_characters_resource(campaign_id: int) -> list[Character]:
     """
     List all characters in a campaign.
     """
-    return list_campaign_characters(db, campaign_id)
+    return await character_ops.list_campaign_characters(db, campaign_id)
 
 # Setting Resources
 
+@mcp.resource("setting://list{query}")
+@connected
+async def list_settings_page_resource(query: str) -> Page:
+    """
+    List settings one page at a time.
+    """
+    return await setting_ops.list_settings_page(db, **parse_list_query(query))
+
+@mcp.resource("setting://{setting_id}/tree")
+@connected
+async def get_setting_tree_resource(setting_id: str) -> SettingTree:
+    """
+    Get a setting with all its descendants nested under their parents.
+    """
+    return await setting_ops.get_setting_tree(db, setting_id)
+
 @mcp.resource("setting://{setting_id}")
-def get_setting_resource(setting_id: str) -> Setting:
+@connected
+async def get_setting_resource(setting_id: str) -> Setting | dict:
     """
-    Get setting details.
+    Get setting details, or only some fields with ?fields=name,setting_type.
     """
-    return get_setting(db, setting_id)
+    setting_id, fields = split_item_query(setting_id)
+    return await setting_ops.get_setting(db, setting_id, fields)
 
 @mcp.resource("setting://list")
-def list_settings_resource() -> Dict:
+@connected
+async def list_settings_resource() -> Dict:
     """
     List all settings.
     """
-    settings = list_settings(db)
+    settings = await setting_ops.list_settings(db)
     result = {
         "settings": settings,
         "message": "No settings found. Use the create_setting_tool to add new settings." if not settings else "",
@@ -631,25 +1117,129 @@ def list_settings_resource() -> Dict:
     return result
 
 @mcp.resource("setting://name/{name}")
-def get_setting_by_name_resource(name: str) -> Setting:
+@connected
+async def get_setting_by_name_resource(name: str) -> Setting:
     """
     Get setting details by name.
     """
-    return get_setting_by_name(db, name)
+    return await setting_ops.get_setting_by_name(db, name)
 
 def parse_args():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description="D&D Game Master Assistant")
     parser.add_argument("--db-name", required=True, help="Database name (required)")
+    parser.add_argument("--backend", default=None,
+                        help="Storage backend: 'mongodb' (default), a mongodb:// URI, 'sqlite:path' or 'memory'")
+    parser.add_argument("--tenants", default=None,
+                        help="Comma-separated tenants whose databases tools may select (default: any)")
+    parser.add_argument("--transport", choices=("stdio",) + serving.HTTP_TRANSPORTS, default="stdio",
+                        help="Serve one client over stdio (default), or many over Streamable HTTP or SSE")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the HTTP transports listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port the HTTP transports listen on")
+    parser.add_argument("--allowed-hosts", default=None,
+                        help="Comma-separated Host headers (host or host:port) HTTP clients may send besides loopback")
+    parser.add_argument("--data-dir", default=None,
+                        help="Directory the import, export, restore and profiling tools may use "
+                             "(over HTTP they are refused without it)")
+    parser.add_argument("--http-workers", type=int, default=1,
+                        help="Processes serving streamable-http requests (more than 1 implies --stateless)")
+    parser.add_argument("--stateless", action="store_true",
+                        help="Serve each streamable-http request without a server-side session")
+    parser.add_argument("--max-concurrency", type=int, default=64,
+                        help="Tool calls and resource reads each process runs at once; the rest wait (0: no limit)")
+    parser.add_argument("--offload-threads", type=int, default=None,
+                        help="Threads each HTTP worker runs blocking database work on (default: asyncio's)")
+    parser.add_argument("--strict-reads", action="store_true",
+                        help="Validate documents read from the database in strict mode (no type coercion)")
+    parser.add_argument("--profile-rate", type=float, default=0,
+                        help="Percentage of tool calls to profile (default 0, off)")
+    parser.add_argument("--profile-mode", choices=MODES, default="cpu",
+                        help="Profile with cProfile (cpu), tracemalloc (memory) or both")
+    parser.add_argument("--profile-dir", default=DEFAULT_DIRECTORY,
+                        help=f"Directory for profile files (default {DEFAULT_DIRECTORY})")
+    commands = parser.add_subparsers(dest="command")
+    import_parser = commands.add_parser("import", help="Bulk import characters and settings from JSON/JSONL files")
+    import_parser.add_argument("paths", nargs="+", help="JSON or JSONL files to import")
+    import_parser.add_argument("--campaign-id", default=None,
+                               help="Campaign for characters whose record has no campaign_id")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                               help=f"Records validated and inserted together (default {DEFAULT_BATCH_SIZE})")
+    import_parser.add_argument("--workers", type=int, default=None,
+                               help="Processes validating records (default: one per CPU)")
+    export_parser = commands.add_parser("export", help="Export a campaign to a JSONL archive (.gz or .zst to compress)")
+    export_parser.add_argument("campaign_id", help="The ID of the campaign to export")
+    export_parser.add_argument("path", help="Where to write the archive")
+    export_parser.add_argument("--no-settings", action="store_true", help="Leave settings out of the archive")
+    restore_parser = commands.add_parser("restore", help="Restore a campaign archive")
+    restore_parser.add_argument("path", help="The archive to restore")
     return parser.parse_args()
 
+# Set by the process starting several HTTP workers, which configure themselves from it (see http_app)
+SERVER_CONFIG_ENV = "DM_SERVER_CONFIG"
+
+def configure_server(args: argparse.Namespace) -> None:
+    """Apply the options every server process needs: read validation, profiling, concurrency and the database."""
+    if args.strict_reads:
+        set_strict_reads(True)
+    mcp.profiler.configure(args.profile_rate, args.profile_mode, args.profile_dir)
+    mcp.concurrency.configure(args.max_concurrency or None)
+    data_directory.configure(args.data_dir)
+
+    # Initialize the database; the server connects on first use, the one-shot commands right away
+    initialize_db(args.db_name, backend=args.backend, deferred=args.command is None,
+                  tenants=args.tenants.split(",") if args.tenants else None)
+    # Buffered character changes are written when the server exits, however its session ended
+    atexit.register(databases.flush_all)
+
+def configure_http(args: argparse.Namespace) -> None:
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.settings.stateless_http = args.stateless or args.http_workers > 1
+    # Any network client may call the tools, so they only reach files under --data-dir
+    data_directory.configure(args.data_dir, required=True)
+    if args.host not in serving.LOOPBACK_HOSTS:
+        # FastMCP only sets up DNS rebinding protection for a loopback address; elsewhere the hosts are named
+        allowed_hosts = args.allowed_hosts.split(",") if args.allowed_hosts else []
+        mcp.settings.transport_security = serving.transport_security(allowed_hosts)
+
+def build_http_app(transport: str, threads: int | None = None):
+    """The ASGI app serving MCP over transport ("streamable-http" or "sse"), with /metrics."""
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    return serving.with_thread_pool(app, threads)
+
+def http_app():
+    """Build the app of one HTTP worker process from the options its parent put in DM_SERVER_CONFIG."""
+    args = argparse.Namespace(**json.loads(os.environ[SERVER_CONFIG_ENV]))
+    configure_server(args)
+    # The other workers write the same databases, so nothing may be cached or buffered per process
+    databases.share_between_processes()
+    configure_http(args)
+    return build_http_app(args.transport, args.offload_threads)
+
 if __name__ == "__main__":
 
     args = parse_args()
-    db_name = args.db_name
-    
-    # Initialize the database
-    initialize_db(db_name)
     
-    # Run the MCP application
-    mcp.run()
\ No newline at end of file
+    if args.command is not None:
+        configure_server(args)
+        if args.command == "import":
+            report = bulk_import.import_files(db, args.paths, args.campaign_id, args.batch_size, args.workers)
+        elif args.command == "export":
+            report = archive.export_campaign(db, args.campaign_id, args.path, not args.no_settings)
+        else:
+            report = archive.restore_archive(db, args.path)
+        print(json.dumps(report.model_dump(), indent=2))
+    elif args.transport == "stdio":
+        # Run the MCP application
+        configure_server(args)
+        mcp.run()
+    else:
+        serving.check_workers(args.transport, args.http_workers, args.backend or DB_BACKEND)
+        if args.http_workers > 1:
+            # Each worker imports this module as dm and builds its own app, database connection included
+            os.environ[SERVER_CONFIG_ENV] = json.dumps(vars(args))
+            serving.run("dm:http_app", args.host, args.port, args.http_workers)
+        else:
+            configure_server(args)
+            configure_http(args)
+            serving.run(build_http_app(args.transport, args.offload_threads), args.host, args.port)
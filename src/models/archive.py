@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Dict
+
+class ExportReport(BaseModel):
+    path: str
+    campaign_id: str
+    counts: Dict[str, int]  # Documents written per collection
+    bytes: int  # Size of the (compressed) archive
+    seconds: float
+    documents_per_second: float
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class ValueCount(BaseModel):
+    value: Optional[Any] = None  # None counts characters without the field
+    count: int
+
+class CampaignStats(BaseModel):
+    campaign_id: str
+    character_count: int
+    classes: List[ValueCount]  # Most common first
+    races: List[ValueCount]  # Most common first
+    levels: List[ValueCount]  # Lowest level first
+    average_level: Optional[float] = None
+    min_level: Optional[int] = None
+    max_level: Optional[int] = None
+    average_ability_scores: Dict[str, Optional[float]]  # None where no character has the score
+    spellcasters: int  # Characters knowing at least one spell or cantrip
+    known_spells: int
+    spells_by_level: Dict[str, int]  # Known spells per Spells field, e.g. "cantrips", "level_1"
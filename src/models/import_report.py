@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+
+class RecordError(BaseModel):
+    location: str  # file:line for JSONL, file#index for JSON
+    error: str
+
+class ImportReport(BaseModel):
+    files: List[str]
+    records: int  # Records read from the files
+    imported: int  # Records written to the database
+    failed: int
+    errors: List[RecordError]
+    seconds: float
+    records_per_second: float
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Any, List, Optional
+
+class Page(BaseModel):
+    items: List[Any]  # Models, or dicts of the requested fields when a projection is used
+    next_cursor: Optional[str] = None  # Pass back to fetch the next page; None on the last page
+    total: Optional[int] = None  # Only counted when explicitly requested
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Any, Literal
+
+class PatchOperation(BaseModel):
+    op: Literal["inc", "set", "push", "pull"]
+    path: str  # Dotted path of the field to change, e.g. data.hp or spells.level_1
+    value: Any  # Amount to add for inc, new value for set, the list item for push and pull
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+from typing import Any
+
+class SearchHit(BaseModel):
+    score: float  # Relevance of the match, higher is better
+    item: Any  # The matching Campaign, Character or Setting
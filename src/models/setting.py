@@ -27,4 +27,8 @@ class Setting(BaseModel):
     parent_id: Optional[str] = None  # ID of the parent setting (for hierarchical relationships)
     notes: Optional[str] = None  # Additional notes about the setting
     created_at: str
-    updated_at: str 
\ No newline at end of file
+    updated_at: str
+
+class SettingTree(BaseModel):
+    setting: Setting
+    children: List["SettingTree"] = []  # Child settings and their own subtrees, by name
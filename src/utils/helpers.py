@@ -1,4 +1,8 @@
-from typing import Optional, List
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Optional, List, Tuple
+from urllib.parse import parse_qs
 
 def validate_campaign_data(name: str, description: str) -> None:
     """
@@ -35,4 +39,58 @@ def validate_setting_data(name: str, setting_type: str) -> None:
     if not setting_type:
         raise ValueError("Setting type cannot be empty")
     if len(setting_type) > 50:
-        raise ValueError("Setting type is too long (max 50 characters)") 
\ No newline at end of file
+        raise ValueError("Setting type is too long (max 50 characters)") 
+
+def validate_search_limit(limit: int) -> None:
+    """
+    Validate the number of results requested from a text search.
+    """
+    if limit < 1 or limit > 100:
+        raise ValueError("Search limit must be between 1 and 100")
+
+def parse_list_query(query: str) -> dict:
+    """
+    Parse a list resource query such as '?limit=20&cursor=abc&fields=name,level'.
+    """
+    params = {key: values[-1] for key, values in parse_qs(query.lstrip("?")).items()}
+    unknown = set(params) - {"limit", "cursor", "fields", "include_total"}
+    if unknown:
+        raise ValueError(f"Unknown list parameter(s): {', '.join(sorted(unknown))}")
+    parsed = {}
+    if "limit" in params:
+        if not params["limit"].isdigit():
+            raise ValueError("limit must be a positive integer")
+        parsed["limit"] = int(params["limit"])
+    if "cursor" in params:
+        parsed["cursor"] = params["cursor"]
+    if "fields" in params:
+        parsed["fields"] = [field.strip() for field in params["fields"].split(",") if field.strip()]
+    if "include_total" in params:
+        parsed["include_total"] = params["include_total"].lower() in ("1", "true", "yes")
+    return parsed
+
+def split_item_query(value: str) -> Tuple[str, Optional[List[str]]]:
+    """
+    Split an item resource's '<id>?fields=name,level' into the ID and the requested fields.
+    """
+    identifier, _, query = value.partition("?")
+    if not query:
+        return identifier, None
+    params = parse_list_query(query)
+    if set(params) - {"fields"}:
+        raise ValueError("Only fields can be given when getting a single item")
+    return identifier, params.get("fields")
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module whose code only runs when one of its attributes is first used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,305 @@
+"""
+Per-handler call counts, error counts and latency histograms for the MCP server.
+
+Every tool and resource handler registered on an InstrumentedFastMCP is timed
+in two phases:
+
+  db             time inside the handler: queries plus building models
+  serialization  time FastMCP spends turning the result into MCP content
+
+Histograms use fixed buckets, so recording a call is a bisect and a few
+increments; percentiles are interpolated within a bucket the way Prometheus'
+histogram_quantile does.
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+from .profiling import CallProfiler
+
+# Upper bounds in seconds; the last bucket catches everything slower
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PHASES = ("db", "serialization")
+
+class Histogram:
+    """Counts of observations per latency bucket, plus their sum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for position, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                # The observed extremes narrow the outermost buckets
+                lower = max(BUCKETS[position - 1] if position else 0.0, self.min)
+                upper = min(BUCKETS[position] if position < len(BUCKETS) else self.max, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        def milliseconds(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 3) if value is not None else None
+        return {
+            "count": self.total,
+            "mean_ms": milliseconds(self.sum / self.total if self.total else None),
+            "p50_ms": milliseconds(self.quantile(0.5)),
+            "p95_ms": milliseconds(self.quantile(0.95)),
+            "p99_ms": milliseconds(self.quantile(0.99)),
+        }
+
+class HandlerMetrics:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.calls = 0
+        self.errors = 0
+        self.histograms = {phase: Histogram() for phase in PHASES}
+
+class _Call:
+    """The handler that ran during one MCP request and how long it took."""
+    __slots__ = ("name", "seconds")
+
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.seconds = 0.0
+
+_current_call: ContextVar[Optional[_Call]] = ContextVar("current_call", default=None)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, HandlerMetrics] = {}
+        self.started = time.time()
+
+    def _handler(self, name: str, kind: str) -> HandlerMetrics:
+        handler = self._handlers.get(name)
+        if handler is None:
+            handler = self._handlers.setdefault(name, HandlerMetrics(kind))
+        return handler
+
+    def record_call(self, name: str, kind: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            handler = self._handler(name, kind)
+            handler.calls += 1
+            handler.errors += failed
+            handler.histograms["db"].observe(seconds)
+
+    def record_serialization(self, name: str, seconds: float) -> None:
+        with self._lock:
+            handler = self._handlers.get(name)
+            if handler is not None:
+                handler.histograms["serialization"].observe(seconds)
+
+    def instrument(self, fn, kind: str):
+        """Wrap an async handler so each call is counted and timed."""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                seconds = time.perf_counter() - start
+                self.record_call(name, kind, seconds, failed)
+                call = _current_call.get()
+                if call is not None:
+                    call.name, call.seconds = name, seconds
+
+        return timed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            handlers = {
+                name: {
+                    "kind": handler.kind,
+                    "calls": handler.calls,
+                    "errors": handler.errors,
+                    **{phase: histogram.summary() for phase, histogram in handler.histograms.items()},
+                }
+                for name, handler in sorted(self._handlers.items())
+            }
+        return {"uptime_seconds": round(time.time() - self.started, 1), "handlers": handlers}
+
+    def prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = [
+            "# HELP dm_handler_calls_total MCP tool and resource handler calls.",
+            "# TYPE dm_handler_calls_total counter",
+        ]
+        with self._lock:
+            handlers = sorted(self._handlers.items())
+            for name, handler in handlers:
+                lines.append(f'dm_handler_calls_total{{handler="{name}",kind="{handler.kind}"}} {handler.calls}')
+            lines += ["# HELP dm_handler_errors_total Handler calls that raised.",
+                      "# TYPE dm_handler_errors_total counter"]
+            for name, handler in handlers:
+                lines.append(f'dm_handler_errors_total{{handler="{name}",kind="{handler.kind}"}} {handler.errors}')
+            lines += ["# HELP dm_handler_duration_seconds Handler latency by phase (db, serialization).",
+                      "# TYPE dm_handler_duration_seconds histogram"]
+            for name, handler in handlers:
+                for phase, histogram in handler.histograms.items():
+                    labels = f'handler="{name}",kind="{handler.kind}",phase="{phase}"'
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'dm_handler_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"dm_handler_duration_seconds_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"dm_handler_duration_seconds_count{{{labels}}} {histogram.total}")
+        return "\n".join(lines) + "\n"
+
+class ConcurrencyLimit:
+    """
+    Bounds how many tool calls and resource reads one process runs at once.
+
+    Requests beyond the limit wait for a slot, so a burst queues instead of
+    piling up database work; a limit of None lets everything through.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit: Optional[int] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak = 0
+        self.configure(limit)
+
+    def configure(self, limit: Optional[int]) -> None:
+        if limit is not None and limit < 1:
+            raise ValueError("The concurrency limit must be at least 1")
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit) if limit else None
+        self.peak = self.in_flight
+
+    @asynccontextmanager
+    async def slot(self):
+        slots = self._slots
+        if slots is not None:
+            self.waiting += 1
+            try:
+                await slots.acquire()
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if slots is not None:
+                slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting, "peak": self.peak}
+
+class InstrumentedFastMCP(FastMCP):
+    """
+    FastMCP that times every tool and resource handler it registers.
+
+    The decorators return the timed handler, so direct calls (as in the
+    tests) are counted too; only calls through MCP have a serialization phase.
+    Tool calls can also be sampled for profiling (see utils.profiling), and
+    calls through MCP are bounded by a ConcurrencyLimit.
+
+    Registering a handler builds JSON schemas for its arguments and result,
+    which for every tool and resource takes longer than the rest of startup,
+    so handlers are registered on the first request that lists or calls them
+    rather than at import, keeping the initialize handshake fast.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = MetricsRegistry()
+        self.profiler = CallProfiler()
+        self.concurrency = ConcurrencyLimit()
+        self._pending: List[tuple] = []
+
+    def tool(self, *args, **kwargs):
+        register = super().tool(*args, **kwargs)
+
+        def decorator(fn):
+            timed = self.metrics.instrument(self.profiler.instrument(fn), "tool")
+            self._pending.append((register, timed))
+            return timed
+
+        return decorator
+
+    def resource(self, uri: str, *args, **kwargs):
+        register = super().resource(uri, *args, **kwargs)
+
+        def decorator(fn):
+            timed = self.metrics.instrument(fn, "resource")
+            self._pending.append((register, timed))
+            return timed
+
+        return decorator
+
+    def register_pending(self) -> None:
+        """Register the handlers decorated since the last request, in declaration order."""
+        pending, self._pending = self._pending, []
+        for register, handler in pending:
+            register(handler)
+
+    async def list_tools(self):
+        self.register_pending()
+        return await super().list_tools()
+
+    async def list_resources(self):
+        self.register_pending()
+        return await super().list_resources()
+
+    async def list_resource_templates(self):
+        self.register_pending()
+        return await super().list_resource_templates()
+
+    async def _timed_request(self, request):
+        async with self.concurrency.slot():
+            return await self._timed(request)
+
+    async def _timed(self, request):
+        call = _Call()
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            result = await request
+        finally:
+            _current_call.reset(token)
+        if call.name is not None:
+            self.metrics.record_serialization(call.name, time.perf_counter() - start - call.seconds)
+        return result
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        self.register_pending()
+        return await self._timed_request(super().call_tool(name, arguments))
+
+    async def read_resource(self, uri):
+        self.register_pending()
+        return await self._timed_request(super().read_resource(uri))
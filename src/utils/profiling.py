@@ -0,0 +1,121 @@
+"""
+Sampled cProfile and tracemalloc profiling of MCP tool calls.
+
+A CallProfiler wraps each tool handler. With a non-zero rate, that
+percentage of calls is profiled and each profiled call leaves files named
+<tool>-<arguments hash>-<sequence> in the profile directory:
+
+  .prof        cProfile stats, for pstats or snakeviz     (cpu mode)
+  .alloc.txt   the top allocation sites during the call   (memory mode)
+
+cProfile only sees the event loop thread, so database calls that a backend
+runs in worker threads show up as time spent awaiting them. One call is
+profiled at a time; sampled calls that overlap it run unprofiled. Files that
+cannot be written are logged and counted; the call's result is returned anyway.
+"""
+import cProfile
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import tracemalloc
+from typing import Any, Dict, Optional
+
+MODES = ("cpu", "memory", "both")
+DEFAULT_DIRECTORY = "profiles"
+TOP_ALLOCATIONS = 25
+_NOT_TRACEMALLOC = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+logger = logging.getLogger(__name__)
+
+def arguments_hash(arguments: Dict[str, Any]) -> str:
+    """A short stable hash of a call's arguments, so calls with the same arguments share a tag."""
+    encoded = json.dumps(arguments, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+class CallProfiler:
+    """Profiles rate percent of tool calls, in cpu, memory or both modes."""
+
+    def __init__(self):
+        self.rate = 0.0
+        self.mode = "cpu"
+        self.directory = DEFAULT_DIRECTORY
+        self.profiled = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+        self._sequence = itertools.count(1)
+        self._active = threading.Lock()
+
+    def configure(self, rate: float, mode: Optional[str] = None, directory: Optional[str] = None) -> Dict[str, Any]:
+        if rate < 0 or rate > 100:
+            raise ValueError("Profiling rate must be a percentage between 0 and 100")
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Profiling mode must be one of {', '.join(MODES)}")
+        self.rate = rate
+        self.mode = mode or self.mode
+        self.directory = directory or self.directory
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {"rate": self.rate, "mode": self.mode, "directory": os.path.abspath(self.directory),
+                "profiled_calls": self.profiled, "write_errors": self.write_errors, "last_error": self.last_error}
+
+    def instrument(self, fn):
+        """Wrap an async tool handler so sampled calls are profiled."""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def sampled(*args, **kwargs):
+            if not self.rate or random.random() * 100 >= self.rate or not self._active.acquire(blocking=False):
+                return await fn(*args, **kwargs)
+            try:
+                return await self._profile(name, fn, args, kwargs)
+            finally:
+                self._active.release()
+
+        return sampled
+
+    async def _profile(self, name: str, fn, args, kwargs):
+        cpu = self.mode in ("cpu", "both")
+        memory = self.mode in ("memory", "both")
+        profile = cProfile.Profile() if cpu else None
+        started_tracing = memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(_NOT_TRACEMALLOC) if memory else None
+        if profile is not None:
+            profile.enable()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+            after = tracemalloc.take_snapshot().filter_traces(_NOT_TRACEMALLOC) if memory else None
+            if started_tracing:
+                tracemalloc.stop()
+            stem = os.path.join(self.directory, f"{name}-{arguments_hash(kwargs)}-{next(self._sequence)}")
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if profile is not None:
+                    profile.dump_stats(f"{stem}.prof")
+                if after is not None:
+                    self._write_allocations(f"{stem}.alloc.txt", name, kwargs, after.compare_to(before, "lineno"))
+            except OSError as error:
+                # An unwritable directory or full disk loses the profile, not the tool call
+                self.write_errors += 1
+                self.last_error = str(error)
+                logger.warning("Could not write the profile of %s to %s: %s", name, self.directory, error)
+            else:
+                self.profiled += 1
+
+    @staticmethod
+    def _write_allocations(path: str, name: str, arguments: Dict[str, Any], differences) -> None:
+        with open(path, "w", encoding="utf-8") as alloc_file:
+            alloc_file.write(f"# {name} {json.dumps(arguments, sort_keys=True, default=str)}\n")
+            alloc_file.write(f"# top {TOP_ALLOCATIONS} allocation sites by net bytes allocated during the call\n")
+            for difference in differences[:TOP_ALLOCATIONS]:
+                alloc_file.write(f"{difference}\n")
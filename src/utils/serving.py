@@ -0,0 +1,114 @@
+"""
+Serving the MCP server over HTTP (Streamable HTTP or SSE) with uvicorn.
+
+Every worker process has its own event loop, database connection pool and
+ConcurrencyLimit. The operation modules hand blocking work to
+asyncio.to_thread (the SQLite and memory backends, imports, archives), which
+runs on the loop's default executor; with_thread_pool gives each worker a
+pool of a chosen size for it.
+
+Several workers need the stateless Streamable HTTP mode: a worker keeps its
+sessions in memory and the next request of a client may reach another one.
+
+The HTTP transports have no authentication, so tools naming files on the
+server only reach those inside a data directory (see DataDirectory), and
+requests must carry a Host header the server was told to expect.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from mcp.server.transport_security import TransportSecuritySettings
+from starlette.applications import Starlette
+
+HTTP_TRANSPORTS = ("streamable-http", "sse")
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+class DataDirectory:
+    """
+    The directory the file tools (import, export, restore, profiling) may use.
+
+    Without one, paths are used as given, which only stdio's local client may do;
+    over HTTP the file tools are refused until a directory is configured.
+    """
+
+    def __init__(self):
+        self.root: Optional[str] = None
+        self.required = False
+
+    def configure(self, root: Optional[str], required: bool = False) -> None:
+        self.root = os.path.realpath(root) if root else None
+        self.required = required
+
+    def resolve(self, path: str) -> str:
+        """The real path of path, relative to the data directory, rejecting one that leads outside it."""
+        if self.root is None:
+            if self.required:
+                raise ValueError("Files on the server can only be used over HTTP when it is started with --data-dir")
+            return path
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            raise ValueError(f"'{path}' is outside the server's data directory")
+        return resolved
+
+def transport_security(allowed_hosts: List[str]) -> TransportSecuritySettings:
+    """
+    DNS rebinding protection accepting the loopback names and allowed_hosts.
+
+    An allowed host given without a port ("dm.example.com") is accepted on any port.
+    """
+    patterns = ["127.0.0.1:*", "localhost:*", "[::1]:*"]
+    for host in allowed_hosts:
+        patterns += [host] if ":" in host.rsplit("]", 1)[-1] else [host, f"{host}:*"]
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=patterns,
+        allowed_origins=[f"{scheme}://{pattern}" for pattern in patterns for scheme in ("http", "https")],
+    )
+
+def with_thread_pool(app: Starlette, threads: Optional[int]) -> Starlette:
+    """Run the app's asyncio.to_thread work on a pool of threads workers while it is up (None keeps asyncio's)."""
+    if threads is None:
+        return app
+    if threads < 1:
+        raise ValueError("The thread pool needs at least 1 thread")
+    lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def pooled(app):
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="offload")
+        asyncio.get_running_loop().set_default_executor(executor)
+        try:
+            async with lifespan(app) as state:
+                yield state
+        finally:
+            executor.shutdown(wait=False)
+
+    app.router.lifespan_context = pooled
+    return app
+
+# Backends whose data lives in the process using them, so each worker would have a database of its own
+PROCESS_LOCAL_BACKENDS = ("memory", "sqlite::memory:")
+
+def check_workers(transport: str, workers: int, backend: str) -> None:
+    if workers < 1:
+        raise ValueError("At least 1 worker is needed")
+    if workers > 1 and transport != "streamable-http":
+        raise ValueError("Several workers need the streamable-http transport (SSE sessions live in one process)")
+    if workers > 1 and backend in PROCESS_LOCAL_BACKENDS:
+        raise ValueError(f"Several workers need a database they share (MongoDB or a SQLite file), not '{backend}'")
+
+def run(app, host: str, port: int, workers: int = 1) -> None:
+    """
+    Serve app with uvicorn.
+
+    With several workers app must be the import string of a factory
+    ("module:function"), which each worker process calls to build its app.
+    """
+    import uvicorn
+    if workers > 1:
+        uvicorn.run(app, host=host, port=port, workers=workers, factory=True)
+    else:
+        uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,12 @@
+import asyncio
+import functools
+
+# One long-lived loop for the whole test run so Motor clients stay bound to it
+_loop = asyncio.new_event_loop()
+
+def run_sync(async_function):
+    """Wrap an async MCP tool or resource so behave steps can call it synchronously."""
+    @functools.wraps(async_function)
+    def wrapper(*args, **kwargs):
+        return _loop.run_until_complete(async_function(*args, **kwargs))
+    return wrapper
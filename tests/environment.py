@@ -8,12 +8,15 @@ from src import dm
 # Test database name
 TEST_DB_NAME = "dnd_gm_test"
 
+# Storage backend for the test run, e.g. "memory" or "sqlite::memory:" (defaults to MongoDB)
+TEST_BACKEND = os.environ.get("TEST_BACKEND")
+
 def before_all(context):
     """Set up test database and clear it before running tests"""
     # Store the db_name in the context for use in steps
     context.db_name = TEST_DB_NAME
     
     # Initialize the dm module's database with the test database name
-    dm.initialize_db(TEST_DB_NAME)
+    dm.initialize_db(TEST_DB_NAME, backend=TEST_BACKEND)
     
     print(f"Test database '{TEST_DB_NAME}' initialized") 
\ No newline at end of file
@@ -48,4 +48,77 @@ Feature: Campaign Management
     When I create a campaign named "Unique Campaign" with description "This is a unique campaign"
     Then the campaign "Unique Campaign" should be created successfully
     When I create a campaign named "Unique Campaign" with description "This is a duplicate name"
-    Then I should see an error that the campaign name already exists 
\ No newline at end of file
+    Then I should see an error that the campaign name already exists 
+
+  Scenario: Cannot rename a campaign to a name that is taken
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a campaign "Curse of Strahd" exists
+    When I rename the campaign "Curse of Strahd" to "Lost Mines"
+    Then I should see an error that the campaign name already exists
+    And the campaign "Curse of Strahd" should have description "Description for Curse of Strahd"
+
+  Scenario: List campaigns one page at a time
+    Given there are no campaigns
+    And the following campaigns exist:
+      | name                    | description                            |
+      | Lost Mines              | An adventure in Phandalin              |
+      | Curse of Strahd         | A gothic horror campaign in Barovia    |
+      | Storm King's Thunder    | A campaign about giants                |
+    When I list campaigns 2 at a time with only the "name" field
+    Then I should get 2 pages of campaigns
+    And every campaign should be listed exactly once
+    And each listed campaign should only have an id and a name
+
+  Scenario: Full-text search for campaigns
+    Given there are no campaigns
+    And the following campaigns exist:
+      | name                    | description                            |
+      | Lost Mines              | An adventure in Phandalin              |
+      | Curse of Strahd         | A gothic horror campaign in Barovia    |
+      | Tomb of Annihilation    | A horror-tinged jungle adventure       |
+    When I full-text search campaigns for "gothic horror"
+    Then the best full-text match should be "Curse of Strahd"
+    And the full-text search results should not include "Lost Mines"
+
+  Scenario: Back up and restore a campaign
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a character "Fizwick" exists for "Lost Mines" campaign
+    When I export the campaign "Lost Mines" to a gzip archive
+    And I delete all campaigns and characters
+    And I restore the campaign archive
+    Then the campaign "Lost Mines" should be created successfully
+    And the restored campaign should keep its ID and its character "Fizwick"
+
+  Scenario: Keep archives of an HTTP server inside its data directory
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And the server serves HTTP with a data directory
+    When I export the campaign "Lost Mines" to "../outside.jsonl"
+    Then the export should be refused as outside the data directory
+    When I export the campaign "Lost Mines" to "archives/lost-mines.jsonl"
+    Then the archive should be written inside the data directory
+
+  Scenario: Refuse server files over HTTP without a data directory
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And the server serves HTTP without a data directory
+    When I export the campaign "Lost Mines" to "lost-mines.jsonl"
+    Then the export should be refused until a data directory is configured
+
+  Scenario: Summarize a campaign's party
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And the party of "Lost Mines" is:
+      | name    | race  | class   | level | strength | cantrips         | level_1       |
+      | Fizwick | Gnome | Wizard  | 3     | 8        | Light, Mage Hand | Magic Missile |
+      | Bruenor | Dwarf | Fighter | 5     | 16       |                  |               |
+      | Thokk   | Dwarf | Fighter | 3     | 18       |                  |               |
+    When I get the stats of the campaign "Lost Mines"
+    Then the campaign stats should count 3 characters
+    And the campaign stats should list classes "Fighter:2, Wizard:1"
+    And the campaign stats should list races "Dwarf:2, Gnome:1"
+    And the campaign stats should list levels "3:2, 5:1"
+    And the campaign stats should average strength 14
+    And the campaign stats should count 1 spellcaster knowing 3 spells
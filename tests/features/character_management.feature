@@ -44,6 +44,85 @@ Feature: Character Management
     And the character class search results should not include "Bruenor"
     And the character class search results should not include "Drizzt"
 
+  Scenario: Bulk import character sheets
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    When I import 3 copies of the Fizwick character sheet and 1 invalid record into "Lost Mines"
+    Then the import report should show 3 imported and 1 failed
+    And the character search results should include "Fizwick Quillsharp 2"
+
+  Scenario: Look up characters by part of their name
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And the following characters exist:
+      | name           | race          | class     | campaign_name |
+      | Fizwick        | Forest Gnome  | Wizard    | Lost Mines    |
+      | Bruenor        | Dwarf         | Fighter   | Lost Mines    |
+      | Drizzt         | Drow          | Ranger    | Lost Mines    |
+    When I look up characters whose name contains "WICK"
+    Then the character search results should include "Fizwick"
+    And the character search results should not include "Bruenor"
+    And the character search results should not include "Drizzt"
+
+  Scenario: Buffer rapid changes to a character's combat state
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a character "Fizwick" exists for "Lost Mines" campaign
+    And character updates to "data" are written behind
+    When the hit points of the character are set to 10, 7 and 3
+    Then the character should have 3 hit points
+    And the stored character should not have hit points yet
+    When I flush the buffered character writes
+    Then 1 character should have been written
+    And the stored character should have 3 hit points
+
+  Scenario: Keep buffered combat state when a write-through update fails
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a character "Fizwick" exists for "Lost Mines" campaign
+    And character updates to "data" are written behind
+    When the hit points of the character are set to 10, 7 and 3
+    And the database fails while the character's level is updated
+    Then the stored character should not have hit points yet
+    When I flush the buffered character writes
+    Then 1 character should have been written
+    And the stored character should have 3 hit points
+
+  Scenario: Track a character's resources with patches
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a character "Fizwick" exists for "Lost Mines" campaign
+    When I patch the character with the following operations:
+      | op   | path            | value                        |
+      | set  | data.hit_points | 20                           |
+      | push | equipment       | "Rope"                       |
+      | set  | spells.level_1  | ["Shield", "Magic Missile"]  |
+    And I patch the character with the following operations:
+      | op   | path            | value                        |
+      | inc  | data.hit_points | -7                           |
+      | pull | spells.level_1  | "Shield"                     |
+      | push | equipment       | "Torch"                      |
+    Then the stored character should match the following JSON:
+      """
+      {"data": {"hit_points": 13}, "equipment": ["Rope", "Torch"], "spells": {"level_1": ["Magic Missile"]}}
+      """
+    And patching the character with the following operations should fail:
+      | op   | path            | value                        |
+      | inc  | name            | 1                            |
+      | inc  | data.hit_points | "many"                       |
+      | push | level           | 2                            |
+      | set  | ability_scores.luck | 12                       |
+
+  Scenario: Fetch only the fields a client needs
+    Given there are no campaigns
+    And a campaign "Lost Mines" exists
+    And a character "Fizwick" exists for "Lost Mines" campaign
+    When I get the character with only the "name,level" fields
+    Then the character result should only hold "id,name,level"
+    When I search characters for "Fiz" with only the "name,character_class" fields
+    Then every character result should only hold "id,name,character_class"
+    And getting the character with only the "hit_points" field should fail
+
   Scenario: Create a character with all extended fields
     Given there are no campaigns
     And a campaign "Lost Mines" exists
@@ -9,4 +9,125 @@ Feature: Database Management
         Then I should see the database name
         And I should see the number of campaigns
         And I should see the number of characters
-        And I should see the number of settings 
\ No newline at end of file
+        And I should see the number of settings 
+    Scenario: Get entity cache statistics
+        Given the database is initialized
+        When I request the database info
+        Then I should see the entity cache hit and miss counts
+
+    Scenario: Get cached per-campaign statistics
+        Given the database is initialized
+        And a campaign "Stats Table" exists
+        And a character "Counted" exists for "Stats Table" campaign
+        When I request the database info for the "Stats Table" campaign
+        Then the campaign breakdown should have a character count of 1
+        And I should see the document count and size of each collection
+        When I request the database info for the "Stats Table" campaign
+        Then the statistics should be answered from the cache
+        When I delete the character "Counted"
+        And I request the database info for the "Stats Table" campaign
+        Then the campaign breakdown should have a character count of 0
+
+    Scenario: Get tool latency metrics
+        Given the database is initialized
+        When I request the database info through the MCP server
+        And I request the tool metrics
+        Then I should see the call count and latency percentiles for "get_database_info_tool"
+        And the metrics should be available in the Prometheus format
+
+    Scenario: Log slow queries
+        Given the database is initialized
+        And every query is logged as slow with explain enabled
+        When I search for settings with the query "Neverwinter"
+        And I request the slow queries for the "settings" collection
+        Then I should see the settings query shape, duration and plan
+        And the slow queries should be written to the log file
+        And a slow-query log file that cannot be opened should not fail queries
+
+    Scenario: Profile sampled tool calls
+        Given the database is initialized
+        When I profile every tool call with cProfile and tracemalloc
+        And I request the database info
+        Then a profile and an allocation top-list should be written for "get_database_info_tool"
+
+    Scenario: Profile files that cannot be written do not fail tool calls
+        Given the database is initialized
+        When I profile every tool call into a directory that cannot be created
+        Then requesting the database info should still succeed
+        And the profiler should report the failed write
+
+    Scenario: Replace the name indexes of a database created by an earlier version
+        Given a SQLite database file with the indexes an earlier version created
+        When the server connects to the file
+        Then each collection should have the "name_unique" index and not the "name_1" index
+
+    Scenario: Report unused and missing indexes
+        Given the database is initialized
+        And a campaign "Index Audit" exists
+        And a character "Auditor" exists for "Index Audit" campaign
+        And the characters collection is queried by level
+        When I request the index report
+        Then the characters index on campaign, class and race should be in use
+        And the campaigns collection should have no description index
+        And the report should suggest an index on the characters level field
+
+    Scenario: Connect to the database on first use
+        Given a database initialized for deferred connection
+        Then the deferred database should not be connected yet
+        When I request the deferred database info
+        Then the deferred database should be connected
+        And its indexes should be built in the background
+
+    Scenario: Serve several game tables from one server
+        Given a campaign "Table Seven" exists for the tenant "table7"
+        When I list the campaigns of the tenant "table7"
+        Then the tenant's campaigns should be "Table Seven"
+        And the campaign "Table Seven" should not be in the default database
+        And the tenant "table7" should be listed
+        And the tenant "bad/name" should be rejected
+
+    Scenario: Connect a new tenant's database off the event loop
+        When I list the campaigns of the tenant "table9" while watching where databases connect
+        Then the tenant's database should have connected on a worker thread
+
+    Scenario: Serve clients over Streamable HTTP
+        Given the server app for the streamable-http transport with 2 offload threads
+        When a client initializes a session over HTTP
+        And the client calls "get_database_info_tool" over HTTP
+        Then the HTTP result should include the database name
+
+    Scenario: Accept only the named hosts on a public address
+        Given the server app listening on a public address for the host "dm.example.com"
+        Then a request with the Host header "dm.example.com:8000" should be accepted
+        And a request with the Host header "attacker.example:8000" should be rejected
+
+    Scenario: Refuse several HTTP workers on a database each process keeps to itself
+        Then starting 4 HTTP workers on the "memory" backend should be refused
+        And starting 4 HTTP workers on the "sqlite::memory:" backend should be refused
+        And starting 4 HTTP workers on the "sqlite:dnd.sqlite3" backend should be allowed
+
+    Scenario: Share a database between server processes
+        Given two server processes sharing one SQLite database
+        When the first process creates the campaign "Lost Mines"
+        And the second process reads the campaign
+        And the first process renames the campaign to "Found Mines"
+        Then the second process should read the campaign as "Found Mines"
+        And the second process should find the campaign by the name fragment "found"
+
+    Scenario: Full-text search survives compacting a SQLite database
+        Given a SQLite database file with the campaigns "Ember Keep", "Frost Hollow" and "Storm Reach"
+        When the campaign "Frost Hollow" is deleted and the file is vacuumed
+        Then a full-text search of the file for "storm frost" should find only "Storm Reach"
+
+    Scenario: Bound concurrent tool calls
+        Given tool calls are limited to 2 at a time
+        When 8 tool calls arrive at once
+        Then every call should succeed
+        And no more than 2 calls should have run at once
+
+    Scenario: Run the operations from blocking code
+        Given the campaign "Blocking Keep" created with the blocking operations
+        When I add the character "Ser Blocksworth" and the settings "Blockland" and "Block Town" with the blocking operations
+        And I level the character up to 4 and move "Block Town" under "Blockland" with the blocking operations
+        Then the blocking operations should read the character at level 4 and "Block Town" under "Blockland"
+        And the async operations should read the same campaign, character and settings
@@ -187,6 +187,24 @@ Feature: Setting Management
         And the setting "Ardena" should have "Orrhaga" as a child setting
         And the setting "Orrhaga" should have "Shadowreach Highlands" as a child setting
 
+    Scenario: Walk a setting hierarchy at any depth
+        Given the following hierarchical settings exist:
+            | name           | setting_type | parent      |
+            | Yawning Portal | Tavern       | Dock Ward   |
+            | Dock Ward      | District     | Waterdeep   |
+            | Waterdeep      | City         | Sword Coast |
+            | Sword Coast    | Region       | Faerun      |
+            | Faerun         | Continent    | None        |
+        When I get the subtree of "Sword Coast"
+        Then the settings should be "Sword Coast, Waterdeep, Dock Ward, Yawning Portal" in that order
+        When I get the ancestors of "Yawning Portal"
+        Then the settings should be "Faerun, Sword Coast, Waterdeep, Dock Ward" in that order
+        When I move "Dock Ward" under "Sword Coast"
+        And I get the ancestors of "Yawning Portal"
+        Then the settings should be "Faerun, Sword Coast, Dock Ward" in that order
+        And the tree of "Sword Coast" should nest "Yawning Portal" under "Dock Ward"
+        And moving "Sword Coast" under "Dock Ward" should be rejected
+
     Scenario: Search for settings by text or type
         Given there are no settings
         And the following settings exist:
@@ -1,14 +1,25 @@
 from behave import given, when, then
-from src.dm import (
-    create_campaign_tool,
-    update_campaign_tool,
-    delete_campaign_tool,
-    search_campaigns_tool,
-    get_campaign_resource,
-    list_campaigns_resource,
-    delete_all_campaigns_tool,
-    delete_all_characters_tool
-)
+from src import dm
+from tests.async_tools import run_sync
+
+create_campaign_tool = run_sync(dm.create_campaign_tool)
+update_campaign_tool = run_sync(dm.update_campaign_tool)
+delete_campaign_tool = run_sync(dm.delete_campaign_tool)
+search_campaigns_tool = run_sync(dm.search_campaigns_tool)
+get_campaign_resource = run_sync(dm.get_campaign_resource)
+list_campaigns_resource = run_sync(dm.list_campaigns_resource)
+delete_all_campaigns_tool = run_sync(dm.delete_all_campaigns_tool)
+delete_all_characters_tool = run_sync(dm.delete_all_characters_tool)
+list_campaigns_tool = run_sync(dm.list_campaigns_tool)
+text_search_campaigns_tool = run_sync(dm.text_search_campaigns_tool)
+export_campaign_tool = run_sync(dm.export_campaign_tool)
+restore_archive_tool = run_sync(dm.restore_archive_tool)
+list_characters_tool = run_sync(dm.list_characters_tool)
+create_character_tool = run_sync(dm.create_character_tool)
+get_campaign_stats_tool = run_sync(dm.get_campaign_stats_tool)
+
+import os
+import tempfile
 
 import logging
 logger = logging.getLogger('behave')
@@ -53,6 +64,16 @@ def step_impl_update_campaign_details(context):
         description = row['description']
         context.updated_campaign = update_campaign_tool(campaign_id=campaign.id, name=name, description=description)
 
+@when('I rename the campaign "{name}" to "{new_name}"')
+def step_impl_rename_campaign(context, name, new_name):
+    campaigns = search_campaigns_tool(query=name)
+    campaign = next((c for c in campaigns if c.name == name), None)
+    try:
+        update_campaign_tool(campaign_id=campaign.id, name=new_name, description=campaign.description)
+        context.campaign_name_already_exists_error = None
+    except ValueError as e:
+        context.campaign_name_already_exists_error = str(e)
+
 @when('I delete the campaign "{name}"')
 def step_impl_delete_campaign(context, name):
     # Find campaign by name first
@@ -130,4 +151,150 @@ def step_impl_specific_campaign_not_in_list(context, name):
 @then('I should see an error that the campaign name already exists')
 def step_campaign_name_exists_error(context):
     assert context.campaign_name_already_exists_error is not None
-    assert "already exists" in context.campaign_name_already_exists_error 
\ No newline at end of file
+    assert "already exists" in context.campaign_name_already_exists_error 
+@when('I list campaigns {limit:d} at a time with only the "{field}" field')
+def step_impl_list_campaign_pages(context, limit, field):
+    context.campaign_pages = []
+    cursor = None
+    while True:
+        page = list_campaigns_tool(limit=limit, cursor=cursor, fields=[field])
+        context.campaign_pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+@then('I should get {count:d} pages of campaigns')
+def step_impl_campaign_page_count(context, count):
+    assert len(context.campaign_pages) == count
+
+@then('every campaign should be listed exactly once')
+def step_impl_campaigns_listed_once(context):
+    listed_ids = [item["id"] for page in context.campaign_pages for item in page.items]
+    assert sorted(listed_ids) == sorted(context.campaign_ids)
+
+@then('each listed campaign should only have an id and a name')
+def step_impl_campaign_projection(context):
+    for page in context.campaign_pages:
+        for item in page.items:
+            assert set(item) == {"id", "name"}
+
+@when('I full-text search campaigns for "{query}"')
+def step_impl_text_search_campaigns(context, query):
+    context.text_search_results = text_search_campaigns_tool(query=query)
+
+@then('the best full-text match should be "{name}"')
+def step_impl_best_text_match(context, name):
+    scores = [hit.score for hit in context.text_search_results]
+    assert scores == sorted(scores, reverse=True)
+    assert context.text_search_results[0].item.name == name
+
+@then('the full-text search results should not include "{name}"')
+def step_impl_text_search_exclude(context, name):
+    assert name not in [hit.item.name for hit in context.text_search_results]
+
+@when('I export the campaign "{name}" to a gzip archive')
+def step_impl_export_campaign(context, name):
+    campaigns = search_campaigns_tool(query=name)
+    campaign = next((c for c in campaigns if c.name == name), None)
+    context.exported_campaign_id = campaign.id
+    context.archive_path = os.path.join(tempfile.mkdtemp(), "campaign.jsonl.gz")
+    context.export_report = export_campaign_tool(campaign_id=campaign.id, path=context.archive_path)
+    assert context.export_report.counts["campaigns"] == 1
+
+@given('the server serves HTTP with a data directory')
+def step_impl_http_data_directory(context):
+    context.data_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(context.data_dir, "archives"))
+    dm.data_directory.configure(context.data_dir, required=True)
+    context.add_cleanup(dm.data_directory.configure, None)
+
+@given('the server serves HTTP without a data directory')
+def step_impl_http_no_data_directory(context):
+    dm.data_directory.configure(None, required=True)
+    context.add_cleanup(dm.data_directory.configure, None)
+
+@when('I export the campaign "{name}" to "{path}"')
+def step_impl_export_campaign_to(context, name, path):
+    campaign = next(c for c in search_campaigns_tool(query=name) if c.name == name)
+    context.export_error = None
+    try:
+        context.export_report = export_campaign_tool(campaign_id=campaign.id, path=path)
+    except ValueError as e:
+        context.export_error = str(e)
+
+@then('the export should be refused as outside the data directory')
+def step_impl_export_outside(context):
+    assert context.export_error and "outside" in context.export_error, context.export_error
+    assert not os.path.exists(os.path.join(os.path.dirname(context.data_dir), "outside.jsonl"))
+
+@then('the archive should be written inside the data directory')
+def step_impl_archive_inside(context):
+    assert context.export_error is None, context.export_error
+    assert os.path.exists(os.path.join(context.data_dir, "archives", "lost-mines.jsonl"))
+
+@then('the export should be refused until a data directory is configured')
+def step_impl_export_needs_data_directory(context):
+    assert context.export_error and "--data-dir" in context.export_error, context.export_error
+
+@when('I delete all campaigns and characters')
+def step_impl_delete_everything(context):
+    delete_all_campaigns_tool()
+    delete_all_characters_tool()
+
+@when('I restore the campaign archive')
+def step_impl_restore_campaign(context):
+    try:
+        context.restore_report = restore_archive_tool(path=context.archive_path)
+    finally:
+        os.remove(context.archive_path)
+    assert context.restore_report.failed == 0
+
+@then('the restored campaign should keep its ID and its character "{character_name}"')
+def step_impl_restored_campaign(context, character_name):
+    campaign = get_campaign_resource(campaign_id=context.exported_campaign_id)
+    characters = list_characters_tool(campaign_id=campaign.id).items
+    assert [character.name for character in characters] == [character_name]
+
+@given('the party of "{campaign_name}" is')
+def step_impl_campaign_party(context, campaign_name):
+    campaigns = search_campaigns_tool(query=campaign_name)
+    campaign = next((c for c in campaigns if c.name == campaign_name), None)
+    for row in context.table:
+        spells = {spell_level: [spell.strip() for spell in row[spell_level].split(",")]
+                  for spell_level in ("cantrips", "level_1") if row[spell_level]}
+        create_character_tool(
+            name=row['name'],
+            campaign_id=campaign.id,
+            race=row['race'],
+            character_class=row['class'],
+            level=int(row['level']),
+            ability_scores={"strength": int(row['strength'])},
+            spells=spells or None
+        )
+
+@when('I get the stats of the campaign "{name}"')
+def step_impl_campaign_stats(context, name):
+    campaigns = search_campaigns_tool(query=name)
+    campaign = next((c for c in campaigns if c.name == name), None)
+    context.campaign_stats = get_campaign_stats_tool(campaign_id=campaign.id)
+
+@then('the campaign stats should count {count:d} characters')
+def step_impl_stats_character_count(context, count):
+    assert context.campaign_stats.character_count == count
+
+@then('the campaign stats should list {facet} "{expected}"')
+def step_impl_stats_distribution(context, facet, expected):
+    counts = [f"{group.value}:{group.count}" for group in getattr(context.campaign_stats, facet)]
+    assert ", ".join(counts) == expected, counts
+
+@then('the campaign stats should average strength {strength:d}')
+def step_impl_stats_average_strength(context, strength):
+    assert context.campaign_stats.average_ability_scores["strength"] == strength
+    assert context.campaign_stats.average_ability_scores["wisdom"] is None
+
+@then('the campaign stats should count {spellcasters:d} spellcaster knowing {spells:d} spells')
+def step_impl_stats_spells(context, spellcasters, spells):
+    assert context.campaign_stats.spellcasters == spellcasters
+    assert context.campaign_stats.known_spells == spells
+    assert context.campaign_stats.spells_by_level["cantrips"] == 2
+
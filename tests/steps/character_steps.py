@@ -1,16 +1,25 @@
 from behave import given, when, then
-from src.dm import (
-    create_character_tool,
-    update_character_tool,
-    delete_character_tool,
-    search_characters_tool,
-    get_character_resource,
-    list_characters_resource,
-    create_campaign_tool,
-    search_campaigns_tool
-)
+from src import dm
+from tests.async_tools import run_sync
+
+create_character_tool = run_sync(dm.create_character_tool)
+update_character_tool = run_sync(dm.update_character_tool)
+patch_character_tool = run_sync(dm.patch_character_tool)
+delete_character_tool = run_sync(dm.delete_character_tool)
+search_characters_tool = run_sync(dm.search_characters_tool)
+get_character_resource = run_sync(dm.get_character_resource)
+list_characters_resource = run_sync(dm.list_characters_resource)
+create_campaign_tool = run_sync(dm.create_campaign_tool)
+search_campaigns_tool = run_sync(dm.search_campaigns_tool)
+lookup_by_name_tool = run_sync(dm.lookup_by_name_tool)
+import_records_tool = run_sync(dm.import_records_tool)
+flush_character_writes_tool = run_sync(dm.flush_character_writes_tool)
 from src.models.character import Character, Ability, Proficiencies, Personality, Spells, Familiar
+from src.models.patch import PatchOperation
+from pymongo.errors import AutoReconnect
 import json
+import os
+import tempfile
 
 @given('a character "{name}" exists for "{campaign_name}" campaign')
 def step_impl_character_exists(context, name, campaign_name):
@@ -93,6 +102,33 @@ def step_impl_delete_character(context, name):
 def step_impl_search_characters_by_class(context, character_class):
     context.class_search_results = search_characters_tool(character_class=character_class)
 
+@when('I import {count:d} copies of the Fizwick character sheet and 1 invalid record into "{campaign_name}"')
+def step_impl_import_character_sheets(context, count, campaign_name):
+    campaigns = search_campaigns_tool(query=campaign_name)
+    campaign = next((c for c in campaigns if c.name == campaign_name), None)
+    with open(os.path.join(os.path.dirname(__file__), '..', '..', 'docs', 'fizwick.json')) as sheet:
+        record = json.load(sheet)
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as import_file:
+        for number in range(1, count + 1):
+            record['character']['name'] = f"Fizwick Quillsharp {number}"
+            import_file.write(json.dumps(record) + "\n")
+        import_file.write(json.dumps({"name": "Broken", "level": "high"}) + "\n")
+    try:
+        context.import_report = import_records_tool(paths=[import_file.name], campaign_id=campaign.id, workers=1)
+    finally:
+        os.remove(import_file.name)
+    context.search_results = search_characters_tool(query="Fizwick")
+
+@then('the import report should show {imported:d} imported and {failed:d} failed')
+def step_impl_import_report(context, imported, failed):
+    assert context.import_report.imported == imported
+    assert context.import_report.failed == failed
+    assert len(context.import_report.errors) == failed
+
+@when('I look up characters whose name contains "{fragment}"')
+def step_impl_lookup_characters_by_name(context, fragment):
+    context.search_results = lookup_by_name_tool(fragment=fragment, kinds=["characters"])["characters"]
+
 @then('the character "{name}" should be created successfully')
 def step_impl_character_created(context, name):
     # Search for character by name
@@ -423,4 +459,121 @@ def step_impl_character_data_matches_json(context):
                 f"Value mismatch for '{key}': expected {expected_value}, got {actual_data[key]}"
     
     # Success if we get here
-    assert True 
\ No newline at end of file
+    assert True 
+
+@given('character updates to "{fields}" are written behind')
+def step_impl_write_behind(context, fields):
+    # A long interval, so only the flush below writes
+    dm.db.write_behind.configure(fields.split(","), interval=3600)
+    context.add_cleanup(dm.db.write_behind.stop)
+    context.add_cleanup(dm.db.write_behind.configure, [])
+
+@when('the hit points of the character are set to {first:d}, {second:d} and {third:d}')
+def step_impl_set_hit_points(context, first, second, third):
+    for hit_points in (first, second, third):
+        context.updated_character = update_character_tool(character_id=context.character_id,
+                                                          data={"hit_points": hit_points})
+
+@then('the character should have {hit_points:d} hit points')
+def step_impl_character_hit_points(context, hit_points):
+    assert context.updated_character.data == {"hit_points": hit_points}
+    # Reads see the buffered state, whether from the cache or the database
+    dm.db.entity_cache.clear("characters")
+    assert get_character_resource(character_id=context.character_id).data == {"hit_points": hit_points}
+
+@when("the database fails while the character's level is updated")
+def step_impl_update_fails(context):
+    collection = dm.db.async_characters_collection
+
+    async def fail(*args, **kwargs):
+        raise AutoReconnect("connection lost")
+
+    collection.find_one_and_update = fail
+    try:
+        update_character_tool(character_id=context.character_id, level=5)
+    except AutoReconnect:
+        pass
+    else:
+        raise AssertionError("the update did not fail")
+    finally:
+        del collection.find_one_and_update
+
+@then('the stored character should not have hit points yet')
+def step_impl_stored_without_hit_points(context):
+    stored = dm.db.characters_collection.find_one({"id": context.character_id})
+    assert "hit_points" not in stored.get("data", {})
+    assert dm.db.write_behind.stats()['pending_characters'] == 1
+
+@when('I flush the buffered character writes')
+def step_impl_flush_writes(context):
+    context.flush_result = flush_character_writes_tool()
+
+@then('{count:d} character should have been written')
+def step_impl_characters_written(context, count):
+    assert context.flush_result['characters_written'] == count
+    assert context.flush_result['pending_characters'] == 0
+
+@then('the stored character should have {hit_points:d} hit points')
+def step_impl_stored_hit_points(context, hit_points):
+    stored = dm.db.characters_collection.find_one({"id": context.character_id})
+    assert stored["data"] == {"hit_points": hit_points}
+
+
+def _patch_operations(table):
+    return [PatchOperation(op=row['op'], path=row['path'], value=json.loads(row['value'])) for row in table]
+
+@when('I patch the character with the following operations')
+def step_impl_patch_character(context):
+    context.updated_character = patch_character_tool(character_id=context.character_id,
+                                                     operations=_patch_operations(context.table))
+
+@then('the stored character should match the following JSON')
+def step_impl_stored_character_matches(context):
+    stored = dm.db.characters_collection.find_one({"id": context.character_id})
+    for path, expected in json.loads(context.text).items():
+        if isinstance(expected, dict):
+            for key, value in expected.items():
+                assert stored[path][key] == value, f"{path}.{key}: expected {value}, got {stored[path][key]}"
+        else:
+            assert stored[path] == expected, f"{path}: expected {expected}, got {stored[path]}"
+    # The patch returned the stored state
+    assert context.updated_character.equipment == stored["equipment"]
+
+@then('patching the character with the following operations should fail')
+def step_impl_patch_character_fails(context):
+    for operation in _patch_operations(context.table):
+        try:
+            patch_character_tool(character_id=context.character_id, operations=[operation])
+        except ValueError:
+            continue
+        raise AssertionError(f"Patching {operation.path} with {operation.op} should have failed")
+
+@when('I get the character with only the "{fields}" fields')
+def step_impl_get_character_fields(context, fields):
+    uri_id = f"{context.character_id}?fields={fields}"
+    # Once from the entity cache and once from the database
+    context.character_results = [get_character_resource(character_id=uri_id)]
+    dm.db.entity_cache.clear("characters")
+    context.character_results.append(get_character_resource(character_id=uri_id))
+
+@when('I search characters for "{query}" with only the "{fields}" fields')
+def step_impl_search_characters_fields(context, query, fields):
+    context.character_results = search_characters_tool(query=query, fields=fields.split(","))
+    assert context.character_results
+
+@then('the character result should only hold "{fields}"')
+@then('every character result should only hold "{fields}"')
+def step_impl_character_results_hold(context, fields):
+    for result in context.character_results:
+        assert isinstance(result, dict)
+        assert list(result) == fields.split(","), result
+        assert result["id"] == context.character_id
+
+@then('getting the character with only the "{field}" field should fail')
+def step_impl_get_character_unknown_field(context, field):
+    try:
+        get_character_resource(character_id=f"{context.character_id}?fields={field}")
+    except ValueError as error:
+        assert field in str(error)
+    else:
+        raise AssertionError(f"Getting the unknown field {field} should have failed")
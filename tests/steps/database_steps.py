@@ -1,5 +1,34 @@
+import asyncio
+import json
+import os
+import pstats
+import tempfile
+import threading
+
 from behave import given, when, then
-from src.dm import get_database_info_tool
+from starlette.testclient import TestClient
+from src import dm
+from src.database.db_operations import Database, close as close_db, init_db
+from src.database import campaign_operations, character_operations, setting_operations
+from src.database import async_campaign_operations, async_character_operations, async_setting_operations
+from src.database.backends import create_backend
+from src.models.character import Character
+from src.models.patch import PatchOperation
+from src.utils import serving
+from tests.async_tools import run_sync
+
+get_database_info_tool = run_sync(dm.get_database_info_tool)
+get_metrics_tool = run_sync(dm.get_metrics_tool)
+call_tool = run_sync(dm.mcp.call_tool)
+get_slow_queries_tool = run_sync(dm.get_slow_queries_tool)
+search_settings_tool = run_sync(dm.search_settings_tool)
+configure_profiling_tool = run_sync(dm.configure_profiling_tool)
+get_index_report_tool = run_sync(dm.get_index_report_tool)
+search_campaigns_tool = run_sync(dm.search_campaigns_tool)
+create_campaign_tool = run_sync(dm.create_campaign_tool)
+list_campaigns_tool = run_sync(dm.list_campaigns_tool)
+delete_all_campaigns_tool = run_sync(dm.delete_all_campaigns_tool)
+list_tenants_tool = run_sync(dm.list_tenants_tool)
 
 @given('the database is initialized')
 def step_given_database_initialized(context):
@@ -28,4 +57,478 @@ def step_then_see_character_count(context):
 @then('I should see the number of settings')
 def step_then_see_setting_count(context):
     assert 'setting_count' in context.db_info
-    assert isinstance(context.db_info['setting_count'], int) 
\ No newline at end of file
+    assert isinstance(context.db_info['setting_count'], int) 
+@when('I request the database info for the "{campaign_name}" campaign')
+def step_when_request_campaign_info(context, campaign_name):
+    campaign = next(c for c in search_campaigns_tool(query=campaign_name) if c.name == campaign_name)
+    context.previous_db_info = getattr(context, 'db_info', None)
+    context.db_info = get_database_info_tool(campaign_id=campaign.id)
+
+@then('the campaign breakdown should have a character count of {count:d}')
+def step_then_campaign_character_count(context, count):
+    breakdown = context.db_info['campaign']
+    assert breakdown['character_count'] == count, breakdown
+    assert (breakdown['character_size_bytes'] > 0) == (count > 0), breakdown
+
+@then('I should see the document count and size of each collection')
+def step_then_collection_totals(context):
+    collections = context.db_info['collections']
+    assert set(collections) == {'campaigns', 'characters', 'settings'}
+    assert collections['characters']['count'] == context.db_info['character_count']
+    assert 'size_bytes' in collections['characters']
+
+@then('the statistics should be answered from the cache')
+def step_then_statistics_cached(context):
+    previous, current = context.previous_db_info['stats_cache'], context.db_info['stats_cache']
+    assert current['misses'] == previous['misses']
+    assert current['hits'] > previous['hits']
+
+@then('I should see the entity cache hit and miss counts')
+def step_then_see_cache_counts(context):
+    assert 'cache' in context.db_info
+    assert isinstance(context.db_info['cache']['hits'], int)
+    assert isinstance(context.db_info['cache']['misses'], int)
+
+@when('I request the database info through the MCP server')
+def step_when_request_database_info_through_mcp(context):
+    call_tool("get_database_info_tool", {})
+
+@when('I request the tool metrics')
+def step_when_request_metrics(context):
+    context.metrics = get_metrics_tool()
+
+@then('I should see the call count and latency percentiles for "{name}"')
+def step_then_see_tool_metrics(context, name):
+    handler = context.metrics['handlers'][name]
+    assert handler['kind'] == 'tool'
+    assert handler['calls'] >= 1
+    assert handler['errors'] == 0
+    for phase in ('db', 'serialization'):
+        assert handler[phase]['count'] >= 1
+        assert handler[phase]['p50_ms'] <= handler[phase]['p95_ms'] <= handler[phase]['p99_ms']
+
+@then('the metrics should be available in the Prometheus format')
+def step_then_see_prometheus_metrics(context):
+    text = dm.mcp.metrics.prometheus()
+    assert 'dm_handler_calls_total{handler="get_database_info_tool",kind="tool"}' in text
+    assert 'dm_handler_duration_seconds_bucket{handler="get_database_info_tool",kind="tool",phase="db",le="+Inf"}' in text
+
+
+@given('every query is logged as slow with explain enabled')
+def step_given_every_query_slow(context):
+    query_log = dm.db.query_log
+    saved = (query_log.threshold_ms, query_log.explain, query_log.path)
+    query_log.close()
+    query_log.threshold_ms, query_log.explain = 0, True
+    query_log.path = context.slow_query_log_path = os.path.join(tempfile.mkdtemp(), "slow_queries.log")
+
+    def restore():
+        query_log.close()
+        query_log.threshold_ms, query_log.explain, query_log.path = saved
+        query_log.write_error = None
+        query_log.clear()
+    context.add_cleanup(restore)
+
+@when('I search for settings with the query "{query}"')
+def step_when_search_settings(context, query):
+    search_settings_tool(query)
+
+@when('I request the slow queries for the "{collection}" collection')
+def step_when_request_slow_queries(context, collection):
+    context.slow_queries = get_slow_queries_tool(limit=10, collection=collection)
+
+@then('I should see the settings query shape, duration and plan')
+def step_then_see_slow_query(context):
+    entries = context.slow_queries['entries']
+    assert entries
+    entry = next(entry for entry in entries if entry['operation'] == 'find')
+    assert entry['collection'] == 'settings'
+    assert 'Neverwinter' not in json.dumps(entry['filter_shape'])
+    assert entry['duration_ms'] >= 0
+    assert entry['plan']
+
+@then('the slow queries should be written to the log file')
+def step_then_slow_queries_logged(context):
+    with open(context.slow_query_log_path) as log_file:
+        logged = [json.loads(line) for line in log_file]
+    assert any(entry['collection'] == 'settings' for entry in logged)
+
+@then('a slow-query log file that cannot be opened should not fail queries')
+def step_then_unwritable_log(context):
+    query_log = dm.db.query_log
+    query_log.close()
+    query_log.path = os.path.join(tempfile.mkdtemp(), "missing", "slow_queries.log")
+    search_settings_tool(query="Neverwinter")
+    # With explain on, entries are written after their plan is fetched
+    query_log.drain()
+    assert query_log.path is None and query_log.write_error
+    assert query_log.entries(1, "settings")
+
+@when('I profile every tool call with cProfile and tracemalloc')
+def step_when_profile_every_call(context):
+    context.profile_dir = tempfile.mkdtemp()
+    configure_profiling_tool(100, "both", context.profile_dir)
+    context.add_cleanup(lambda: configure_profiling_tool(0))
+
+@then('a profile and an allocation top-list should be written for "{name}"')
+def step_then_profile_written(context, name):
+    files = os.listdir(context.profile_dir)
+    prof = [file for file in files if file.startswith(f"{name}-") and file.endswith(".prof")]
+    assert prof, files
+    assert pstats.Stats(os.path.join(context.profile_dir, prof[0])).total_calls > 0
+    assert any(file.startswith(f"{name}-") and file.endswith(".alloc.txt") for file in files), files
+
+@when('I profile every tool call into a directory that cannot be created')
+def step_when_profile_into_unwritable_dir(context):
+    blocker = tempfile.NamedTemporaryFile()
+    context.add_cleanup(blocker.close)
+    # A directory cannot be created under a regular file
+    context.profiler_status = configure_profiling_tool(100, "both", os.path.join(blocker.name, "profiles"))
+    context.add_cleanup(lambda: configure_profiling_tool(0))
+
+@then('requesting the database info should still succeed')
+def step_then_database_info_succeeds(context):
+    info = get_database_info_tool()
+    assert info["name"] == context.db_name, info
+
+@then('the profiler should report the failed write')
+def step_then_profiler_reports_failed_write(context):
+    before, status = context.profiler_status, dm.mcp.profiler.status()
+    assert status["profiled_calls"] == before["profiled_calls"], status
+    assert status["write_errors"] > before["write_errors"] and status["last_error"], status
+
+@given('the characters collection is queried by level')
+def step_given_characters_queried_by_level(context):
+    list(dm.db.characters_collection.find({"level": 5}))
+
+@when('I request the index report')
+def step_when_request_index_report(context):
+    context.index_report = get_index_report_tool()
+
+@then('the characters index on campaign, class and race should be in use')
+def step_then_compound_index_used(context):
+    characters = context.index_report['characters']
+    names = [index['name'] for index in characters['indexes']]
+    assert 'campaign_id_1_class_1_race_1' in names
+    assert 'campaign_id_1_class_1_race_1' not in characters['unused']
+    assert 'campaign_id_1_class_1_race_1' not in characters['not_built']
+
+@then('the campaigns collection should have no description index')
+def step_then_no_description_index(context):
+    names = [index['name'] for index in context.index_report['campaigns']['indexes']]
+    assert 'description_1' not in names
+
+@then('the report should suggest an index on the characters level field')
+def step_then_suggest_level_index(context):
+    missing = context.index_report['characters']['missing']
+    assert any(shape['suggested_key'] == [['level', 1]] for shape in missing), missing
+
+@given('a database initialized for deferred connection')
+def step_given_deferred_database(context):
+    context.deferred_db = dm.Database()
+    dm.init_db(context.deferred_db, db_name=f"{context.db_name}_deferred",
+               backend=os.environ.get("TEST_BACKEND"), deferred=True)
+    context.add_cleanup(close_db, context.deferred_db)
+
+@then('the deferred database should not be connected yet')
+def step_then_deferred_not_connected(context):
+    assert context.deferred_db.initialized
+    assert 'backend' not in vars(context.deferred_db)
+    assert not context.deferred_db.indexes_ready.is_set()
+
+@when('I request the deferred database info')
+def step_when_request_deferred_info(context):
+    context.db_info = context.deferred_db.get_info()
+
+@then('the deferred database should be connected')
+def step_then_deferred_connected(context):
+    assert context.deferred_db.backend is not None
+    assert context.db_info['name'] == f"{context.db_name}_deferred"
+
+@then('its indexes should be built in the background')
+def step_then_indexes_built(context):
+    assert context.deferred_db.indexes_ready.wait(timeout=10)
+    assert context.deferred_db.index_build_error is None
+    names = context.deferred_db.characters_collection.index_information()
+    assert 'campaign_id_1_class_1_race_1' in names
+
+@given('a campaign "{name}" exists for the tenant "{tenant}"')
+def step_given_tenant_campaign(context, name, tenant):
+    context.add_cleanup(dm.databases.close_tenant, tenant)
+    context.add_cleanup(delete_all_campaigns_tool, tenant=tenant)
+    delete_all_campaigns_tool(tenant=tenant)
+    create_campaign_tool(name=name, description="A campaign of another table", tenant=tenant)
+
+@when('I list the campaigns of the tenant "{tenant}"')
+def step_when_list_tenant_campaigns(context, tenant):
+    context.tenant_campaigns = list_campaigns_tool(tenant=tenant).items
+
+@when('I list the campaigns of the tenant "{tenant}" while watching where databases connect')
+def step_when_list_tenant_campaigns_watching(context, tenant):
+    from database import db_operations
+    connect, context.connect_threads = db_operations._connect, []
+
+    def watched(*args, **kwargs):
+        context.connect_threads.append(threading.current_thread())
+        return connect(*args, **kwargs)
+
+    db_operations._connect = watched
+    context.add_cleanup(setattr, db_operations, "_connect", connect)
+    context.add_cleanup(dm.databases.close_tenant, tenant)
+    context.tenant_campaigns = list_campaigns_tool(tenant=tenant).items
+
+@then("the tenant's database should have connected on a worker thread")
+def step_then_tenant_connected_off_loop(context):
+    assert context.connect_threads, "the tenant's database did not connect"
+    assert threading.main_thread() not in context.connect_threads, context.connect_threads
+
+@then("the tenant's campaigns should be \"{names}\"")
+def step_then_tenant_campaigns(context, names):
+    assert [campaign.name for campaign in context.tenant_campaigns] == names.split(", ")
+
+@then('the campaign "{name}" should not be in the default database')
+def step_then_not_in_default_database(context, name):
+    assert name not in [campaign.name for campaign in search_campaigns_tool(query=name)]
+
+@then('the tenant "{tenant}" should be listed')
+def step_then_tenant_listed(context, tenant):
+    tenants = list_tenants_tool()
+    assert tenant in tenants['tenants']
+    assert tenants['default_database'] == context.db_name
+
+@then('the tenant "{tenant}" should be rejected')
+def step_then_tenant_rejected(context, tenant):
+    try:
+        list_campaigns_tool(tenant=tenant)
+    except ValueError:
+        return
+    raise AssertionError(f"Tenant '{tenant}' was accepted")
+
+def _post_jsonrpc(context, request_id, method, params):
+    headers = {"Accept": "application/json, text/event-stream"}
+    if getattr(context, 'mcp_session_id', None):
+        headers["Mcp-Session-Id"] = context.mcp_session_id
+    response = context.http_client.post("/mcp", headers=headers, json={
+        "jsonrpc": "2.0", "id": request_id, "method": method, "params": params,
+    })
+    assert response.status_code == 200, response.text
+    # Streamable HTTP answers with a one-event SSE stream
+    data = next(line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: "))
+    return response, json.loads(data)
+
+def _build_http_app(transport, threads=None):
+    # FastMCP runs a Streamable HTTP session manager only once, so each scenario's app gets a new one
+    dm.mcp._session_manager = None
+    return dm.build_http_app(transport, threads)
+
+@given('the server app for the {transport} transport with {threads:d} offload threads')
+def step_given_http_app(context, transport, threads):
+    app = _build_http_app(transport, threads)
+    # A loopback base URL, which FastMCP's DNS rebinding protection accepts
+    context.http_client = TestClient(app, base_url="http://127.0.0.1:8000")
+    context.http_client.__enter__()
+    context.add_cleanup(context.http_client.__exit__, None, None, None)
+
+@given('the server app listening on a public address for the host "{host}"')
+def step_given_public_http_app(context, host):
+    context.add_cleanup(setattr, dm.mcp.settings, "transport_security", dm.mcp.settings.transport_security)
+    dm.mcp.settings.transport_security = serving.transport_security([host])
+    context.http_client = TestClient(_build_http_app("streamable-http"))
+    context.http_client.__enter__()
+    context.add_cleanup(context.http_client.__exit__, None, None, None)
+
+def _initialize_status(context, host: str) -> int:
+    response = context.http_client.post("/mcp", headers={
+        "Host": host, "Accept": "application/json, text/event-stream", "Content-Type": "application/json",
+    }, json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+        "protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "behave", "version": "1"},
+    }})
+    return response.status_code
+
+@then('a request with the Host header "{host}" should be accepted')
+def step_then_host_accepted(context, host):
+    assert _initialize_status(context, host) == 200
+
+@then('a request with the Host header "{host}" should be rejected')
+def step_then_host_rejected(context, host):
+    assert _initialize_status(context, host) == 421
+
+@when('a client initializes a session over HTTP')
+def step_when_http_initialize(context):
+    response, message = _post_jsonrpc(context, 1, "initialize", {
+        "protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "behave", "version": "1"},
+    })
+    assert "result" in message, message
+    context.mcp_session_id = response.headers.get("mcp-session-id")
+
+@when('the client calls "{tool}" over HTTP')
+def step_when_http_call(context, tool):
+    _, message = _post_jsonrpc(context, 2, "tools/call", {"name": tool, "arguments": {}})
+    assert not message["result"].get("isError"), message
+    context.http_result = json.loads(message["result"]["content"][0]["text"])
+
+@then('the HTTP result should include the database name')
+def step_then_http_database_name(context):
+    assert context.http_result['name'] == context.db_name
+
+@given('tool calls are limited to {limit:d} at a time')
+def step_given_concurrency_limit(context, limit):
+    dm.mcp.concurrency.configure(limit)
+    context.add_cleanup(dm.mcp.concurrency.configure, None)
+
+@when('{count:d} tool calls arrive at once')
+def step_when_concurrent_calls(context, count):
+    async def calls():
+        return await asyncio.gather(*(dm.mcp.call_tool("list_campaigns_tool", {}) for _ in range(count)),
+                                    return_exceptions=True)
+    context.concurrent_results = asyncio.run(calls())
+
+@then('every call should succeed')
+def step_then_calls_succeed(context):
+    failures = [result for result in context.concurrent_results if isinstance(result, Exception)]
+    assert not failures, failures
+
+@then('no more than {limit:d} calls should have run at once')
+def step_then_concurrency_bounded(context, limit):
+    stats = get_metrics_tool()['concurrency']
+    assert stats['limit'] == limit
+    assert 1 <= stats['peak'] <= limit, stats
+    assert stats['in_flight'] == 0 and stats['waiting'] == 0
+
+
+@then('starting {workers:d} HTTP workers on the "{backend}" backend should be refused')
+def step_then_workers_refused(context, workers, backend):
+    try:
+        serving.check_workers("streamable-http", workers, backend)
+    except ValueError as error:
+        assert "share" in str(error), error
+    else:
+        raise AssertionError(f"{workers} workers were allowed on {backend}")
+
+@then('starting {workers:d} HTTP workers on the "{backend}" backend should be allowed')
+def step_then_workers_allowed(context, workers, backend):
+    serving.check_workers("streamable-http", workers, backend)
+
+@given('two server processes sharing one SQLite database')
+def step_given_shared_database(context):
+    # Two Database objects on one file stand in for two worker processes
+    path = os.path.join(tempfile.mkdtemp(), "shared.sqlite")
+    context.processes = []
+    for _ in range(2):
+        database = Database()
+        init_db(database, None, "dm_shared", f"sqlite:{path}")
+        database.share_between_processes()
+        context.add_cleanup(close_db, database)
+        context.processes.append(database)
+
+@when('the first process creates the campaign "{name}"')
+def step_when_first_process_creates(context, name):
+    context.shared_campaign = campaign_operations.create_campaign(context.processes[0], name, "")
+
+@when('the second process reads the campaign')
+def step_when_second_process_reads(context):
+    campaign_operations.get_campaign(context.processes[1], context.shared_campaign.id)
+
+@when('the first process renames the campaign to "{name}"')
+def step_when_first_process_renames(context, name):
+    campaign_operations.update_campaign(context.processes[0], context.shared_campaign.id, name, "")
+
+@then('the second process should read the campaign as "{name}"')
+def step_then_second_process_reads(context, name):
+    assert campaign_operations.get_campaign(context.processes[1], context.shared_campaign.id).name == name
+
+@then('the second process should find the campaign by the name fragment "{fragment}"')
+def step_then_second_process_finds(context, fragment):
+    found = campaign_operations.lookup_campaigns_by_name(context.processes[1], fragment)
+    assert [campaign.id for campaign in found] == [context.shared_campaign.id]
+
+@given('a SQLite database file with the campaigns "{first}", "{second}" and "{third}"')
+def step_given_sqlite_file_with_campaigns(context, first, second, third):
+    context.file_db = Database()
+    init_db(context.file_db, None, "dm_vacuum", f"sqlite:{os.path.join(tempfile.mkdtemp(), 'vacuum.sqlite')}")
+    context.add_cleanup(close_db, context.file_db)
+    context.file_campaigns = {name: campaign_operations.create_campaign(context.file_db, name, "")
+                              for name in (first, second, third)}
+
+@when('the campaign "{name}" is deleted and the file is vacuumed')
+def step_when_campaign_deleted_and_vacuumed(context, name):
+    campaign_operations.delete_campaign(context.file_db, context.file_campaigns[name].id)
+    with context.file_db.backend.lock:
+        context.file_db.backend.connection.execute("VACUUM")
+
+@then('a full-text search of the file for "{query}" should find only "{name}"')
+def step_then_file_text_search_finds(context, query, name):
+    hits = campaign_operations.text_search_campaigns(context.file_db, query)
+    assert [hit.item.id for hit in hits] == [context.file_campaigns[name].id], hits
+
+@given('a SQLite database file with the indexes an earlier version created')
+def step_given_sqlite_file_with_old_indexes(context):
+    context.file_path = os.path.join(tempfile.mkdtemp(), "earlier.sqlite")
+    backend = create_backend(f"sqlite:{context.file_path}", "dm_earlier", None)
+    for collection, fields in (("campaigns", ("name", "description")),
+                               ("characters", ("name", "campaign_id", "class", "race")),
+                               ("settings", ("name", "setting_type", "region"))):
+        for field in fields:
+            backend.get_collection(collection).create_index(field)
+    backend.close()
+
+@when('the server connects to the file')
+def step_when_server_connects_to_file(context):
+    context.file_db = Database()
+    init_db(context.file_db, None, "dm_earlier", f"sqlite:{context.file_path}")
+    context.add_cleanup(close_db, context.file_db)
+
+@then('each collection should have the "{kept}" index and not the "{dropped}" index')
+def step_then_collections_have_index(context, kept, dropped):
+    for collection in ("campaigns", "characters", "settings"):
+        information = context.file_db.backend.get_collection(collection).index_information()
+        assert kept in information and dropped not in information, (collection, information)
+
+@given('the campaign "{name}" created with the blocking operations')
+def step_given_blocking_campaign(context, name):
+    context.blocking_campaign = campaign_operations.create_campaign(dm.db, name, "Made without an event loop")
+
+@when('I add the character "{name}" and the settings "{region}" and "{town}" with the blocking operations')
+def step_when_blocking_character_and_settings(context, name, region, town):
+    context.blocking_character = character_operations.create_character(dm.db, Character(
+        id="temp", campaign_id=context.blocking_campaign.id, name=name, race="Dwarf", character_class="Fighter",
+        data={"hp": 12}, created_at="", updated_at=""
+    ))
+    context.blocking_settings = {
+        setting_name: setting_operations.create_setting(
+            dm.db, setting_type=setting_type, name=setting_name, region=region, scale="Small", population="Few"
+        )
+        for setting_type, setting_name in (("Region", region), ("Town", town))
+    }
+
+@when('I level the character up to {level:d} and move "{town}" under "{region}" with the blocking operations')
+def step_when_blocking_updates(context, level, town, region):
+    character_id = context.blocking_character.id
+    character_operations.update_character(dm.db, character_id, level=level)
+    character_operations.patch_character(dm.db, character_id, [PatchOperation(op="inc", path="data.hp", value=-5)])
+    setting_operations.update_setting(dm.db, context.blocking_settings[town].id,
+                                      parent_id=context.blocking_settings[region].id)
+
+@then('the blocking operations should read the character at level {level:d} and "{town}" under "{region}"')
+def step_then_blocking_reads(context, level, town, region):
+    character = character_operations.get_character(dm.db, context.blocking_character.id)
+    assert (character.level, character.data["hp"]) == (level, 7), character
+    found = character_operations.lookup_characters_by_name(dm.db, "blocksworth", context.blocking_campaign.id)
+    assert [found_character.id for found_character in found] == [character.id]
+    stats = campaign_operations.get_campaign_stats(dm.db, context.blocking_campaign.id)
+    assert (stats.character_count, stats.max_level) == (1, level), stats
+    ancestors = setting_operations.get_setting_ancestors(dm.db, context.blocking_settings[town].id)
+    assert [setting.name for setting in ancestors] == [region], ancestors
+    tree = setting_operations.get_setting_tree(dm.db, context.blocking_settings[region].id)
+    assert [child.setting.name for child in tree.children] == [town], tree
+
+@then('the async operations should read the same campaign, character and settings')
+def step_then_async_reads_same(context):
+    campaign_id = context.blocking_campaign.id
+    assert run_sync(async_campaign_operations.get_campaign)(dm.db, campaign_id) == \
+        campaign_operations.get_campaign(dm.db, campaign_id)
+    assert run_sync(async_character_operations.list_campaign_characters)(dm.db, campaign_id) == \
+        character_operations.list_campaign_characters(dm.db, campaign_id)
+    for setting in context.blocking_settings.values():
+        assert run_sync(async_setting_operations.get_setting_subtree)(dm.db, setting.id) == \
+            setting_operations.get_setting_subtree(dm.db, setting.id)
@@ -1,16 +1,20 @@
 import json
 from behave import given, when, then
-from src.dm import (
-    create_setting_tool,
-    update_setting_tool,
-    delete_setting_tool,
-    search_settings_tool,
-    filter_settings_by_type_tool,
-    filter_settings_by_parent_tool,
-    get_setting_by_name_tool,
-    delete_all_settings_tool,
-    list_settings_resource
-)
+from src import dm
+from tests.async_tools import run_sync
+
+create_setting_tool = run_sync(dm.create_setting_tool)
+update_setting_tool = run_sync(dm.update_setting_tool)
+delete_setting_tool = run_sync(dm.delete_setting_tool)
+search_settings_tool = run_sync(dm.search_settings_tool)
+filter_settings_by_type_tool = run_sync(dm.filter_settings_by_type_tool)
+filter_settings_by_parent_tool = run_sync(dm.filter_settings_by_parent_tool)
+get_setting_by_name_tool = run_sync(dm.get_setting_by_name_tool)
+delete_all_settings_tool = run_sync(dm.delete_all_settings_tool)
+list_settings_resource = run_sync(dm.list_settings_resource)
+get_setting_subtree_tool = run_sync(dm.get_setting_subtree_tool)
+get_setting_ancestors_tool = run_sync(dm.get_setting_ancestors_tool)
+read_resource = run_sync(dm.mcp.read_resource)
 
 import logging
 logger = logging.getLogger('behave')
@@ -331,6 +335,47 @@ def step_impl_filter_settings_by_parent(context, parent_name):
     else:
         context.search_results = []
 
+@when('I get the subtree of "{name}"')
+def step_impl_get_subtree(context, name):
+    context.search_results = get_setting_subtree_tool(setting_id=context.setting_ids[name])["settings"]
+
+@when('I get the ancestors of "{name}"')
+def step_impl_get_ancestors(context, name):
+    context.search_results = get_setting_ancestors_tool(setting_id=context.setting_ids[name])["settings"]
+
+@when('I move "{name}" under "{parent_name}"')
+def step_impl_move_setting(context, name, parent_name):
+    update_setting_tool(setting_id=context.setting_ids[name], parent_id=context.setting_ids[parent_name])
+
+@then('the settings should be "{names}" in that order')
+def step_impl_settings_in_order(context, names):
+    assert [setting.name for setting in context.search_results] == names.split(", "), \
+        [setting.name for setting in context.search_results]
+
+@then('the tree of "{name}" should nest "{child_name}" under "{parent_name}"')
+def step_impl_tree_nesting(context, name, child_name, parent_name):
+    contents = list(read_resource(f"setting://{context.setting_ids[name]}/tree"))
+    tree = json.loads(contents[0].content)
+
+    def find(node, wanted):
+        if node["setting"]["name"] == wanted:
+            return node
+        return next((found for child in node["children"] if (found := find(child, wanted))), None)
+
+    assert tree["setting"]["name"] == name
+    parent = find(tree, parent_name)
+    assert parent is not None
+    assert [child["setting"]["name"] for child in parent["children"]] == [child_name]
+
+@then('moving "{name}" under "{parent_name}" should be rejected')
+def step_impl_move_rejected(context, name, parent_name):
+    try:
+        update_setting_tool(setting_id=context.setting_ids[name], parent_id=context.setting_ids[parent_name])
+    except ValueError as error:
+        assert "cannot be moved under itself" in str(error)
+    else:
+        raise AssertionError("Moving a setting under its own descendant was allowed")
+
 @then('I should see an error about invalid JSON format')
 def step_impl_check_invalid_json_error(context):
     assert context.error_message is not None, "Expected an error message but none was set"